@@ -0,0 +1,73 @@
+#
+#
+#   Benchmark: stored size and encode/decode latency of the action stacks of a session, for each action codec
+#
+#
+
+import timeit
+
+from linguista.actions import Ask, Reply, ActionFunction, CallFlow, End
+from linguista.tracker import JSONActionCodec, MsgpackActionCodec
+
+from synthetic import make_flows
+
+
+def make_session_actions(flow):
+    """
+    Action stacks of a session in the middle of a flow: the current actions, and the actions following each slot.
+    """
+    slots = flow.get_slots()
+    asks = [Ask(slot) for slot in slots]
+    tail = [ActionFunction("check_balance"), Reply("Done!"), CallFlow("flow_1"), End()]
+
+    current_actions = [(action, flow.name) for action in asks + tail]
+    following_actions = {slot.name: asks[i + 1:] + tail for i, slot in enumerate(slots)}
+
+    return current_actions, following_actions
+
+
+def encode_session(codec, flow, current_actions, following_actions):
+    current_data = codec.encode_actions_with_flows(current_actions)
+    following_data = {slot_name: codec.encode_actions(actions, flow.name)
+                      for slot_name, actions in following_actions.items()}
+    return current_data, following_data
+
+
+def decode_session(codec, flow, current_data, following_data):
+    codec.decode_actions_with_flows(current_data)
+    for data in following_data.values():
+        codec.decode_actions(data, flow.name)
+
+
+def payload_size(data) -> int:
+    return len(data.encode() if isinstance(data, str) else data)
+
+
+def main():
+    flows = make_flows(10)
+    flow = flows[0]
+    current_actions, following_actions = make_session_actions(flow)
+
+    codecs = {
+        "json": JSONActionCodec(),
+        "msgpack": MsgpackActionCodec(),
+        "msgpack (refs)": MsgpackActionCodec(flows),
+    }
+
+    print(f"{'codec':>15} {'bytes':>7} {'encode (us)':>12} {'decode (us)':>12}")
+
+    number = 2000
+    for name, codec in codecs.items():
+        current_data, following_data = encode_session(codec, flow, current_actions, following_actions)
+        size = payload_size(current_data) + sum(payload_size(data) for data in following_data.values())
+
+        encode_time = min(timeit.repeat(lambda: encode_session(codec, flow, current_actions, following_actions),
+                                        number=number, repeat=3)) / number
+        decode_time = min(timeit.repeat(lambda: decode_session(codec, flow, current_data, following_data),
+                                        number=number, repeat=3)) / number
+
+        print(f"{name:>15} {size:>7} {encode_time * 1e6:>12.1f} {decode_time * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
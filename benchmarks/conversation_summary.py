@@ -0,0 +1,78 @@
+#
+#
+#   Benchmark: prompt size and turn latency on long sessions, with a hard cut of the history, the whole history and a
+#   rolling summary
+#
+#
+
+import statistics
+import time
+
+import linguista
+from linguista.models import LLM
+from linguista.summary import ConversationSummarizer
+from linguista.tracker import InMemoryTracker
+
+from synthetic import make_flows
+
+
+class RecordingLLM(LLM):
+    """
+    LLM that records the size of the prompts and always chitchats.
+    """
+
+    def __init__(self):
+        self.prompt_chars = []
+
+    def __call__(self, prompt: str):
+        self.prompt_chars.append(len(prompt))
+        return "ChitChat()"
+
+
+class SlowSummaryLLM(LLM):
+    """
+    LLM that takes a while to write a short summary, as a real model would.
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def __call__(self, prompt: str):
+        time.sleep(self.latency)
+        return "The user chatted about several topics and didn't start any flow."
+
+
+def run(num_turns: int, history_size, summarizer=None):
+    model = RecordingLLM()
+    bot = linguista.Bot(tracker=InMemoryTracker(history_size=history_size), model=model, flows=make_flows(10),
+                        history_size=history_size or num_turns * 2, summarizer=summarizer)
+
+    latencies = []
+    for turn in range(num_turns):
+        start = time.perf_counter()
+        bot.message("session", f"User message number {turn}, talking about something")
+        latencies.append(time.perf_counter() - start)
+
+    bot.flush_summaries()
+
+    return model.prompt_chars[-1], statistics.median(latencies)
+
+
+def main():
+    setups = {
+        "last 20 messages": lambda: dict(history_size=20),
+        "whole history": lambda: dict(history_size=None),
+        "rolling summary": lambda: dict(history_size=40, summarizer=ConversationSummarizer(
+            SlowSummaryLLM(latency=0.05), threshold=16, keep_last=8)),
+    }
+
+    print(f"{'setup':>18} {'turns':>6} {'last prompt (chars)':>20} {'p50 turn (ms)':>14}")
+
+    for name, make_setup in setups.items():
+        for num_turns in (25, 100, 400):
+            prompt_chars, latency = run(num_turns, **make_setup())
+            print(f"{name:>18} {num_turns:>6} {prompt_chars:>20} {latency * 1000:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
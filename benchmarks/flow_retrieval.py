@@ -0,0 +1,60 @@
+#
+#
+#   Benchmark: prompt size and rendering latency against the number of flows, with and without flow retrieval
+#
+#
+
+import time
+import timeit
+
+from linguista.commands import PromptRenderer
+from linguista.enums import Role
+from linguista.retrieval import FlowRetriever
+
+from synthetic import make_flows
+
+
+def approx_tokens(text: str) -> int:
+    # Roughly four characters per token for English text with the usual BPE tokenizers
+    return len(text) // 4
+
+
+def main():
+    conversation = [{"role": Role.USER if i % 2 == 0 else Role.ASSISTANT, "message": f"Message number {i}"}
+                    for i in range(40)]
+
+    print(f"{'flows':>6} {'tokens':>8} {'render (ms)':>12} {'tokens (top-5)':>15} {'render (ms)':>12} "
+          f"{'index (ms)':>11}")
+
+    for num_flows in (10, 100, 1000):
+        flows = make_flows(num_flows)
+        current_flow = flows[0]
+
+        turn_kwargs = dict(
+            current_flow=current_flow,
+            current_slot=current_flow.get_slot("amount"),
+            current_flow_slot_values={"recipient": "Bob"},
+            current_conversation=conversation,
+            latest_user_message="I want to send 50 euros with flow 42"
+        )
+
+        renderer = PromptRenderer(flows)
+
+        start = time.perf_counter()
+        retrieval_renderer = PromptRenderer(flows, retriever=FlowRetriever(top_k=5))
+        index_time = time.perf_counter() - start
+
+        full_prompt = renderer.render(**turn_kwargs)
+        retrieval_prompt = retrieval_renderer.render(**turn_kwargs)
+
+        number = 200
+        full_time = min(timeit.repeat(lambda: renderer.render(**turn_kwargs), number=number, repeat=3)) / number
+        retrieval_time = min(timeit.repeat(lambda: retrieval_renderer.render(**turn_kwargs), number=number,
+                                           repeat=3)) / number
+
+        print(f"{num_flows:>6} {approx_tokens(full_prompt):>8} {full_time * 1000:>12.3f} "
+              f"{approx_tokens(retrieval_prompt):>15} {retrieval_time * 1000:>12.3f} {index_time * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#
+#
+#   Benchmark: import time of linguista, with and without each optional extra installed
+#
+#
+
+import subprocess
+import sys
+
+# Top-level modules of each extra, and the code that first uses it
+EXTRAS = {
+    "openai": (["openai"], "from linguista.models import OpenAI"),
+    "anthropic": (["anthropic"], "from linguista.models import Anthropic"),
+    "redis": (["redis"], "from linguista.tracker import RedisTracker"),
+    "retrieval": (["numpy"], "from linguista.retrieval import FlowRetriever"),
+    "msgpack": (["msgpack"], "from linguista.tracker import MsgpackActionCodec"),
+    "opentelemetry": (["opentelemetry"], "from linguista.instrumentation import OpenTelemetryInstrumentation"),
+    "rich": (["rich"], "linguista.enable_debug_logging()"),
+}
+
+
+def import_time(code: str, blocked=(), setup: str = "", repeat: int = 5) -> float:
+    """
+    Time some code in a new interpreter, so nothing is imported yet. The modules blocked can't be imported, as if
+    they weren't installed.
+
+    Returns:
+        The best time, in seconds.
+    """
+    script = "\n".join([
+        "import sys, time",
+        f"for name in {list(blocked)!r}: sys.modules[name] = None",
+        setup,
+        "start = time.perf_counter()",
+        code,
+        "print(time.perf_counter() - start)",
+    ])
+
+    times = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+        times.append(float(result.stdout))
+
+    return min(times)
+
+
+def is_installed(module_names) -> bool:
+    script = "import importlib; " + "; ".join(f"importlib.import_module({name!r})" for name in module_names)
+    return subprocess.run([sys.executable, "-c", script], capture_output=True).returncode == 0
+
+
+def main():
+    print(f"import linguista: {import_time('import linguista') * 1000:.1f} ms")
+    print(f"import linguista and the bot: {import_time('import linguista; linguista.Bot') * 1000:.1f} ms")
+    print()
+
+    print(f"{'extra':>14} {'installed (ms)':>15} {'not installed (ms)':>19} {'first use (ms)':>15}")
+
+    for extra, (module_names, first_use) in EXTRAS.items():
+        if not is_installed(module_names):
+            print(f"{extra:>14} {'-':>15} {'-':>19} {'-':>15}")
+            continue
+
+        installed = import_time("import linguista; linguista.Bot")
+        not_installed = import_time("import linguista; linguista.Bot", blocked=module_names)
+        first_use_time = import_time(first_use, setup="import linguista; linguista.Bot")
+
+        print(f"{extra:>14} {installed * 1000:>15.1f} {not_installed * 1000:>19.1f} {first_use_time * 1000:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#
+#
+#   Benchmark: per-turn overhead of the instrumentation, without the LLM
+#
+#
+
+import timeit
+
+import linguista
+from linguista.instrumentation import NoopInstrumentation, HistogramInstrumentation
+from linguista.tracker import InMemoryTracker
+
+from synthetic import make_flows
+from turn_overhead import FixedLLM
+
+
+def main():
+    flows = make_flows(10)
+    histograms = HistogramInstrumentation()
+
+    instrumentations = {
+        "disabled": NoopInstrumentation(),
+        "histograms": histograms,
+    }
+
+    print(f"{'instrumentation':>16} {'turn (ms)':>10}")
+
+    for name, instrumentation in instrumentations.items():
+        bot = linguista.Bot(tracker=InMemoryTracker(), model=FixedLLM("StartFlow(flow_9)"), flows=flows,
+                            instrumentation=instrumentation)
+
+        number = 500
+        turn = min(timeit.repeat(lambda: bot.message("session", "Hi"), number=number, repeat=5)) / number
+
+        print(f"{name:>16} {turn * 1000:>10.3f}")
+
+    print()
+    print(f"{'stage':>16} {'mean (us)':>10}")
+
+    for stage in ("render", "llm", "parse", "action"):
+        histogram = histograms.get_histogram(stage)
+        if histogram.count:
+            print(f"{stage:>16} {histogram.sum / histogram.count * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#
+#
+#   Benchmark: latency and errors of the calls when a provider degrades, with a single model and with the router, and
+#   completions without commands when a weak model escalates to a strong one
+#
+#
+
+import asyncio
+import random
+import time
+
+from linguista.commands import parse_command_prompt_response
+from linguista.models import LLM, RouterLLM
+
+
+class ProviderLLM(LLM):
+    """
+    LLM of a provider that degrades after some calls: it becomes slower and fails half of the calls. A weak model
+    doesn't predict any command for some of the prompts.
+    """
+
+    def __init__(self, name: str, latency: float, degrade_after: int = None, no_commands_rate: float = 0.0,
+                 seed: int = 0):
+        self.model = name
+        self.latency = latency
+        self.degrade_after = degrade_after
+        self.no_commands_rate = no_commands_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def __call__(self, prompt: str):
+        raise NotImplementedError
+
+    async def acall(self, prompt: str):
+        self.calls += 1
+        degraded = self.degrade_after is not None and self.calls > self.degrade_after
+
+        await asyncio.sleep(self.latency * self._random.uniform(0.8, 1.2) * (5 if degraded else 1))
+
+        if degraded and self._random.random() < 0.5:
+            raise ConnectionError(f"{self.model} is unavailable")
+
+        if self._random.random() < self.no_commands_rate:
+            return "I'm not sure what to do"
+
+        return "StartFlow(transfer_money)"
+
+
+async def measure(llm: LLM, num_calls: int = 400):
+    latencies = []
+    errors = 0
+
+    for _ in range(num_calls):
+        start = time.perf_counter()
+        try:
+            await llm.acall("prompt")
+        except Exception:
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - start)
+
+    latencies.sort()
+    return [latencies[int(quantile * len(latencies))] for quantile in (0.5, 0.99)], errors / num_calls
+
+
+async def measure_no_commands(llm: LLM, num_calls: int = 400):
+    no_commands = 0
+
+    for _ in range(num_calls):
+        if not parse_command_prompt_response(await llm.acall("prompt")):
+            no_commands += 1
+
+    return no_commands / num_calls
+
+
+def make_providers():
+    return [ProviderLLM("primary", latency=0.005, degrade_after=100), ProviderLLM("secondary", latency=0.008)]
+
+
+def main():
+    llms = {
+        "single": make_providers()[0],
+        "router (cheapest)": RouterLLM(make_providers(), policy="cheapest", recovery_time=1.0),
+        "router (latency)": RouterLLM(make_providers(), policy="latency", window=20),
+    }
+
+    print(f"{'llm':>18} {'p50 (ms)':>9} {'p99 (ms)':>9} {'errors':>7}")
+
+    for name, llm in llms.items():
+        (p50, p99), error_rate = asyncio.run(measure(llm))
+        print(f"{name:>18} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f} {error_rate:>7.1%}")
+
+    weak, strong = ProviderLLM("weak", latency=0.002, no_commands_rate=0.1), ProviderLLM("strong", latency=0.008)
+    llms = {
+        "weak": ProviderLLM("weak", latency=0.002, no_commands_rate=0.1),
+        "router (escalate)": RouterLLM([weak, strong], policy="escalate"),
+    }
+
+    num_calls = 400
+
+    print(f"\n{'llm':>18} {'no commands':>12} {'strong calls':>13}")
+
+    for name, llm in llms.items():
+        no_commands_rate = asyncio.run(measure_no_commands(llm, num_calls))
+        print(f"{name:>18} {no_commands_rate:>12.1%} {strong.calls / num_calls:>13.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#
+#
+#   Benchmark: throughput of the batch turn API against the concurrency limit, with a fixed LLM latency
+#
+#
+
+import asyncio
+import time
+
+import linguista
+from linguista.models import LLM
+from linguista.tracker import InMemoryTracker
+
+from synthetic import make_flows
+
+LLM_LATENCY = 0.05  # seconds
+
+
+class SlowLLM(LLM):
+    """
+    LLM that answers the same commands after a fixed latency, like a remote model with a steady response time.
+    """
+
+    def __init__(self, response: str, latency: float):
+        self.response = response
+        self.latency = latency
+
+    def __call__(self, prompt: str):
+        time.sleep(self.latency)
+        return self.response
+
+    async def acall(self, prompt: str):
+        await asyncio.sleep(self.latency)
+        return self.response
+
+
+def make_bot():
+    return linguista.Bot(tracker=InMemoryTracker(), model=SlowLLM("StartFlow(flow_0)", LLM_LATENCY),
+                         flows=make_flows(10))
+
+
+def main():
+    num_sessions = 100
+    turns_per_session = 4
+    turns = [(f"session_{i}", "Hi") for _ in range(turns_per_session) for i in range(num_sessions)]
+
+    print(f"{'concurrency':>12} {'turns/s':>10}")
+
+    # With a concurrency of 1 the turns run one after the other, like serial `Bot.message` calls
+    for concurrency in (1, 8, 32, 100):
+        bot = make_bot()
+
+        start = time.perf_counter()
+        bot.message_batch(turns, concurrency=concurrency)
+        throughput = len(turns) / (time.perf_counter() - start)
+
+        print(f"{concurrency:>12} {throughput:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#
+#
+#   Benchmark: time from the message of the user to the call to the model on the turns answering an ask, with and
+#   without the turn prepared by the previous one
+#
+#
+
+import statistics
+import time
+
+import linguista
+from linguista.models import LLM
+from linguista.tracker import InMemoryTracker
+
+from synthetic import make_flows
+
+
+class TimingLLM(LLM):
+    """
+    LLM that records when it's called and sets the slots in order, so every turn stops at an ask.
+    """
+
+    def __init__(self, num_flows: int):
+        self.responses = [f"StartFlow(flow_{num_flows - 1})", "SetSlot(amount, 50)", "SetSlot(recipient, Bob)",
+                          "SetSlot(confirmation, true)"]
+        self.calls = 0
+        self.called_at = None
+
+    def __call__(self, prompt: str):
+        self.called_at = time.perf_counter()
+        response = self.responses[self.calls % len(self.responses)]
+        self.calls += 1
+        return response
+
+
+class NoPreparedTurnsTracker(InMemoryTracker):
+    supports_prepared_turns = False
+
+
+def run(tracker, num_flows: int, num_turns: int = 400):
+    model = TimingLLM(num_flows)
+    bot = linguista.Bot(tracker=tracker, model=model, flows=make_flows(num_flows, ask_slots=True))
+
+    latencies = []
+    for turn in range(num_turns):
+        start = time.perf_counter()
+        bot.message("session", f"User message number {turn}")
+
+        if turn % 4 != 0:  # The answers to the asks
+            latencies.append(model.called_at - start)
+
+    return statistics.median(latencies)
+
+
+def main():
+    print(f"{'flows':>6} {'to model call (ms)':>19} {'prepared (ms)':>14} {'speedup':>8}")
+
+    for num_flows in (10, 100, 500):
+        unprepared = run(NoPreparedTurnsTracker(), num_flows)
+        prepared = run(InMemoryTracker(), num_flows)
+
+        print(f"{num_flows:>6} {unprepared * 1000:>19.3f} {prepared * 1000:>14.3f} {unprepared / prepared:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#
+#
+#   Benchmark: share of the command prompt that providers can cache across the turns of a conversation
+#
+#
+
+import linguista
+from linguista.models import LLM, StructuredPrompt
+from linguista.tracker import InMemoryTracker
+
+from synthetic import make_flows
+
+
+class RecordingLLM(LLM):
+    """
+    LLM that records the prompts and cycles through some responses.
+    """
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.prompts = []
+
+    def __call__(self, prompt: str):
+        self.prompts.append(prompt)
+        return self.responses[(len(self.prompts) - 1) % len(self.responses)]
+
+
+def main():
+    print(f"{'flows':>6} {'turns':>6} {'prompt (chars)':>15} {'prefix (chars)':>15} {'cacheable':>10}")
+
+    for num_flows in (10, 100, 500):
+        model = RecordingLLM([f"StartFlow(flow_{num_flows - 1})", "ChitChat()", "StartFlow(flow_0)"])
+        bot = linguista.Bot(tracker=InMemoryTracker(), model=model, flows=make_flows(num_flows))
+
+        num_turns = 12
+        for turn in range(num_turns):
+            bot.message("session", f"User message number {turn}")
+
+        prompts = model.prompts
+        assert all(isinstance(prompt, StructuredPrompt) for prompt in prompts)
+        assert len({prompt.prefix for prompt in prompts}) == 1, "The prompt prefix changed across turns"
+
+        prompt_chars = sum(len(prompt) for prompt in prompts)
+        prefix_chars = sum(len(prompt.prefix) for prompt in prompts[1:])  # The first turn writes the cache
+
+        print(f"{num_flows:>6} {num_turns:>6} {prompt_chars / num_turns:>15.0f} {len(prompts[0].prefix):>15} "
+              f"{prefix_chars / prompt_chars:>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
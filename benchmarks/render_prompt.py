@@ -0,0 +1,45 @@
+#
+#
+#   Benchmark: per-turn prompt rendering latency against the number of flows
+#
+#
+
+import timeit
+
+from linguista.commands import PromptRenderer, render_prompt
+from linguista.enums import Role
+
+from synthetic import make_flows
+
+
+def main():
+    conversation = [{"role": Role.USER if i % 2 == 0 else Role.ASSISTANT, "message": f"Message number {i}"}
+                    for i in range(40)]
+
+    print(f"{'flows':>6} {'render_prompt (ms)':>20} {'PromptRenderer (ms)':>20} {'speedup':>8}")
+
+    for num_flows in (10, 100, 1000):
+        flows = make_flows(num_flows)
+        current_flow = flows[0]
+
+        turn_kwargs = dict(
+            current_flow=current_flow,
+            current_slot=current_flow.get_slot("amount"),
+            current_flow_slot_values={"recipient": "Bob"},
+            current_conversation=conversation,
+            latest_user_message="I want to send 50 euros"
+        )
+
+        renderer = PromptRenderer(flows)
+        renderer.render(**turn_kwargs)  # warm up the flow catalogue
+
+        number = max(1, 2000 // num_flows)
+        uncached = min(timeit.repeat(lambda: render_prompt(available_flows=flows, **turn_kwargs),
+                                     number=number, repeat=3)) / number
+        cached = min(timeit.repeat(lambda: renderer.render(**turn_kwargs), number=number, repeat=3)) / number
+
+        print(f"{num_flows:>6} {uncached * 1000:>20.3f} {cached * 1000:>20.3f} {uncached / cached:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
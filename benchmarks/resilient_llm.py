@@ -0,0 +1,88 @@
+#
+#
+#   Benchmark: latency percentiles and error rate of a model with a long tail of latency and rate limits, with and
+#   without retries and hedged requests
+#
+#
+
+import asyncio
+import random
+import time
+
+from linguista.models import LLM, ResilientLLM
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class TailLLM(LLM):
+    """
+    LLM that usually responds in about 50 ms, but sometimes takes ten times longer or is rate limited.
+    """
+
+    supports_call_options = True
+
+    def __init__(self, slow_rate: float = 0.05, error_rate: float = 0.03, seed: int = 0):
+        self.slow_rate = slow_rate
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+
+    def __call__(self, prompt: str, max_tokens=None, timeout=None):
+        raise NotImplementedError
+
+    async def acall(self, prompt: str, max_tokens=None, timeout=None):
+        latency = self._random.lognormvariate(-3, 0.3)  # Median of 50 ms
+
+        if self._random.random() < self.slow_rate:
+            latency *= 10
+
+        await asyncio.sleep(latency)
+
+        if self._random.random() < self.error_rate:
+            raise RateLimitError("Rate limit exceeded")
+
+        return "StartFlow(transfer_money)"
+
+
+async def measure(llm: LLM, num_calls: int = 1000, concurrency: int = 50):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def call():
+        nonlocal errors
+
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await llm.acall("prompt")
+            except Exception:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[call() for _ in range(num_calls)])
+
+    latencies.sort()
+    return [latencies[int(quantile * len(latencies))] for quantile in (0.5, 0.95, 0.99)], errors / num_calls
+
+
+def main():
+    llms = {
+        "plain": TailLLM(),
+        "retries": ResilientLLM(TailLLM(), backoff_base=0.05),
+        "retries + hedge": ResilientLLM(TailLLM(), backoff_base=0.05, hedge_quantile=0.9),
+    }
+
+    print(f"{'llm':>16} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'errors':>7} {'hedges':>7}")
+
+    for name, llm in llms.items():
+        (p50, p95, p99), error_rate = asyncio.run(measure(llm))
+        hedges = getattr(llm, "hedges", 0)
+
+        print(f"{name:>16} {p50 * 1000:>9.1f} {p95 * 1000:>9.1f} {p99 * 1000:>9.1f} {error_rate:>7.1%} {hedges:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+#
+#
+#   Synthetic flows for the benchmarks
+#
+#
+
+import linguista
+from linguista.actions import Reply, Ask, ChainAction
+
+
+def _ask_slots(flow: linguista.Flow):
+    return ChainAction([Ask(slot, prompt=f"What is the {slot.name}?") for slot in flow.get_slots()] + [Reply("Done!")])
+
+
+def make_flow(index: int, ask_slots: bool = False) -> linguista.Flow:
+    """
+    Create a flow with three slots of different types, named `flow_{index}`. It replies right away, or asks for each
+    slot first with `ask_slots`.
+    """
+    namespace = {
+        "name": f"flow_{index}",
+        "description": f"Synthetic flow number {index}",
+        "amount": linguista.FlowSlot(name="amount", description="Amount of money", type=float),
+        "recipient": linguista.FlowSlot(name="recipient", description="Recipient name",
+                                        type=linguista.types.Categorical(["Alice", "Bob", "Charlie"])),
+        "confirmation": linguista.FlowSlot(name="confirmation", description="Confirm", type=bool),
+        "start": linguista.action(_ask_slots if ask_slots else lambda self: Reply("Hi!")),
+    }
+    return type(f"Flow{index}", (linguista.Flow,), namespace)()
+
+
+def make_flows(num_flows: int, ask_slots: bool = False):
+    return [make_flow(i, ask_slots=ask_slots) for i in range(num_flows)]
@@ -0,0 +1,45 @@
+#
+#
+#   Benchmark: per-turn overhead of the bot, without the LLM, against the number of flows
+#
+#
+
+import timeit
+
+import linguista
+from linguista.models import LLM
+from linguista.tracker import InMemoryTracker
+
+from synthetic import make_flows
+
+
+class FixedLLM(LLM):
+    """
+    LLM that always predicts the same commands, so only the overhead of the bot is measured.
+    """
+
+    def __init__(self, response: str):
+        self.response = response
+
+    def __call__(self, prompt: str):
+        return self.response
+
+
+def main():
+    print(f"{'flows':>6} {'turn (ms)':>10}")
+
+    for num_flows in (10, 100, 250, 500):
+        flows = make_flows(num_flows)
+
+        # The last flow registered is started on every turn, the worst case for a linear lookup
+        bot = linguista.Bot(tracker=InMemoryTracker(), model=FixedLLM(f"StartFlow(flow_{num_flows - 1})"),
+                            flows=flows)
+
+        number = 200
+        turn = min(timeit.repeat(lambda: bot.message("session", "Hi"), number=number, repeat=3)) / number
+
+        print(f"{num_flows:>6} {turn * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,19 @@
 #
 
 from . import types   # noqa: F401
-from .bot import Bot   # noqa: F401
-from .models import OpenAI, Anthropic   # noqa: F401
 from .actions import action   # noqa: F401
 from .flow import Flow   # noqa: F401
 from .flow_slot import FlowSlot   # noqa: F401
 from .tracker.proxy import ProxyTracker as Tracker   # noqa: F401
+from .utils import enable_debug_logging, lazy_attributes   # noqa: F401
+
+# The bot and the models are imported when first accessed, so the flows can be defined without importing the
+# prompt templates or the SDKs of the providers
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    "Bot": ".bot",
+    "OpenAI": ".models",
+    "Anthropic": ".models",
+})
 
 __version__ = '0.1.0'
 
@@ -4,8 +4,9 @@
 #
 #
 
-from dataclasses import dataclass
-from typing import Optional, List, Union
+import inspect
+from dataclasses import dataclass, field
+from typing import ClassVar, Dict, Optional, List, Union, Tuple
 
 from .flow_slot import FlowSlot
 
@@ -20,10 +21,16 @@ def action(func):
 @dataclass(frozen=True)
 class Action:
 
+    # Action classes by name, to decode them by their type tag
+    _types: ClassVar[Dict[str, type]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        Action._types[cls.__name__] = cls
+
     @classmethod
     def from_dict(cls, data: dict):
-        action_subclasses = cls.__subclasses__()
-        action_cls = next((action_cls for action_cls in action_subclasses if action_cls.__name__ == data["type"]), None)
+        action_cls = Action._types.get(data["type"])
 
         if action_cls is None:
             raise ValueError(f"Invalid action type: {data['type']}")
@@ -65,9 +72,35 @@ class ChainAction(Action):
         raise NotImplementedError()
 
 
+@dataclass(frozen=True)
+class InvocationPlan:
+    """
+    How to call an action function, computed once from its signature.
+    """
+    parameters: Tuple[str, ...]  # Names of the parameters that can be injected, i.e. passed by keyword
+    is_coroutine: bool
+
+
+def make_invocation_plan(function: callable) -> InvocationPlan:
+    """
+    Analyse the signature of an action function. The first parameter is the flow, so it's never injected.
+    """
+    signature_parameters = list(inspect.signature(function).parameters.values())[1:]
+
+    parameters = tuple(parameter.name for parameter in signature_parameters
+                       if parameter.kind in (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY))
+
+    return InvocationPlan(parameters=parameters, is_coroutine=inspect.iscoroutinefunction(function))
+
+
 @dataclass(frozen=True)
 class ActionFunction(Action):
     function: Union[str, callable]  # it may be a string with the function name
+    plan: Optional[InvocationPlan] = field(default=None, compare=False, repr=False)
+
+    def __post_init__(self):
+        if self.plan is None and not isinstance(self.function, str):
+            object.__setattr__(self, 'plan', make_invocation_plan(self.function))
 
     @classmethod
     def from_dict(cls, data: dict):
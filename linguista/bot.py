@@ -4,27 +4,42 @@
 #
 #
 
-import inspect
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
 import uuid
 import warnings
-from collections import deque
-from typing import Optional, List, Sequence, Any, Type, Dict
+from collections import deque, Counter
+from dataclasses import dataclass
+from typing import (Optional, List, Any, Dict, AsyncIterator, AsyncIterable, Iterable, Sequence, Tuple,
+                    TYPE_CHECKING)
 
 from .flow_slot import FlowSlot
+from .cache import CommandCache
 from .actions import ActionFunction, Reply, Ask, ChainAction, Action, End, CallFlow
-from .commands import (render_prompt, parse_command_prompt_response, SetSlotCommand, StartFlowCommand,
-                       CancelFlowCommand, ChitChatCommand, ClarifyCommand, HumanHandoffCommand, RepeatCommand,
-                       SkipQuestionCommand)
+from .concurrency import CONCURRENCY_POLICIES, REJECT, MERGE, SessionBusyError
+from .commands import (PromptRenderer, CommandStreamParser, parse_command_prompt_response, SetSlotCommand,
+                       StartFlowCommand, CancelFlowCommand, ChitChatCommand, ClarifyCommand, HumanHandoffCommand,
+                       RepeatCommand, SkipQuestionCommand, RuleBasedClassifier)
 from .enums import Role
-from .event_flows import (CancelFlow, CannotHandle, ChitChat, Clarify, Completed, ContinueInterrupted, Correction,
-                          HumanHandoff, InternalError, SkipQuestion)
-from .event_flows.base import EventFlow
 from .flow import Flow
-from .models import LLM, OpenAI
+from .injectables import InvocationContext, invoke_action
+from .instrumentation import (Instrumentation, NoopInstrumentation, InstrumentedTracker, RENDER_STAGE, LLM_STAGE,
+                              PARSE_STAGE, ACTION_STAGE, SUMMARY_STAGE)
+from .models import LLM, command_list_max_tokens
+from .registry import FlowRegistry
 from .session import Session
-from .tracker import Tracker, RedisTracker, ProxyTracker
+from .summary import ConversationSummarizer
+from .tracker import Tracker, AsyncTracker, AsyncTrackerAdapter, TurnState, PreparedTurn
 from .types import Categorical
-from .utils import debug, extract_digits, strtobool
+from .utils import extract_digits, strtobool, run_sync, iterate_sync, aiterate
+
+if TYPE_CHECKING:
+    from .retrieval import FlowRetriever
+
+logger = logging.getLogger(__name__)
 
 
 def assert_is_action(action: Any):
@@ -34,26 +49,6 @@ def assert_is_action(action: Any):
     assert isinstance(action, ActionFunction), "Action must be an instance of ActionFunction."
 
 
-def _find_flow_by_name(flows: Sequence[Flow], name: str):
-    """
-    Find a flow by its name.
-    """
-    return next((flow for flow in flows if flow.name == name), None)
-
-
-def _find_internal_flow(flows: Sequence[Flow], internal_flow_cls: Type[Flow]):
-    """
-    Check if the user has overriden the default internal flow. If so, return the overriden flow. Otherwise, return the
-    default internal flow.
-    """
-    overriden_flow = next((flow for flow in flows if isinstance(flow, internal_flow_cls)), None)
-
-    if overriden_flow is not None:
-        return overriden_flow
-
-    return internal_flow_cls()
-
-
 def _listify_actions(actions: ChainAction | Action):
     """
     Convert the actions to a list of actions. If the actions is a ChainAction, return the actions. Otherwise, return a
@@ -111,7 +106,7 @@ def _parse_flow_slot_value(flow_slot: FlowSlot, value: str):
 
             flow_slot_value = matches[0]
         else:
-            debug("No match found for value", value, "in slot", flow_slot.name)
+            logger.debug("No match found for value %s in slot %s", value, flow_slot.name)
     else:
         raise ValueError(f"Invalid slot type: {flow_slot.type}")
 
@@ -144,41 +139,43 @@ def _get_last_assistant_messages(conversation: List[Dict[str, str]]) -> List[str
     return list(reversed(last_bot_messages))
 
 
-def _run_commands(commands: List, flows: List[Flow], event_flows: Dict[str, Flow], tracker: RedisTracker,
-                  session_id: str, current_flow: Optional[Flow] = None):
+async def _run_commands(commands: Iterable | AsyncIterable, registry: FlowRegistry, tracker: AsyncTracker,
+                        session_id: str, current_flow: Optional[Flow] = None,
+                        instrumentation: Optional[Instrumentation] = None):
     """
     This function processes a list of commands, updates the tracker and yields responses.
 
     Parameters
     ----------
-    commands: List
-        A list of commands to be processed.
-    flows: List[Flow]
-        A list of available flows.
-    event_flows: Dict[str, Flow]
-        A dictionnary of flows by event name.
-    tracker RedisTracker:
+    commands: Iterable | AsyncIterable
+        The commands to be processed. They may be streamed, in which case each command is applied as soon as it is
+        received.
+    registry: FlowRegistry
+        The registry of available flows.
+    tracker AsyncTracker:
         The tracker object to keep track of the state.
     session_id str:
         The session ID.
     current_flow: Optional[Flow]
         The current flow, defaults to None.
+    instrumentation: Optional[Instrumentation]
+        The instrumentation timing each action function, defaults to none.
 
     Yields
     ------
     str
         The bot's response to the user.
     """
-    yield from ()  # HACK: Convert to iterator, even if there's nothing to yield, i.e. no replies / ask
+    if instrumentation is None:
+        instrumentation = NoopInstrumentation()
 
-    all_flows = flows + list(event_flows.values())
+    event_flows = registry.event_flows
 
     # Load previous actions
-    next_actions_with_flows = tracker.get_current_actions(session_id)
+    next_actions_with_flows = await tracker.get_current_actions(session_id)
     next_actions_with_flows = deque(next_actions_with_flows)  # Convert to deque for efficient popping
 
-    debug("Initial actions", next_actions_with_flows)
-    debug("LLM Commands", commands)
+    logger.debug("Initial actions %s", next_actions_with_flows)
 
     # Check if the next action is an ask, we save the slot requested to be able to check if the user has answered
     # to the ask. This is used for the functionality `ask_before_filling`. We need to know if the user has answered
@@ -190,33 +187,14 @@ def _run_commands(commands: List, flows: List[Flow], event_flows: Dict[str, Flow
         if isinstance(following_next_action, Ask):
             flow_slot_requested = (following_next_action.slot, following_flow_name)
 
-    # If there are no commands predicted, start the CannotHandle flow
-    if not commands:
-        cannot_handle_flow = event_flows["cannot_handle"]
-        next_actions_with_flows.appendleft((cannot_handle_flow.start, cannot_handle_flow.name))
-
-    # Sometimes the commands are set to cancel the flow and start the same flow again, this will never be the
-    # behaviour we want, so we need to check if the flow is already in the current actions and remove it
-    # from the commands
-    if current_flow:
-        # Filter if both CancelFlowCommand and StartFlowCommand with same flow name are present
-        start_command_index = next((i for i, command in enumerate(commands) if isinstance(command, StartFlowCommand) and
-                                    command.name == current_flow.name), None)
-        cancel_command_index = next((i for i, command in enumerate(commands) if isinstance(command, CancelFlowCommand)), None)
-
-        if start_command_index is not None and cancel_command_index is not None:
-            debug("Cancel and start flow commands found, removing them from the commands.")
-
-            commands = [command for i, command in enumerate(commands) if i not in [start_command_index,
-                                                                                   cancel_command_index]]
-
-    # The LLM
-
-    debug("Commands", commands)
-
     backtrack_flow_slot = None
 
-    for command in commands:
+    async def apply_command(command):
+        """
+        Update the tracker and the actions to run for a command, yielding the responses it has right away.
+        """
+        nonlocal current_flow, next_actions_with_flows, backtrack_flow_slot, flow_slot_requested
+
         if isinstance(command, SetSlotCommand):
             flow_slot_value = None
 
@@ -227,20 +205,20 @@ def _run_commands(commands: List, flows: List[Flow], event_flows: Dict[str, Flow
                 if flow_slot:
                     flow_slot_value = _parse_flow_slot_value(flow_slot, command.value)
                 else:
-                    debug(f"Slot {command.name} not found in flow {current_flow.name}.")
+                    logger.debug("Slot %s not found in flow %s.", command.name, current_flow.name)
             else:
-                debug(f"No current flow to set slot {command.name} with value {command.value}.")
+                logger.debug("No current flow to set slot %s with value %s.", command.name, command.value)
 
             if flow_slot_value is None:
-                debug(f"Invalid slot value for slot {command.name} with value {command.value}.")
+                logger.debug("Invalid slot value for slot %s with value %s.", command.name, command.value)
 
                 cannot_handle_flow = event_flows["cannot_handle"]
                 next_actions_with_flows.appendleft((cannot_handle_flow.start, cannot_handle_flow.name))
             else:
                 # We need to check if it's a correction so we back-track the flow
-                previous_flow_slot_value = tracker.get_flow_slot(session_id, current_flow.name, command.name)
+                previous_flow_slot_value = await tracker.get_flow_slot(session_id, current_flow.name, command.name)
 
-                tracker.set_flow_slot(session_id, current_flow.name, command.name, flow_slot_value)
+                await tracker.set_flow_slot(session_id, current_flow.name, command.name, flow_slot_value)
 
                 if previous_flow_slot_value is not None:  # not a correction
                     # What if there's multiple updates to different slots?
@@ -251,8 +229,9 @@ def _run_commands(commands: List, flows: List[Flow], event_flows: Dict[str, Flow
                         backtrack_flow_slot = current_flow.get_slot(command.name)
 
                         # Replace the current actions with the following
-                        following_actions = tracker.get_following_actions_for_flow_slot(session_id, current_flow.name,
-                                                                                        command.name)
+                        following_actions = await tracker.get_following_actions_for_flow_slot(session_id,
+                                                                                              current_flow.name,
+                                                                                              command.name)
                         following_actions = [(action, current_flow.name) for action in following_actions]
                         next_actions_with_flows = deque(following_actions)
                     else:
@@ -262,14 +241,14 @@ def _run_commands(commands: List, flows: List[Flow], event_flows: Dict[str, Flow
                         new_backtrack_flow_slot_index = flow_slots.index(new_backtrack_flow_slot)
 
                         if new_backtrack_flow_slot_index < previous_backtrack_flow_slot_index:
-                            debug(f"Backtracking to slot {new_backtrack_flow_slot.name}.")
+                            logger.debug("Backtracking to slot %s.", new_backtrack_flow_slot.name)
                             # The new slot is before the previous slot, we backtrack this slot
                             backtrack_flow_slot = new_backtrack_flow_slot
 
                             # Replace the current actions with the following
-                            following_actions = tracker.get_following_actions_for_flow_slot(session_id,
-                                                                                            current_flow.name,
-                                                                                            command.name)
+                            following_actions = await tracker.get_following_actions_for_flow_slot(session_id,
+                                                                                                  current_flow.name,
+                                                                                                  command.name)
                             following_actions = [(action, current_flow.name) for action in following_actions]
                             next_actions_with_flows = deque(following_actions)
 
@@ -284,12 +263,12 @@ def _run_commands(commands: List, flows: List[Flow], event_flows: Dict[str, Flow
             else:
                 if current_flow.name == command.name:
                     # The flow is already running, we do nothing. We should not start the same flow again.
-                    continue
+                    return
 
                 continue_interrupted_flow = event_flows["continue_interrupted"]
                 next_actions_with_flows.appendleft((continue_interrupted_flow.start, continue_interrupted_flow.name))
 
-            current_flow = _find_flow_by_name(all_flows, command.name)
+            current_flow = registry.get(command.name)
 
             if current_flow is None:
                 warnings.warn(f"Flow '{command.name}' not found.")
@@ -318,7 +297,7 @@ def _run_commands(commands: List, flows: List[Flow], event_flows: Dict[str, Flow
             # If there's an ask, we only repeat the ask, so we do nothing here
             if not flow_slot_requested:
                 #  We get the last messages from the assistant and repeat it.
-                conversation = tracker.get_conversation(session_id)
+                conversation = await tracker.get_conversation(session_id)
                 last_bot_messages = _get_last_assistant_messages(conversation)
 
                 if last_bot_messages:
@@ -334,16 +313,63 @@ def _run_commands(commands: List, flows: List[Flow], event_flows: Dict[str, Flow
         else:
             raise ValueError(f"Invalid command: {command}")
 
+    # The commands are applied as soon as they are predicted. Sometimes the commands are set to cancel the flow and
+    # start the same flow again, this will never be the behaviour we want. Once one of them is predicted, the following
+    # commands are held back until all the commands are known, so both can be removed.
+    initial_flow = current_flow
+    num_commands = 0
+    held_back_commands = None
+
+    async for command in aiterate(commands):
+        logger.debug("LLM Command %s", command)
+
+        num_commands += 1
+
+        if held_back_commands is None and initial_flow is not None and \
+                (isinstance(command, CancelFlowCommand) or
+                 (isinstance(command, StartFlowCommand) and command.name == initial_flow.name)):
+            held_back_commands = []
+
+        if held_back_commands is not None:
+            held_back_commands.append(command)
+            continue
+
+        async for bot_response in apply_command(command):
+            yield bot_response
+
+    # If there are no commands predicted, start the CannotHandle flow
+    if not num_commands:
+        cannot_handle_flow = event_flows["cannot_handle"]
+        next_actions_with_flows.appendleft((cannot_handle_flow.start, cannot_handle_flow.name))
+
+    if held_back_commands:
+        # Filter if both CancelFlowCommand and StartFlowCommand with same flow name are present
+        start_command_index = next((i for i, command in enumerate(held_back_commands)
+                                    if isinstance(command, StartFlowCommand) and command.name == initial_flow.name),
+                                   None)
+        cancel_command_index = next((i for i, command in enumerate(held_back_commands)
+                                     if isinstance(command, CancelFlowCommand)), None)
+
+        if start_command_index is not None and cancel_command_index is not None:
+            logger.debug("Cancel and start flow commands found, removing them from the commands.")
+
+            held_back_commands = [command for i, command in enumerate(held_back_commands)
+                                  if i not in [start_command_index, cancel_command_index]]
+
+        for command in held_back_commands:
+            async for bot_response in apply_command(command):
+                yield bot_response
+
     while next_actions_with_flows:
         action, action_flow_name = next_actions_with_flows.popleft()
 
         if isinstance(action, Reply):
             yield action.message
         elif isinstance(action, Ask):
-            action_flow = _find_flow_by_name(all_flows, action_flow_name)
+            action_flow = registry.get(action_flow_name)
 
             flow_slot = action_flow.get_slot(action.slot.name)
-            flow_slot_value = tracker.get_flow_slot(session_id, action_flow_name, action.slot.name)
+            flow_slot_value = await tracker.get_flow_slot(session_id, action_flow_name, action.slot.name)
 
             # We need to check if we must ask the user for the slot value.
             # If the slot is already set, we skip the ask.
@@ -364,27 +390,18 @@ def _run_commands(commands: List, flows: List[Flow], event_flows: Dict[str, Flow
                 next_actions_with_flows.appendleft((action, action_flow_name))  # Re-add the ask task to the queue
                 break  # We don't want to run the next actions until the user responds
         elif isinstance(action, ActionFunction):
-            action_flow = _find_flow_by_name(all_flows, action_flow_name)
+            action_flow = registry.get(action_flow_name)
 
             # The function may be a string, usually because it's from tracker
             if isinstance(action.function, str):
                 # If the function is a string, replace the action with the actual function
-                action = getattr(action_flow, action.function, None)
-
-            # Dynamically inject the available parameters to the action function.
-            # If the action function doesn't need any of the parameters, they will be ignored.
-            available_params = {
-                "tracker": ProxyTracker(tracker, session_id, action_flow)
-            }
-
-            # Parse the parameters of the action function
-            action_func_signature = inspect.signature(action.function)
-            action_func_args_to_pass = {}
-            for param_name, param_value in action_func_signature.parameters.items():
-                if param_name in available_params:
-                    action_func_args_to_pass[param_name] = available_params[param_name]
-
-            action_func_next_actions = action.function(action_flow, **action_func_args_to_pass)
+                action = action_flow.get_action(action.function)
+
+            # The parameters of the action function are injected following the plan made when it was decorated.
+            invocation_context = InvocationContext(session_id=session_id, flow=action_flow, tracker=tracker)
+            with instrumentation.span(ACTION_STAGE, function=action.function.__name__):
+                action_func_next_actions = await invoke_action(action, invocation_context)
+
             # The action may return a single action or a list of actions
             action_func_next_actions = _listify_actions(action_func_next_actions)
             action_func_next_actions = [(action, action_flow.name) for action in action_func_next_actions]
@@ -394,12 +411,12 @@ def _run_commands(commands: List, flows: List[Flow], event_flows: Dict[str, Flow
             for index in ask_indices:
                 following_actions = [action for action, flow_name in action_func_next_actions[index + 1:]]
                 ask_flow_slot, ask_flow_name = action_func_next_actions[index]
-                tracker.save_following_actions_for_flow_slot(session_id, ask_flow_name, ask_flow_slot.slot.name,
-                                                             following_actions)
+                await tracker.save_following_actions_for_flow_slot(session_id, ask_flow_name,
+                                                                   ask_flow_slot.slot.name, following_actions)
 
             next_actions_with_flows.extendleft(reversed(action_func_next_actions))  # Prepend actions to queue
         elif isinstance(action, CallFlow):
-            flow_to_call = _find_flow_by_name(all_flows, action.flow_name)
+            flow_to_call = registry.get(action.flow_name)
             next_actions_with_flows.appendleft((flow_to_call.start, flow_to_call.name))
         elif isinstance(action, End):
             # Remove all following actions for the current flow
@@ -410,9 +427,9 @@ def _run_commands(commands: List, flows: List[Flow], event_flows: Dict[str, Flow
     following = next_actions_with_flows[0] if next_actions_with_flows else None
 
     if following is None:  # no more actions to run
-        tracker.delete_current_actions(session_id)
-        tracker.delete_flow_slots(session_id)  # Delete all flow slots
-        tracker.delete_following_actions(session_id)  # Delete all following actions for flow slots
+        await tracker.delete_current_actions(session_id)
+        await tracker.delete_flow_slots(session_id)  # Delete all flow slots
+        await tracker.delete_following_actions(session_id)  # Delete all following actions for flow slots
     else:
         following_next_action, following_flow_name = following
 
@@ -420,116 +437,796 @@ def _run_commands(commands: List, flows: List[Flow], event_flows: Dict[str, Flow
         if isinstance(following_next_action, Ask):
             yield following_next_action.prompt
 
-        tracker.save_current_actions(session_id, next_actions_with_flows)
+        await tracker.save_current_actions(session_id, next_actions_with_flows)
+
+
+class BatchError(Exception):
+    """
+    Raised by `Bot.amessage_batch` when some turns failed, once all the other turns have been run and committed.
+
+    Attributes:
+        responses: The responses to each message, None for the turns that failed and the later turns of their
+            sessions, which aren't run.
+        errors: The error of each turn that failed, by its index in the batch.
+    """
+
+    def __init__(self, responses: List[Optional[List[str]]], errors: Dict[int, Exception]):
+        super().__init__(f"{len(errors)} of {len(responses)} turns of the batch failed.")
+        self.responses = responses
+        self.errors = errors
+
+
+@dataclass
+class _Turn:
+    """
+    The state of a conversation turn once the commands have been predicted, or while they are streamed.
+    """
+    state: TurnState
+    commands: List | AsyncIterator
+    current_flow: Optional[Flow]
 
 
 class Bot:
+    """
+    A conversational assistant. The bot holds no state of the conversations, it's kept by the tracker, so a single
+    instance serves any number of sessions and can be shared across threads and asyncio tasks.
 
-    def __init__(self, session_id: Optional[str] = None, tracker: Optional[Tracker] = None,
-                 model: Optional[LLM] = None, flows: Optional[List[Flow]] = None):
-        if session_id is None:
-            session_id = str(uuid.uuid4())
+    Two turns of the same session running at the same time, e.g. when a message is delivered twice, would overwrite
+    each other's state. With a `concurrency_policy`, every turn locks its session in the tracker:
+
+    - "queue": the message waits for the running turn to finish, up to `lock_timeout` seconds.
+    - "reject": `SessionBusyError` is raised right away.
+    - "merge": the message waits, and all the messages received in the meantime are run as a single turn. The calls
+      whose message was merged into another turn get no responses.
+
+    The lock expires after `lock_ttl` seconds in case the turn never finishes. A turn committed after losing its lock
+    raises `SessionLockLostError` and its changes are discarded.
+
+    With an `instrumentation`, the stages of every turn are timed: the rendering of the prompt, the call to the model,
+    the parsing of the commands, each call to the tracker and each action function.
+
+    With a `summarizer`, the older messages of long conversations are folded into a summary in the background, after
+    the turns, and the prompt has the summary followed by the latest messages. See `flush_summaries` to wait for them.
+
+    When a turn stops at an ask, the next message is most likely the answer, so the part of the next turn that doesn't
+    depend on the message, e.g. the prompt without the message, is prepared once the responses have been yielded and
+    committed with the current actions. It's only done if the tracker supports it, see
+    `Tracker.supports_prepared_turns`.
+
+    The completions of the command prompts are capped to `command_max_tokens`, if the model accepts call options, since
+    a command list is only a few short lines.
+    """
+
+    def __init__(self, tracker: Optional[Tracker | AsyncTracker] = None, model: Optional[LLM] = None,
+                 flows: Optional[List[Flow]] = None, history_size: int = 20,
+                 command_cache: Optional[CommandCache] = None, rule_classifier: Optional[RuleBasedClassifier] = None,
+                 flow_retriever: Optional["FlowRetriever"] = None, concurrency_policy: Optional[str] = None,
+                 lock_ttl: float = 60.0, lock_timeout: float = 30.0,
+                 instrumentation: Optional[Instrumentation] = None,
+                 summarizer: Optional[ConversationSummarizer] = None,
+                 command_max_tokens: Optional[int] = command_list_max_tokens()):
+        assert concurrency_policy is None or concurrency_policy in CONCURRENCY_POLICIES, \
+            f"Invalid concurrency policy: {concurrency_policy}"
 
         if flows is None:
             flows = []
 
-        assert [isinstance(flow, Flow) for flow in flows], "All flows must be subclasses of Flow."
-
+        # The defaults are imported here, so their clients are only imported if they're used
         if tracker is None:
+            from .tracker.redis import RedisTracker
             tracker = RedisTracker()
 
         if model is None:
+            from .models.openai import OpenAI
             model = OpenAI()
 
+        if instrumentation is None:
+            instrumentation = NoopInstrumentation()
+
         self.tracker = tracker
         self.model = model
-        self.session = Session(session_id, tracker)
-        self.flows = flows
+        self.command_cache = command_cache
+        self.rule_classifier = rule_classifier
+        self.concurrency_policy = concurrency_policy
+        self.lock_ttl = lock_ttl
+        self.lock_timeout = lock_timeout
+        self.instrumentation = instrumentation
+        self.summarizer = summarizer
+        self.command_max_tokens = command_max_tokens
+        self.registry = FlowRegistry(flows)
+        self._bind_codec_registry()
+
+        self._prompt_renderer = PromptRenderer(self.registry.user_flows, last_n_messages=history_size,
+                                               retriever=flow_retriever)
+
+        # Number of turns by the number of tracker round trips they made
+        self.round_trips_per_turn = Counter()
+        self._round_trips_lock = threading.Lock()
+
+        # Summaries running in the background, at most one per session
+        self._summarizing_sessions = set()
+        self._summary_tasks = set()
+        self._summary_futures = set()
+        self._summary_executor = None
+        self._summary_lock = threading.Lock()
+
+        if isinstance(tracker, AsyncTracker):
+            self._async_tracker = tracker
+        else:
+            self._async_tracker = AsyncTrackerAdapter(tracker)
+
+        # Wrapped only when enabled, so the calls to the tracker cost nothing more otherwise
+        if instrumentation.enabled:
+            self._async_tracker = InstrumentedTracker(self._async_tracker, instrumentation)
+
+    @property
+    def flows(self) -> Tuple[Flow, ...]:
+        """
+        The flows of the bot, in order of registration. It's read-only, see `add_flow`, or assign a new list of flows to
+        replace them all.
+        """
+        return tuple(self.registry.flows)
+
+    @flows.setter
+    def flows(self, flows: List[Flow]):
+        self.registry = FlowRegistry(flows)
+        self._bind_codec_registry()
+        self._prompt_renderer.set_available_flows(self.registry.user_flows)
+
+    def _bind_codec_registry(self):
+        # The codec of the stored actions, if the tracker has one, resolves their flows through the registry
+        codec = getattr(self.tracker, "codec", None)
+        if codec is not None:
+            codec.bind_registry(self.registry)
 
     def add_flow(self, flow: Flow):
-        self.flows.append(flow)
+        """
+        Add a flow. The flows are meant to be added while setting up the bot, not while it's serving sessions.
+        """
+        self.registry.add(flow)
+        self._prompt_renderer.set_available_flows(self.registry.user_flows)
+
+    def _get_command_call_options(self) -> dict:
+        if self.command_max_tokens is None or not self.model.supports_call_options:
+            return {}
+
+        return {"max_tokens": self.command_max_tokens}
 
-    def message(self, message, stream=False):
+    def session(self, session_id: Optional[str] = None) -> Session:
         """
-        Listen to the user.
+        Get a handle to talk to the bot in a session.
 
         Args:
-            message: The message from the user.
-            stream: Whether to stream the responses.
+            session_id: The session ID. If not given, a new session is created.
 
         Returns:
-            The responses.
+            The session.
         """
-        if not self.flows:
-            warnings.warn("No flows available. Please add flows to the bot.")
+        if session_id is None:
+            session_id = str(uuid.uuid4())
 
-            if stream:
-                return iter(())  # Return an empty iterator
-            else:
-                return []
+        return Session(session_id, self)
 
-        current_conversation = self.tracker.get_conversation(self.session.id)
+    async def _prepare_turn(self, session_id: str, message: str, blocking: bool, stream: bool = False,
+                            turn_state: Optional[TurnState] = None) -> Optional[_Turn]:
+        """
+        Save the user message and predict the commands for it.
+
+        Args:
+            session_id: The session ID.
+            message: The message from the user.
+            blocking: Whether to call the model synchronously, so the turn can be driven without an event loop.
+            stream: Whether to stream the completion of the model. The commands of the turn are then an asynchronous
+                iterator that yields each command as soon as it is predicted.
+            turn_state: The state of the session, if already loaded.
 
-        self.tracker.add_message_to_conversation(self.session.id, Role.USER, message)
+        Returns:
+            The turn, or None if there are no flows to run.
+        """
+        if not len(self.registry):
+            warnings.warn("No flows available. Please add flows to the bot.")
+            return None
 
-        debug("Current conversation", current_conversation)
+        if turn_state is None:
+            turn_state = await self._async_tracker.load_turn_state(session_id)
 
-        event_flows = {
-            "cancel": _find_internal_flow(self.flows, CancelFlow),
-            "cannot_handle": _find_internal_flow(self.flows, CannotHandle),
-            "chit_chat": _find_internal_flow(self.flows, ChitChat),
-            "clarify": _find_internal_flow(self.flows, Clarify),
-            "completed": _find_internal_flow(self.flows, Completed),
-            "continue_interrupted": _find_internal_flow(self.flows, ContinueInterrupted),
-            "correction": _find_internal_flow(self.flows, Correction),
-            "human_handoff": _find_internal_flow(self.flows, HumanHandoff),
-            "internal_error": _find_internal_flow(self.flows, InternalError),
-            "skip_question": _find_internal_flow(self.flows, SkipQuestion)
-        }
+        current_conversation = await turn_state.get_conversation(session_id)
 
-        user_flows = [flow for flow in self.flows if not isinstance(flow, EventFlow)]
+        await turn_state.add_message_to_conversation(session_id, Role.USER, message)
 
-        all_flows = user_flows + list(event_flows.values())
+        logger.debug("Current conversation %s", current_conversation)
 
-        current_actions = self.tracker.get_current_actions(self.session.id)
+        current_actions = await turn_state.get_current_actions(session_id)
 
         current_flow = None
         current_slot = None
         current_flow_slot_values = None
+        prepared_turn = None
 
         if len(current_actions) > 0:
             following_action, following_flow_name = current_actions[0]
 
-            current_flow = _find_flow_by_name(all_flows, following_flow_name)
-            current_flow_slot_values = self.tracker.get_flow_slots(self.session.id, current_flow.name)
+            current_flow = self.registry.get(following_flow_name)
 
             if isinstance(following_action, Ask):
                 current_slot = current_flow.get_slot(following_action.slot.name)
+                prepared_turn = self._get_prepared_turn(turn_state, current_flow, current_slot)
+
+            if prepared_turn is None:
+                current_flow_slot_values = await turn_state.get_flow_slots(session_id, current_flow.name)
+            else:
+                current_flow_slot_values = prepared_turn.flow_slot_values
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Current flow %s", current_flow.name if current_flow else None)
+            logger.debug("Current slot %s", current_slot.name if current_slot else None)
+
+        if self.rule_classifier is not None:
+            command_list = self.rule_classifier.classify(message, current_slot)
+
+            if command_list is not None:
+                logger.debug("Rule-based commands %s", command_list)
+                return _Turn(state=turn_state, commands=command_list, current_flow=current_flow)
+
+        conversation_summary = None
+        if self.summarizer is not None:
+            conversation_summary = await turn_state.get_summary(session_id)
+
+        # The conversation in the prepared prompt is outdated if messages have been added or summarized in the meantime,
+        # or if the tracker trimmed it shorter than the prompt when it was committed. The count is taken without the user
+        # message, which was just added
+        if prepared_turn is not None and (
+                prepared_turn.message_count != await turn_state.get_message_count(session_id) - 1 or
+                prepared_turn.num_messages != len(current_conversation[-self._prompt_renderer.last_n_messages:]) or
+                prepared_turn.conversation_summary != conversation_summary):
+            prepared_turn = None
+
+        logger.debug("Prepared turn %s", prepared_turn is not None)
+
+        with self.instrumentation.span(RENDER_STAGE, prepared=prepared_turn is not None):
+            if prepared_turn is None:
+                prompt = self._prompt_renderer.render(
+                    current_flow=current_flow,
+                    current_slot=current_slot,
+                    current_conversation=current_conversation,
+                    latest_user_message=message,
+                    current_flow_slot_values=current_flow_slot_values,
+                    conversation_summary=conversation_summary
+                )
+            else:
+                prompt = self._prompt_renderer.render_prepared(prepared_turn.prompt_parts, current_flow, message)
+
+        response = None
+        cache_key = None
+
+        if self.command_cache is not None:
+            cache_key = self.command_cache.make_key(
+                prompt=prompt,
+                flow_catalogue=self._prompt_renderer.flow_catalogue,
+                current_flow=current_flow.name if current_flow else None,
+                current_slot=current_slot.name if current_slot else None,
+                message=message
+            )
+
+            if blocking:
+                response = self.command_cache.get(cache_key)
+            else:
+                response = await self.command_cache.aget(cache_key)
+
+            logger.debug("Command cache hit %s", response is not None)
 
-        debug("Current flow", current_flow.name if current_flow else None)
-        debug("Current slot", current_slot.name if current_slot else None)
+        if response is not None:
+            with self.instrumentation.span(PARSE_STAGE):
+                command_list = parse_command_prompt_response(response)
+        elif stream:
+            # The commands are run while the model is still predicting them
+            command_list = self._stream_commands(prompt, cache_key, blocking)
+        else:
+            with self.instrumentation.span(LLM_STAGE, prompt_chars=len(prompt)) as span:
+                if blocking:
+                    response = self.model(prompt, **self._get_command_call_options())
+                else:
+                    response = await self.model.acall(prompt, **self._get_command_call_options())
+
+                span.set_attribute("completion_chars", len(response))
+
+            with self.instrumentation.span(PARSE_STAGE):
+                command_list = parse_command_prompt_response(response)
+
+            await self._cache_response(cache_key, response, command_list, blocking)
+
+        return _Turn(state=turn_state, commands=command_list, current_flow=current_flow)
+
+    @staticmethod
+    def _get_prepared_turn(turn_state: TurnState, current_flow: Flow, current_slot: FlowSlot) -> Optional[PreparedTurn]:
+        """
+        Get the turn prepared by the previous one, if it was prepared for the ask of the current slot.
+        """
+        prepared_turn = turn_state.prepared_turn
 
-        prompt = render_prompt(
-            available_flows=user_flows,
-            current_flow=current_flow,
-            current_slot=current_slot,
-            current_conversation=current_conversation,
-            latest_user_message=message,
-            current_flow_slot_values=current_flow_slot_values
+        if prepared_turn is None or prepared_turn.flow_name != current_flow.name or \
+                prepared_turn.slot_name != current_slot.name:
+            return None
+
+        return prepared_turn
+
+    async def _prepare_next_turn(self, turn_state: TurnState):
+        """
+        Prepare the next turn of a session if the turn stopped at an ask, to be committed with the current actions.
+
+        Args:
+            turn_state: The state of the turn, once its commands have been run.
+        """
+        if not self._async_tracker.supports_prepared_turns:
+            return
+
+        session_id = turn_state.session_id
+        current_actions = await turn_state.get_current_actions(session_id)
+
+        if not current_actions or not isinstance(current_actions[0][0], Ask):
+            return
+
+        ask, flow_name = current_actions[0]
+
+        current_flow = self.registry.get(flow_name)
+        current_slot = current_flow.get_slot(ask.slot.name)
+        current_flow_slot_values = await turn_state.get_flow_slots(session_id, flow_name)
+        current_conversation = await turn_state.get_conversation(session_id)
+
+        conversation_summary = None
+        if self.summarizer is not None:
+            conversation_summary = await turn_state.get_summary(session_id)
+
+        if self.rule_classifier is not None:
+            self.rule_classifier.get_slot_parser(current_slot)
+
+        turn_state.changes.prepared_turn = PreparedTurn(
+            flow_name=flow_name,
+            slot_name=current_slot.name,
+            flow_slot_values=current_flow_slot_values,
+            prompt_parts=self._prompt_renderer.prepare(current_flow, current_slot, current_flow_slot_values,
+                                                       current_conversation, conversation_summary),
+            message_count=await turn_state.get_message_count(session_id),
+            num_messages=len(current_conversation[-self._prompt_renderer.last_n_messages:]),
+            conversation_summary=conversation_summary
         )
 
-        response = self.model(prompt)
+    async def _stream_commands(self, prompt: str, cache_key: Optional[str], blocking: bool) -> AsyncIterator:
+        """
+        Stream the completion of the model for a prompt.
 
-        command_list = parse_command_prompt_response(response)
+        Args:
+            prompt: The command prompt.
+            cache_key: The key of the command cache for the prompt, if any.
+            blocking: Whether to call the model synchronously.
 
-        def response_generator():
-            for bot_response in _run_commands(commands=command_list, flows=user_flows, event_flows=event_flows,
-                                              tracker=self.tracker, session_id=self.session.id,
-                                              current_flow=current_flow):
+        Yields:
+            Each command as soon as its line of the completion is complete.
+        """
+        parser = CommandStreamParser()
+
+        if blocking:
+            chunks = aiterate(self.model.stream(prompt, **self._get_command_call_options()))
+        else:
+            chunks = self.model.astream(prompt, **self._get_command_call_options())
+
+        response = []
+        command_list = []
+
+        # The commands are applied between the chunks, so the model and the parser are timed chunk by chunk
+        timed = self.instrumentation.enabled
+        start_time = time.time()
+        llm_duration = 0.0
+        parse_duration = 0.0
+
+        chunk_start = time.perf_counter() if timed else 0.0
+        async for chunk in chunks:
+            response.append(chunk)
+
+            if timed:
+                parse_start = time.perf_counter()
+                llm_duration += parse_start - chunk_start
+                commands = parser.feed(chunk)
+                parse_duration += time.perf_counter() - parse_start
+            else:
+                commands = parser.feed(chunk)
+
+            for command in commands:
+                command_list.append(command)
+                yield command
+
+            if timed:
+                chunk_start = time.perf_counter()
+
+        if timed:
+            parse_start = time.perf_counter()
+            llm_duration += parse_start - chunk_start
+            commands = parser.close()
+            parse_duration += time.perf_counter() - parse_start
+
+            completion = "".join(response)
+            self.instrumentation.record_span(LLM_STAGE, start_time, llm_duration, prompt_chars=len(prompt),
+                                             completion_chars=len(completion))
+            self.instrumentation.record_span(PARSE_STAGE, start_time, parse_duration)
+        else:
+            commands = parser.close()
+
+        for command in commands:
+            command_list.append(command)
+            yield command
+
+        await self._cache_response(cache_key, "".join(response), command_list, blocking)
+
+    async def _cache_response(self, cache_key: Optional[str], response: str, command_list: List, blocking: bool):
+        """
+        Save the response of the model in the command cache, if any.
+        """
+        # Responses without commands are not cached so the model gets another chance next time
+        if self.command_cache is None or not command_list:
+            return
+
+        if blocking:
+            self.command_cache.set(cache_key, response)
+        else:
+            await self.command_cache.aset(cache_key, response)
+
+    async def _run_turn(self, turn: _Turn) -> AsyncIterator[str]:
+        """
+        Run the commands of a turn and save the responses of the bot in the state of the turn.
+
+        Args:
+            turn: The turn returned by `_prepare_turn`.
+
+        Yields:
+            The responses.
+        """
+        session_id = turn.state.session_id
+
+        async for bot_response in _run_commands(commands=turn.commands, registry=self.registry, tracker=turn.state,
+                                                session_id=session_id, current_flow=turn.current_flow,
+                                                instrumentation=self.instrumentation):
+            yield bot_response
+            await turn.state.add_message_to_conversation(session_id, Role.ASSISTANT, bot_response)
+
+    def _record_round_trips(self, turn: _Turn):
+        with self._round_trips_lock:
+            self.round_trips_per_turn[turn.state.round_trips] += 1
+        logger.debug("Tracker round trips %s", turn.state.round_trips)
+
+    async def _respond(self, turn: Optional[_Turn], blocking: bool) -> AsyncIterator[str]:
+        """
+        Run the commands of a turn and save the responses of the bot. The state of the turn is committed to the tracker
+        once all the responses have been yielded.
+
+        Args:
+            turn: The turn returned by `_prepare_turn`.
+            blocking: Whether the turn is driven without an event loop.
+
+        Yields:
+            The responses.
+        """
+        if turn is None:
+            return
+
+        committed = False
+
+        try:
+            async for bot_response in self._run_turn(turn):
                 yield bot_response
-                self.tracker.add_message_to_conversation(self.session.id, Role.ASSISTANT, bot_response)
+
+            await self._prepare_next_turn(turn.state)
+            await self._async_tracker.commit_turn_state(turn.state)
+            committed = True
+        finally:
+            if not committed and turn.state.lock_token is not None:
+                await self._async_tracker.release_turn_lock(turn.state.session_id, turn.state.lock_token)
+
+        self._record_round_trips(turn)
+
+        await self._schedule_summary(turn.state, blocking)
+
+    async def _schedule_summary(self, turn_state: TurnState, blocking: bool):
+        """
+        Summarize the conversation of a committed turn in the background, if it's long enough and it isn't already
+        being summarized. Without an event loop, it's summarized in a worker thread.
+        """
+        if self.summarizer is None:
+            return
+
+        session_id = turn_state.session_id
+        conversation = await turn_state.get_conversation(session_id)
+
+        if not self.summarizer.should_summarize(len(conversation)):
+            return
+
+        with self._summary_lock:
+            if session_id in self._summarizing_sessions:
+                return
+
+            self._summarizing_sessions.add(session_id)
+
+            if blocking:
+                if self._summary_executor is None:
+                    self._summary_executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.summarizer.max_workers, thread_name_prefix="linguista-summary")
+
+                future = self._summary_executor.submit(run_sync, self._summarize(session_id, blocking=True))
+                self._summary_futures.add(future)
+                future.add_done_callback(self._summary_futures.discard)
+            else:
+                task = asyncio.get_running_loop().create_task(self._summarize(session_id, blocking=False))
+                self._summary_tasks.add(task)
+                task.add_done_callback(self._summary_tasks.discard)
+
+    async def _summarize(self, session_id: str, blocking: bool):
+        """
+        Fold the older messages of the conversation of a session into its summary.
+
+        Args:
+            session_id: The session ID.
+            blocking: Whether to call the model synchronously.
+        """
+        try:
+            # The conversation, its summary and its message count are loaded at once, so they're consistent
+            turn_state = await self._async_tracker.load_turn_state(session_id)
+            conversation = await turn_state.get_conversation(session_id)
+
+            # Another summary may have compacted the conversation in the meantime
+            if not self.summarizer.should_summarize(len(conversation)):
+                return
+
+            summary = await turn_state.get_summary(session_id)
+            message_count = await turn_state.get_message_count(session_id)
+            messages = self.summarizer.get_messages_to_summarize(conversation)
+
+            with self.instrumentation.span(SUMMARY_STAGE, messages=len(messages)):
+                if blocking:
+                    summary = self.summarizer.summarize(summary, messages)
+                else:
+                    summary = await self.summarizer.asummarize(summary, messages)
+
+            # The turns committed in the meantime may have trimmed the conversation, so the messages summarized are
+            # identified by their count rather than their position
+            await self._async_tracker.compact_conversation(session_id, summary,
+                                                           message_count - len(conversation) + len(messages))
+
+            logger.debug("Summarized %d messages of session %s", len(messages), session_id)
+        except Exception:
+            logger.warning("Failed to summarize the conversation of session %s", session_id, exc_info=True)
+        finally:
+            with self._summary_lock:
+                self._summarizing_sessions.discard(session_id)
+
+    def flush_summaries(self, timeout: Optional[float] = None):
+        """
+        Wait for the summaries running in the background of the synchronous turns, e.g. before shutting down.
+
+        Args:
+            timeout: Seconds to wait at most. By default, until they finish.
+        """
+        with self._summary_lock:
+            futures = list(self._summary_futures)
+
+        concurrent.futures.wait(futures, timeout=timeout)
+
+    async def aflush_summaries(self):
+        """
+        Wait for the summaries running in the background of the asynchronous turns, e.g. before closing the event loop.
+        """
+        with self._summary_lock:
+            tasks = list(self._summary_tasks)
+
+        await asyncio.gather(*tasks)
+
+    async def _acquire_turn_lock(self, session_id: str, blocking: bool) -> Tuple[int, int]:
+        """
+        Lock a session for a turn, waiting for it with exponential backoff unless the policy is to reject.
+
+        Returns:
+            The fencing token of the lock and the number of attempts to get it.
+        """
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.005
+        attempts = 0
+
+        while True:
+            lock_token = await self._async_tracker.acquire_turn_lock(session_id, self.lock_ttl)
+            attempts += 1
+
+            if lock_token is not None:
+                return lock_token, attempts
+
+            if self.concurrency_policy == REJECT or time.monotonic() + delay > deadline:
+                raise SessionBusyError(f"Session '{session_id}' is running another turn.")
+
+            if blocking:
+                time.sleep(delay)
+            else:
+                await asyncio.sleep(delay)
+
+            delay = min(delay * 2, 0.1)
+
+    async def _start_turn(self, session_id: str, message: str, blocking: bool, stream: bool) -> Optional[_Turn]:
+        """
+        Lock the session following the concurrency policy, if any, and prepare the turn. See `_prepare_turn`.
+
+        Returns:
+            The turn, or None if there's nothing to run.
+        """
+        if self.concurrency_policy is None:
+            return await self._prepare_turn(session_id, message, blocking=blocking, stream=stream)
+
+        round_trips = 0
+
+        if self.concurrency_policy == MERGE:
+            await self._async_tracker.push_pending_message(session_id, message)
+            round_trips += 1
+
+        lock_token, attempts = await self._acquire_turn_lock(session_id, blocking)
+        round_trips += attempts
+
+        try:
+            turn = None
+
+            if self.concurrency_policy == MERGE:
+                pending_messages = await self._async_tracker.pop_pending_messages(session_id)
+                round_trips += 1
+
+                # With nothing pending, the message was merged into the turn of another call
+                message = "\n".join(pending_messages) if pending_messages else None
+
+            if message is not None:
+                turn_state = await self._async_tracker.load_turn_state(session_id)
+                turn_state.lock_token = lock_token
+                turn_state.round_trips += round_trips
+
+                turn = await self._prepare_turn(session_id, message, blocking=blocking, stream=stream,
+                                                turn_state=turn_state)
+        except BaseException:
+            await self._async_tracker.release_turn_lock(session_id, lock_token)
+            raise
+
+        if turn is None:
+            await self._async_tracker.release_turn_lock(session_id, lock_token)
+
+        return turn
+
+    def message(self, session_id: str, message: str, stream: bool = False):
+        """
+        Listen to the user.
+
+        Args:
+            session_id: The session ID.
+            message: The message from the user.
+            stream: Whether to stream the responses.
+
+        Returns:
+            The responses.
+        """
+        if isinstance(self.tracker, AsyncTracker):
+            raise TypeError("The bot has an asynchronous tracker, use `Bot.amessage` instead.")
+
+        turn = run_sync(self._start_turn(session_id, message, blocking=True, stream=stream))
+
+        response_generator = iterate_sync(self._respond(turn, blocking=True))
+
+        if stream:
+            return response_generator
+        else:
+            return list(response_generator)
+
+    async def amessage(self, session_id: str, message: str, stream: bool = False):
+        """
+        Listen to the user asynchronously.
+
+        Args:
+            session_id: The session ID.
+            message: The message from the user.
+            stream: Whether to stream the responses.
+
+        Returns:
+            The responses, as an asynchronous iterator if `stream` is True.
+        """
+        turn = await self._start_turn(session_id, message, blocking=False, stream=stream)
+
+        response_generator = self._respond(turn, blocking=False)
 
         if stream:
-            return response_generator()
+            return response_generator
         else:
-            return list(response_generator())
+            return [bot_response async for bot_response in response_generator]
+
+    def message_batch(self, turns: Sequence[Tuple[str, str]], concurrency: int = 8) -> List[List[str]]:
+        """
+        Listen to the messages of many sessions at once, e.g. to replay recorded conversations. See `amessage_batch`.
+
+        It runs its own event loop, so it can't be called from a running one. Use `Bot.amessage_batch` instead.
+        """
+        async def run_batch():
+            try:
+                return await self.amessage_batch(turns, concurrency=concurrency)
+            finally:
+                await self.aflush_summaries()  # The summaries would be cancelled when the event loop is closed
+
+        return asyncio.run(run_batch())
+
+    async def amessage_batch(self, turns: Sequence[Tuple[str, str]], concurrency: int = 8) -> List[List[str]]:
+        """
+        Listen to the messages of many sessions at once, e.g. to replay recorded conversations.
+
+        The turns are run in rounds, each with the next message of every session, so the messages of a session are
+        processed in order. In every round, the state of the sessions is loaded and committed in bulk and the turns
+        run concurrently. The sessions are not locked, the batch is expected to be the only one talking to them.
+
+        A turn that fails, e.g. because the model can't be reached, doesn't stop the others. Its changes are discarded
+        and the later messages of its session aren't run, since they would answer a conversation without it.
+
+        Args:
+            turns: The messages as (session ID, message) pairs.
+            concurrency: The maximum number of turns running at the same time.
+
+        Returns:
+            The responses to each message, in the same order as the turns.
+
+        Raises:
+            BatchError: If some turns failed, with the responses to the others and the error of each failed turn.
+        """
+        assert concurrency > 0, "The concurrency must be positive."
+
+        messages_by_session: Dict[str, List[Tuple[int, str]]] = {}
+        for index, (session_id, message) in enumerate(turns):
+            messages_by_session.setdefault(session_id, []).append((index, message))
+
+        responses: List[Optional[List[str]]] = [None for _ in turns]
+        errors: Dict[int, Exception] = {}
+        failed_session_ids = set()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_turn(turn_state: TurnState, message: str) -> Tuple[Optional[_Turn], List[str]]:
+            async with semaphore:
+                turn = await self._prepare_turn(turn_state.session_id, message, blocking=False, turn_state=turn_state)
+
+                if turn is None:
+                    return None, []
+
+                bot_responses = [bot_response async for bot_response in self._run_turn(turn)]
+                await self._prepare_next_turn(turn.state)
+
+                return turn, bot_responses
+
+        num_rounds = max((len(messages) for messages in messages_by_session.values()), default=0)
+
+        for round_index in range(num_rounds):
+            round_session_ids = [session_id for session_id, messages in messages_by_session.items()
+                                 if round_index < len(messages) and session_id not in failed_session_ids]
+            round_messages = [messages_by_session[session_id][round_index] for session_id in round_session_ids]
+
+            turn_states = await self._async_tracker.load_turn_states(round_session_ids)
+
+            results = await asyncio.gather(*[run_turn(turn_state, message)
+                                             for turn_state, (_, message) in zip(turn_states, round_messages)],
+                                           return_exceptions=True)
+
+            round_turns = []
+            for session_id, (index, _), result in zip(round_session_ids, round_messages, results):
+                if not isinstance(result, BaseException):
+                    turn, responses[index] = result
+                    if turn is not None:
+                        round_turns.append(turn)
+                elif isinstance(result, Exception):
+                    logger.warning("Turn %d of the batch failed in session %s", index, session_id, exc_info=result)
+                    errors[index] = result
+                    failed_session_ids.add(session_id)
+                else:
+                    raise result
+
+            await self._async_tracker.commit_turn_states([turn.state for turn in round_turns])
+
+            for turn in round_turns:
+                self._record_round_trips(turn)
+                await self._schedule_summary(turn.state, blocking=False)
+
+        if errors:
+            raise BatchError(responses, errors)
+
+        return responses
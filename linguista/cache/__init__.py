@@ -0,0 +1,14 @@
+#
+#
+#   Command caches
+#
+#
+
+from .base import CommandCache, KEY_BY_PROMPT, KEY_BY_STATE   # noqa: F401
+from .memory import InMemoryCommandCache   # noqa: F401
+from ..utils import lazy_attributes
+
+# Imported when first accessed, so the Redis client is only imported if it's used
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    "RedisCommandCache": ".redis",
+})
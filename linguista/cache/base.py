@@ -0,0 +1,104 @@
+#
+#
+#   Base class for command caches
+#
+#
+
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from ..utils import normalize_message
+
+KEY_BY_PROMPT = "prompt"
+KEY_BY_STATE = "state"
+
+
+class CommandCache(ABC):
+    """
+    Cache of the LLM responses for the command prompt, so repeated turns skip the LLM.
+
+    Args:
+        key_by: What the entries are keyed on. With "prompt", the hash of the whole rendered prompt. With "state",
+            the hash of the flow catalogue, the current flow, the current slot and the normalized user message, which
+            ignores the rest of the conversation and the slot values.
+        ttl: Seconds an entry is kept for. None to keep them until they are evicted.
+    """
+
+    def __init__(self, key_by: str = KEY_BY_PROMPT, ttl: Optional[float] = 60 * 60):
+        assert key_by in (KEY_BY_PROMPT, KEY_BY_STATE), f"Invalid cache key: {key_by}"
+
+        self.key_by = key_by
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def _record_lookup(self, response: Optional[str]):
+        with self._stats_lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+    def make_key(self, prompt: str, flow_catalogue: str, current_flow: Optional[str], current_slot: Optional[str],
+                 message: str) -> str:
+        """
+        Make the key of the entry for a turn.
+
+        Args:
+            prompt: The rendered prompt.
+            flow_catalogue: The rendered catalogue of available flows.
+            current_flow: The name of the current flow, if any.
+            current_slot: The name of the slot asked, if any.
+            message: The message from the user.
+        """
+        if self.key_by == KEY_BY_PROMPT:
+            key_parts = [prompt]
+        else:
+            key_parts = [flow_catalogue, current_flow or "", current_slot or "", normalize_message(message)]
+
+        return hashlib.sha256("\x00".join(key_parts).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Get the LLM response cached for a key, or None if there's none.
+        """
+        response = self._get(key)
+        self._record_lookup(response)
+        return response
+
+    async def aget(self, key: str) -> Optional[str]:
+        """
+        Asynchronous version of `get`.
+        """
+        response = await self._aget(key)
+        self._record_lookup(response)
+        return response
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[str]:
+        ...
+
+    async def _aget(self, key: str) -> Optional[str]:
+        return self._get(key)
+
+    @abstractmethod
+    def set(self, key: str, response: str):
+        """
+        Cache the LLM response for a key.
+        """
+        ...
+
+    async def aset(self, key: str, response: str):
+        """
+        Asynchronous version of `set`.
+        """
+        self.set(key, response)
@@ -0,0 +1,61 @@
+#
+#
+#   In-memory command cache
+#
+#
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from .base import CommandCache, KEY_BY_PROMPT
+
+
+class InMemoryCommandCache(CommandCache):
+    """
+    Command cache in the memory of the process, evicting the least recently used entries.
+
+    Args:
+        max_size: The maximum number of entries.
+        key_by: See `CommandCache`.
+        ttl: See `CommandCache`.
+    """
+
+    def __init__(self, max_size: int = 10_000, key_by: str = KEY_BY_PROMPT, ttl: Optional[float] = 60 * 60):
+        super().__init__(key_by=key_by, ttl=ttl)
+
+        self.max_size = max_size
+
+        self._entries: "OrderedDict[str, Tuple[str, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                return None
+
+            response, expires_at = entry
+
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+
+            return response
+
+    def set(self, key: str, response: str):
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+
+        with self._lock:
+            self._entries[key] = (response, expires_at)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
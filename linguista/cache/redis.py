@@ -0,0 +1,64 @@
+#
+#
+#   Redis command cache
+#
+#
+
+from typing import Optional
+
+from .base import CommandCache, KEY_BY_PROMPT
+
+try:
+    import redis
+    import redis.asyncio
+except ImportError:
+    redis = None
+
+
+def _get_redis_command_key(key: str) -> str:
+    return f"linguista:command_cache:{key}"
+
+
+class RedisCommandCache(CommandCache):
+    """
+    Command cache in Redis, shared by all the workers. The eviction of the entries relies on the TTL and the eviction
+    policy of the Redis instance.
+
+    Args:
+        host: The Redis host.
+        port: The Redis port.
+        db: The Redis database.
+        key_by: See `CommandCache`.
+        ttl: See `CommandCache`.
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0, key_by: str = KEY_BY_PROMPT,
+                 ttl: Optional[float] = 60 * 60):
+        if redis is None:
+            raise ImportError("Please install the 'linguista[redis]' package to use the Redis command cache.")
+
+        super().__init__(key_by=key_by, ttl=ttl)
+
+        self.host = host
+        self.port = port
+        self.db = db
+
+        self._client = redis.Redis(host=host, port=port, db=db)
+        self._async_client = redis.asyncio.Redis(host=host, port=port, db=db)
+
+    def _get(self, key: str) -> Optional[str]:
+        response = self._client.get(_get_redis_command_key(key))
+        return None if response is None else response.decode()
+
+    async def _aget(self, key: str) -> Optional[str]:
+        response = await self._async_client.get(_get_redis_command_key(key))
+        return None if response is None else response.decode()
+
+    def set(self, key: str, response: str):
+        self._client.set(_get_redis_command_key(key), response, px=self._ttl_ms())
+
+    async def aset(self, key: str, response: str):
+        await self._async_client.set(_get_redis_command_key(key), response, px=self._ttl_ms())
+
+    def _ttl_ms(self) -> Optional[int]:
+        return None if self.ttl is None else int(self.ttl * 1000)
@@ -4,7 +4,8 @@
 #
 #
 
-from .command import render_prompt, parse_command_prompt_response   # noqa
+from .command import PromptRenderer, CommandStreamParser, render_prompt, parse_command_prompt_response   # noqa
+from .rules import RuleBasedClassifier  # noqa
 from .cancel_flow import CancelFlowCommand   # noqa
 from .chitchat import ChitChatCommand   # noqa
 from .clarify import ClarifyCommand  # noqa
@@ -6,7 +6,7 @@
 
 import os
 import re
-from typing import Sequence, List, Dict, Optional
+from typing import Sequence, List, Dict, Optional, TYPE_CHECKING
 
 import jinja2
 
@@ -21,140 +21,358 @@ from .repeat import RepeatCommand
 from ..enums import Role
 from ..flow import Flow
 from ..flow_slot import FlowSlot
+from ..models.base import StructuredPrompt
 from ..types import Categorical
 
+if TYPE_CHECKING:
+    from ..retrieval import FlowRetriever
+
 current_dir = os.path.dirname(os.path.realpath(__file__))
 
-with open(os.path.join(current_dir, "command_prompt_template.jinja2")) as fp:
-    COMMAND_PROMPT_TEMPLATE = fp.read()
+# The prefix of the prompt is the same on every turn, so providers can cache it, and the suffix changes every turn
+with open(os.path.join(current_dir, "command_prompt_prefix_template.jinja2")) as fp:
+    COMMAND_PROMPT_PREFIX_TEMPLATE = fp.read()
+
+with open(os.path.join(current_dir, "command_prompt_suffix_template.jinja2")) as fp:
+    COMMAND_PROMPT_SUFFIX_TEMPLATE = fp.read()
+
+with open(os.path.join(current_dir, "flow_catalogue_template.jinja2")) as fp:
+    FLOW_CATALOGUE_TEMPLATE = fp.read()
+
+ROLE_TO_STR = {
+    Role.USER: "USER",
+    Role.ASSISTANT: "AI"
+}
+
+# Fields of the prompt that depend on the user message, left as placeholders when the prompt is prepared in advance
+USER_MESSAGE_FIELD = "user_message"
+FLOW_CATALOGUE_FIELD = "flow_catalogue"
+
+PROMPT_FIELD_RE = re.compile(f"\x00({USER_MESSAGE_FIELD}|{FLOW_CATALOGUE_FIELD})\x00")
+
+
+def _get_placeholder(field_name: str) -> str:
+    return f"\x00{field_name}\x00"
+
+
+def _flow_slot_to_dict(flow_slot: FlowSlot, value: Optional[str] = None):
+    allowed_values = None
+    if flow_slot.type == bool:
+        slot_type = "boolean"
+    elif isinstance(flow_slot.type, Categorical):
+        slot_type = "categorical"
+        allowed_values = ", ".join(flow_slot.type.categories)
+    else:
+        slot_type = {
+            int: "number",
+            str: "text",
+            float: "number",
+        }[flow_slot.type]
+
+    return {
+        "name": flow_slot.name,
+        "description": flow_slot.description,
+        "type": slot_type,
+        "allowed_values": allowed_values,
+        "value": value
+    }
+
+
+def _flow_to_dict(flow: Flow):
+    return {
+        "name": flow.name,
+        "description": flow.description,
+        "slots": [_flow_slot_to_dict(slot) for slot in flow.get_slots()]
+    }
+
+
+class PromptRenderer:
+    """
+    Render the command prompt. The templates are compiled once and the catalogue of available flows is rendered only
+    when the flows change, so the work per turn is limited to the conversation and the current flow.
+
+    The prompt is a `StructuredPrompt`: a prefix with the instructions and the flow catalogue, identical across turns
+    so the providers can cache it, followed by a suffix with the summary of the earlier conversation, if any, the
+    latest messages, the current flow and the user message.
+    With a retriever, the flows listed depend on the user message, so they are in the suffix.
+
+    Args:
+        available_flows: The flows that can be started.
+        last_n_messages: The number of latest messages of the conversation to include in the prompt.
+        retriever: The retriever of the flows relevant to the user message. If given, only the retrieved flows and the
+            current flow are listed in the prompt instead of the whole catalogue.
+    """
+
+    def __init__(self, available_flows: Sequence[Flow] = (), last_n_messages: int = 20,
+                 retriever: Optional["FlowRetriever"] = None):
+        self.last_n_messages = last_n_messages
+        self.retriever = retriever
+
+        self._prefix_template = jinja2.Template(COMMAND_PROMPT_PREFIX_TEMPLATE, keep_trailing_newline=True)
+        self._suffix_template = jinja2.Template(COMMAND_PROMPT_SUFFIX_TEMPLATE)
+        self._flow_catalogue_template = jinja2.Template(FLOW_CATALOGUE_TEMPLATE)
+
+        self._available_flows = []
+        self._flow_catalogue_entries = {}
+        self._flow_catalogue = None
+        self._prompt_prefix = None
+
+        self.set_available_flows(available_flows)
+
+    def set_available_flows(self, available_flows: Sequence[Flow]):
+        """
+        Set the flows that can be started, invalidating the cached flow catalogue and prompt prefix.
+        """
+        self._available_flows = list(available_flows)
+        self._flow_catalogue_entries = {}
+        self._flow_catalogue = None
+        self._prompt_prefix = None
+
+        if self.retriever is not None:
+            self.retriever.index(self._available_flows)
+
+    def _get_flow_catalogue_entry(self, flow: Flow) -> str:
+        entry = self._flow_catalogue_entries.get(flow.name)
+
+        if entry is None:
+            entry = self._flow_catalogue_template.render({"available_flows": [_flow_to_dict(flow)]})
+            self._flow_catalogue_entries[flow.name] = entry
+
+        return entry
+
+    def _render_flow_catalogue(self, flows: Sequence[Flow]) -> str:
+        # Each flow is an iteration of the template loop, so the entries can be rendered once and joined
+        return "".join(self._get_flow_catalogue_entry(flow) for flow in flows)
+
+    @property
+    def flow_catalogue(self) -> str:
+        """
+        The rendered catalogue of available flows.
+        """
+        if self._flow_catalogue is None:
+            self._flow_catalogue = self._render_flow_catalogue(self._available_flows)
+
+        return self._flow_catalogue
+
+    @property
+    def prompt_prefix(self) -> str:
+        """
+        The static prefix of the rendered prompts.
+        """
+        if self._prompt_prefix is None:
+            self._prompt_prefix = self._prefix_template.render({
+                "available_flows": self.flow_catalogue if self.retriever is None else None
+            })
+
+        return self._prompt_prefix
+
+    def get_prompt_flows(self, current_flow: Optional[Flow], latest_user_message: str) -> List[Flow]:
+        """
+        Get the flows listed in the prompt for a turn.
+        """
+        if self.retriever is None:
+            return self._available_flows
+
+        flows = self.retriever.retrieve(latest_user_message)
+
+        if current_flow is not None and current_flow not in flows and current_flow in self._available_flows:
+            flows = [current_flow] + flows
+
+        return flows
+
+    def prepare(self, current_flow: Optional[Flow], current_slot: Optional[FlowSlot],
+                current_flow_slot_values: Optional[Dict[str, str]], current_conversation: List[Dict[str, str]],
+                conversation_summary: Optional[str] = None) -> List[str]:
+        """
+        Render the suffix of the prompt before the user message is known, e.g. while waiting for the answer to an ask.
+        The prompt is then completed with `render_prepared` once the message arrives.
+
+        Returns:
+            The parts of the suffix, alternating the text with the names of the fields that depend on the user message.
+        """
+        if current_flow_slot_values is None:
+            current_flow_slot_values = {}
+
+        user_message = _get_placeholder(USER_MESSAGE_FIELD)
+
+        user_str = f"USER: {user_message}"
+        current_conversation_str = "\n".join([f"{ROLE_TO_STR[message['role']]}: {message['message']}"
+                                              for message in current_conversation[-self.last_n_messages:]] +
+                                             [user_str])
+
+        if current_flow is None:
+            current_flow_name = None
+            current_flow_slots = []
+        else:
+            current_flow_name = current_flow.name
+            current_flow_slots = [_flow_slot_to_dict(slot, current_flow_slot_values.get(slot.name, ""))
+                                  for slot in current_flow.get_slots()]
+
+        if current_slot is None:
+            current_slot_name = None
+            current_slot_description = None
+        else:
+            current_slot_name = current_slot.name
+            current_slot_description = current_slot.description
+
+        if self.retriever is None:
+            flow_catalogue = None  # In the prefix
+        else:
+            flow_catalogue = _get_placeholder(FLOW_CATALOGUE_FIELD)
+
+        suffix = self._suffix_template.render({
+            "available_flows": flow_catalogue,
+            "current_flow": current_flow_name,
+            "current_slot": current_slot_name,
+            "current_slot_description": current_slot_description,
+            "current_flow_slots": current_flow_slots,
+            "current_conversation": current_conversation_str,
+            "conversation_summary": conversation_summary,
+            "user_message": user_message
+        })
+
+        return PROMPT_FIELD_RE.split(suffix)
+
+    def render_prepared(self, prompt_parts: List[str], current_flow: Optional[Flow],
+                        latest_user_message: str) -> StructuredPrompt:
+        """
+        Complete a prompt prepared with `prepare` with the user message.
+        """
+        latest_user_message = latest_user_message.replace("\n", " ")
+
+        fields = {USER_MESSAGE_FIELD: latest_user_message}
+
+        if self.retriever is not None:
+            fields[FLOW_CATALOGUE_FIELD] = self._render_flow_catalogue(self.get_prompt_flows(current_flow,
+                                                                                           latest_user_message))
+
+        # The fields are at the odd positions
+        suffix = "".join(part if i % 2 == 0 else fields[part] for i, part in enumerate(prompt_parts))
+
+        return StructuredPrompt(self.prompt_prefix, suffix)
+
+    def render(self, current_flow: Optional[Flow], current_slot: Optional[FlowSlot],
+               current_flow_slot_values: Optional[Dict[str, str]], current_conversation: List[Dict[str, str]],
+               latest_user_message: str, conversation_summary: Optional[str] = None) -> StructuredPrompt:
+        prompt_parts = self.prepare(current_flow, current_slot, current_flow_slot_values, current_conversation,
+                                    conversation_summary)
+        return self.render_prepared(prompt_parts, current_flow, latest_user_message)
 
 
 def render_prompt(available_flows: Sequence[Flow], current_flow: Optional[Flow], current_slot: Optional[FlowSlot],
                   current_flow_slot_values: Optional[Dict[str, str]], current_conversation: List[Dict[str, str]],
-                  latest_user_message: str) -> str:
-    if current_flow_slot_values is None:
-        current_flow_slot_values = {}
-
-    latest_user_message = latest_user_message.replace("\n", " ")
-
-    def flow_slot_to_dict(flow_slot: FlowSlot, in_current_flow: bool = False):
-        allowed_values = None
-        if flow_slot.type == bool:
-            slot_type = "boolean"
-        elif isinstance(flow_slot.type, Categorical):
-            slot_type = "categorical"
-            allowed_values = ", ".join(flow_slot.type.categories)
-        else:
-            slot_type = {
-                int: "number",
-                str: "text",
-                float: "number",
-            }[flow_slot.type]
-
-        return {
-            "name": flow_slot.name,
-            "description": flow_slot.description,
-            "type": slot_type,
-            "allowed_values": allowed_values,
-            "value": current_flow_slot_values.get(flow_slot.name, "") if in_current_flow else None
-        }
-
-    def flow_to_dict(flow: Flow):
-        return {
-            "name": flow.name,
-            "description": flow.description,
-            "slots": [flow_slot_to_dict(slot) for slot in flow.get_slots()]
-        }
-
-    available_flows = [flow_to_dict(flow) for flow in available_flows]
-
-    role_to_str = {
-        Role.USER: "USER",
-        Role.ASSISTANT: "AI"
-    }
+                  latest_user_message: str, conversation_summary: Optional[str] = None) -> StructuredPrompt:
+    """
+    Render the command prompt in one go. Prefer a long-lived `PromptRenderer` to render it on every turn.
+    """
+    return PromptRenderer(available_flows).render(
+        current_flow=current_flow,
+        current_slot=current_slot,
+        current_flow_slot_values=current_flow_slot_values,
+        current_conversation=current_conversation,
+        latest_user_message=latest_user_message,
+        conversation_summary=conversation_summary
+    )
 
-    last_n_messages = 20  # FIXME: make it configurable
 
-    user_str = f"USER: {latest_user_message}"
-    current_conversation_str = "\n".join([f"{role_to_str[message['role']]}: {message['message']}"
-                                          for message in current_conversation[-last_n_messages:]] + [user_str])
+SLOT_SET_RE = re.compile(r"""SetSlot\(([a-zA-Z_][a-zA-Z0-9_-]*?), ?(.*)\)""")
+START_FLOW_RE = re.compile(r"StartFlow\(([a-zA-Z0-9_-]+?)\)")
+CANCEL_FLOW_RE = re.compile(r"CancelFlow\(\)")
+CHITCHAT_RE = re.compile(r"ChitChat\(\)")
+SKIP_QUESTION_RE = re.compile(r"SkipQuestion\(\)")
+HUMAN_HANDOFF_RE = re.compile(r"HumanHandoff\(\)")
+CLARIFY_RE = re.compile(r"Clarify\(([a-zA-Z0-9_, ]+)\)")
+REPEAT_RE = re.compile(r"Repeat\(\)")
 
-    if current_flow is None:
-        current_flow_name = None
-        current_flow_slots = []
-    else:
-        current_flow_name = current_flow.name
-        current_flow_slots = current_flow.get_slots()
-        current_flow_slots = [flow_slot_to_dict(slot, in_current_flow=True) for slot in current_flow_slots]
 
-    if current_slot is None:
-        current_slot_name = None
-        current_slot_description = None
-    else:
-        current_slot_name = current_slot.name
-        current_slot_description = current_slot.description
+def _parse_command_line(action: str):
+    """
+    Parse a line of the response of the command prompt. Returns None if the line has no command.
+    """
+    if match := SLOT_SET_RE.search(action):
+        slot_name = match.group(1).strip()
+        slot_value = match.group(2).strip("'\" ")
 
-    command_prompt = jinja2.Template(COMMAND_PROMPT_TEMPLATE).render({
-        "available_flows": available_flows,
-        "current_flow": current_flow_name,
-        "current_slot": current_slot_name,
-        "current_slot_description": current_slot_description,
-        "current_flow_slots": current_flow_slots,
-        "current_conversation": current_conversation_str,
-        "user_message": latest_user_message
-    })
+        # FIXME: sometimes the model predicts a slot set command with the flow name
+
+        # error case where the llm tries to start a flow using a slot set
+        if slot_name == "flow_name":
+            return StartFlowCommand(slot_value)
+        else:
+            return SetSlotCommand(name=slot_name, value=slot_value)
+    elif match := START_FLOW_RE.search(action):
+        flow_name = match.group(1).strip()
+        if flow_name == "HumanHandoff":
+            # Sometimes the model predicts HumanHandoff as a flow name
+            return HumanHandoffCommand()
+        else:
+            return StartFlowCommand(flow_name)
+    elif CANCEL_FLOW_RE.search(action):
+        return CancelFlowCommand()
+    elif CHITCHAT_RE.search(action):
+        return ChitChatCommand()
+    elif SKIP_QUESTION_RE.search(action):
+        return SkipQuestionCommand()
+    elif HUMAN_HANDOFF_RE.search(action):
+        return HumanHandoffCommand()
+    elif REPEAT_RE.search(action):
+        return RepeatCommand()
+    elif match := CLARIFY_RE.search(action):
+        options = sorted([opt.strip() for opt in match.group(1).split(",")])
+        if len(options) > 1:  # NOTE: if there is only one option, is it a clarification?
+            return ClarifyCommand(options)
 
-    return command_prompt
+    return None
 
 
 def parse_command_prompt_response(response: str):
-    response = response.strip().splitlines()
-
     commands = []
 
-    slot_set_re = re.compile(r"""SetSlot\(([a-zA-Z_][a-zA-Z0-9_-]*?), ?(.*)\)""")
-    start_flow_re = re.compile(r"StartFlow\(([a-zA-Z0-9_-]+?)\)")
-    cancel_flow_re = re.compile(r"CancelFlow\(\)")
-    chitchat_re = re.compile(r"ChitChat\(\)")
-    skip_question_re = re.compile(r"SkipQuestion\(\)")
-    humand_handoff_re = re.compile(r"HumanHandoff\(\)")
-    clarify_re = re.compile(r"Clarify\(([a-zA-Z0-9_, ]+)\)")
-    repeat_re = re.compile(r"Repeat\(\)")
-
-    for action in response:
-        if match := slot_set_re.search(action):
-            slot_name = match.group(1).strip()
-            slot_value = match.group(2).strip("'\" ")
-
-            # FIXME: sometimes the model predicts a slot set command with the flow name
-
-            # error case where the llm tries to start a flow using a slot set
-            if slot_name == "flow_name":
-                commands.append(StartFlowCommand(slot_value))
-            else:
-                commands.append(
-                    SetSlotCommand(name=slot_name, value=slot_value)
-                )
-        elif match := start_flow_re.search(action):
-            flow_name = match.group(1).strip()
-            if flow_name == "HumanHandoff":
-                # Sometimes the model predicts HumanHandoff as a flow name
-                commands.append(HumanHandoffCommand())
-            else:
-                commands.append(StartFlowCommand(flow_name))
-        elif cancel_flow_re.search(action):
-            commands.append(CancelFlowCommand())
-        elif chitchat_re.search(action):
-            commands.append(ChitChatCommand())
-        elif skip_question_re.search(action):
-            commands.append(SkipQuestionCommand())
-        elif humand_handoff_re.search(action):
-            commands.append(HumanHandoffCommand())
-        elif repeat_re.search(action):
-            commands.append(RepeatCommand())
-        elif match := clarify_re.search(action):
-            options = sorted([opt.strip() for opt in match.group(1).split(",")])
-            if len(options) > 1:  # NOTE: if there is only one option, is it a clarification?
-                commands.append(ClarifyCommand(options))
+    for action in response.strip().splitlines():
+        command = _parse_command_line(action)
+
+        if command is not None:
+            commands.append(command)
 
     return commands
+
+
+class CommandStreamParser:
+    """
+    Parse the response of the command prompt while it's streamed, one command per line. The commands of a line are
+    returned as soon as the line is complete.
+    """
+
+    def __init__(self):
+        self._line = ""
+
+    def feed(self, chunk: str) -> List:
+        """
+        Feed a chunk of the response.
+
+        Returns:
+            The commands of the lines completed by the chunk.
+        """
+        *lines, self._line = (self._line + chunk).split("\n")
+        return self._parse_lines(lines)
+
+    def close(self) -> List:
+        """
+        Signal the end of the response.
+
+        Returns:
+            The commands of the last line.
+        """
+        lines, self._line = [self._line], ""
+        return self._parse_lines(lines)
+
+    def _parse_lines(self, lines: List[str]) -> List:
+        commands = []
+
+        for line in lines:
+            command = _parse_command_line(line)
+
+            if command is not None:
+                commands.append(command)
+
+        return commands
@@ -0,0 +1,137 @@
+#
+#
+#   Rule-based command classifier
+#
+#
+
+import re
+import threading
+from typing import Optional, List, Collection, Callable, Dict
+
+from .cancel_flow import CancelFlowCommand
+from .repeat import RepeatCommand
+from .set_slot import SetSlotCommand
+from ..flow_slot import FlowSlot
+from ..types import Categorical
+from ..utils import normalize_message, strtobool
+
+DEFAULT_CANCEL_PHRASES = frozenset({"cancel", "cancel it", "cancel that", "cancel please", "stop"})
+DEFAULT_REPEAT_PHRASES = frozenset({"repeat", "repeat please", "repeat that", "say that again", "come again"})
+
+INT_RE = re.compile(r"\d+")
+FLOAT_RE = re.compile(r"\d+(\.\d+)?")
+
+
+def _make_slot_parser(slot_type) -> Callable[[str], Optional[str]]:
+    """
+    Make the function getting the value of a slot type from a normalized message that is exactly a value of the type.
+    """
+    if isinstance(slot_type, Categorical):
+        # The categories are matched ignoring the case, so the ones differing only in case are ambiguous
+        categories = {}
+        for category in slot_type.categories:
+            key = category.lower()
+            categories[key] = None if key in categories else category
+
+        return categories.get
+    elif slot_type == bool:
+        def parse_bool(message: str) -> Optional[str]:
+            try:
+                strtobool(message)
+            except ValueError:
+                return None
+
+            return message
+
+        return parse_bool
+    elif slot_type == int:
+        return lambda message: message if INT_RE.fullmatch(message) else None
+    elif slot_type == float:
+        return lambda message: message if FLOAT_RE.fullmatch(message) else None
+
+    return lambda message: None
+
+
+class RuleBasedClassifier:
+    """
+    Predict the commands of the turns that can be resolved without the LLM. When the bot is waiting for the answer to
+    an ask, a message that unambiguously matches the type of the slot sets it, and the cancel and repeat phrases cancel
+    the flow and repeat the question. The LLM is used for any other message.
+
+    Args:
+        cancel_phrases: The messages that cancel the current flow, after normalization.
+        repeat_phrases: The messages that repeat the question, after normalization.
+    """
+
+    def __init__(self, cancel_phrases: Collection[str] = DEFAULT_CANCEL_PHRASES,
+                 repeat_phrases: Collection[str] = DEFAULT_REPEAT_PHRASES):
+        self.cancel_phrases = frozenset(normalize_message(phrase) for phrase in cancel_phrases)
+        self.repeat_phrases = frozenset(normalize_message(phrase) for phrase in repeat_phrases)
+
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        self._slot_parsers: Dict = {}  # By slot type
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        The fraction of the turns resolved without the LLM.
+        """
+        turns = self.hits + self.misses
+        return self.hits / turns if turns else 0.0
+
+    def classify(self, message: str, current_slot: Optional[FlowSlot]) -> Optional[List]:
+        """
+        Predict the commands for a message.
+
+        Args:
+            message: The message from the user.
+            current_slot: The slot the bot is waiting for, if any.
+
+        Returns:
+            The commands, or None if the LLM must predict them.
+        """
+        commands = None
+
+        if current_slot is not None:
+            commands = self._classify_answer(normalize_message(message), current_slot)
+
+        with self._stats_lock:
+            if commands is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return commands
+
+    def get_slot_parser(self, flow_slot: FlowSlot) -> Callable[[str], Optional[str]]:
+        """
+        Get the function getting the value of the slot from a normalized message, if the message is exactly a value of
+        its type. It's made once per slot type, e.g. when the bot prepares the turn answering an ask.
+
+        Args:
+            flow_slot: The slot.
+
+        Returns:
+            The function, returning None if the message isn't a value of the slot.
+        """
+        slot_parser = self._slot_parsers.get(flow_slot.type)
+
+        if slot_parser is None:
+            slot_parser = _make_slot_parser(flow_slot.type)
+            self._slot_parsers[flow_slot.type] = slot_parser
+
+        return slot_parser
+
+    def _classify_answer(self, message: str, current_slot: FlowSlot) -> Optional[List]:
+        slot_value = self.get_slot_parser(current_slot)(message)
+
+        if slot_value is not None:
+            return [SetSlotCommand(name=current_slot.name, value=slot_value)]
+        elif message in self.cancel_phrases:
+            return [CancelFlowCommand()]
+        elif message in self.repeat_phrases:
+            return [RepeatCommand()]
+
+        return None
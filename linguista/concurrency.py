@@ -0,0 +1,25 @@
+#
+#
+#   Concurrency control of the turns of a session
+#
+#
+
+# What to do with a message for a session that is already running a turn:
+QUEUE = "queue"    # wait for the turn to finish
+REJECT = "reject"  # raise `SessionBusyError`
+MERGE = "merge"    # wait, and run all the messages received in the meantime as a single turn
+
+CONCURRENCY_POLICIES = (QUEUE, REJECT, MERGE)
+
+
+class SessionBusyError(Exception):
+    """
+    Raised when a session is running another turn and the message can't wait for it.
+    """
+
+
+class SessionLockLostError(Exception):
+    """
+    Raised when a turn is committed after its session lock expired, i.e. another turn may have run in the meantime.
+    The changes of the turn are discarded.
+    """
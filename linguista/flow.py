@@ -4,17 +4,48 @@
 #
 #
 
-import inspect
 from abc import ABC, abstractmethod
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
 
+from .actions import ActionFunction
 from .flow_slot import FlowSlot
 
 
 class Flow(ABC):
     """
     Base class for conversational flows.
+
+    The slots of a flow are the `FlowSlot` class attributes. They are discovered once per subclass, in order of
+    definition, with the slots of the base classes first. The actions, i.e. the methods decorated with `action`, are
+    indexed by name at the same time. The slots assigned to the instance, e.g. in `__init__`, are also found, once,
+    when the slots are first needed.
     """
 
+    _flow_slots: Tuple[FlowSlot, ...] = ()
+    _flow_slots_by_name: Mapping[str, FlowSlot] = MappingProxyType({})
+    _flow_slots_by_attr_name: Mapping[str, FlowSlot] = MappingProxyType({})
+    _flow_actions: Mapping[str, ActionFunction] = MappingProxyType({})
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        # Indexed by attribute name, so an attribute redefined in a subclass replaces the slot of the base class
+        # while keeping its position
+        slots_by_attr_name = {}
+        actions_by_attr_name = {}
+        for klass in reversed(cls.__mro__):
+            for attr_name, attr_value in vars(klass).items():
+                if isinstance(attr_value, FlowSlot):
+                    slots_by_attr_name[attr_name] = attr_value
+                elif isinstance(attr_value, ActionFunction):
+                    actions_by_attr_name[attr_name] = attr_value
+
+        cls._flow_slots = tuple(slots_by_attr_name.values())
+        cls._flow_slots_by_name = MappingProxyType({slot.name: slot for slot in cls._flow_slots})
+        cls._flow_slots_by_attr_name = MappingProxyType(slots_by_attr_name)
+        cls._flow_actions = MappingProxyType(actions_by_attr_name)
+
     @property
     @abstractmethod
     def name(self):
@@ -41,25 +72,34 @@ class Flow(ABC):
         """
         pass
 
-    def get_slots(self):
-        return _get_slots_from_flow(self)
+    def _get_instance_flow_slots(self) -> Tuple[Tuple[FlowSlot, ...], Mapping[str, FlowSlot]]:
+        # The slots and slots by name of the instance, with the slots assigned to it after the slots of the class, or
+        # replacing the class attribute of the same name
+        instance_flow_slots = self.__dict__.get("_instance_flow_slots")
 
-    def get_slot(self, slot_name):
-        for slot in self.get_slots():
-            if slot.name == slot_name:
-                return slot
+        if instance_flow_slots is None:
+            instance_slots_by_attr_name = {attr_name: attr_value for attr_name, attr_value in vars(self).items()
+                                           if isinstance(attr_value, FlowSlot)}
 
-        return None
+            if instance_slots_by_attr_name:
+                flow_slots = tuple({**self._flow_slots_by_attr_name, **instance_slots_by_attr_name}.values())
+                instance_flow_slots = (flow_slots, MappingProxyType({slot.name: slot for slot in flow_slots}))
+            else:
+                instance_flow_slots = (self._flow_slots, self._flow_slots_by_name)
 
-    def __repr__(self):
-        return f"Flow(name='{self.name}', description='{self.description}', slots={self.get_slots()})"
+            self.__dict__["_instance_flow_slots"] = instance_flow_slots
 
+        return instance_flow_slots
 
-def _get_slots_from_flow(flow: Flow):
-    return_slots = list()
-    slots_members = inspect.getmembers(flow, lambda attr: isinstance(attr, FlowSlot))
+    def get_slots(self) -> Tuple[FlowSlot, ...]:
+        return self._get_instance_flow_slots()[0]
 
-    for slot_var_name, flow_slot in slots_members:
-        return_slots.append(flow_slot)
+    def get_slot(self, slot_name) -> Optional[FlowSlot]:
+        return self._get_instance_flow_slots()[1].get(slot_name)
+
+    def get_action(self, action_name) -> Optional[ActionFunction]:
+        return self._flow_actions.get(action_name)
+
+    def __repr__(self):
+        return f"Flow(name='{self.name}', description='{self.description}', slots={self.get_slots()})"
 
-    return return_slots
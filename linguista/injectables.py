@@ -0,0 +1,95 @@
+#
+#
+#   Injectables
+#
+#
+
+from dataclasses import dataclass
+from typing import Any, Dict
+
+from .actions import ActionFunction
+from .flow import Flow
+from .tracker.base import AsyncTracker
+from .tracker.proxy import ProxyTracker
+
+
+@dataclass(frozen=True)
+class InvocationContext:
+    """
+    What an action function is being called for.
+    """
+    session_id: str
+    flow: Flow
+    tracker: AsyncTracker
+
+
+class Injectable:
+    """
+    A value that action functions get by declaring a parameter with the name it's registered with.
+    """
+
+    async def provide(self, context: InvocationContext) -> Any:
+        """
+        Get the value to pass to the action function.
+        """
+        raise NotImplementedError()
+
+    async def release(self, value: Any, context: InvocationContext):
+        """
+        Called with the value provided once the action function has returned.
+        """
+        pass
+
+
+class TrackerInjectable(Injectable):
+    """
+    Inject a `ProxyTracker` for the flow of the action, persisting the slots set through it.
+    """
+
+    async def provide(self, context: InvocationContext) -> ProxyTracker:
+        flow_slot_values = await context.tracker.get_flow_slots(context.session_id, context.flow.name)
+        return ProxyTracker(context.tracker, context.session_id, context.flow, flow_slot_values)
+
+    async def release(self, value: ProxyTracker, context: InvocationContext):
+        for slot_name, slot_value in value.changes.items():
+            await context.tracker.set_flow_slot(context.session_id, context.flow.name, slot_name, slot_value)
+
+
+INJECTABLES: Dict[str, Injectable] = {
+    "tracker": TrackerInjectable()
+}
+
+
+def register_injectable(name: str, injectable: Injectable):
+    """
+    Make a value available to the action functions declaring a parameter called `name`.
+    """
+    INJECTABLES[name] = injectable
+
+
+async def invoke_action(action: ActionFunction, context: InvocationContext):
+    """
+    Call an action function following its invocation plan.
+
+    Returns:
+        What the action function returns.
+    """
+    injected = []
+    kwargs = {}
+    for parameter in action.plan.parameters:
+        injectable = INJECTABLES.get(parameter)
+
+        if injectable is not None:
+            value = await injectable.provide(context)
+            kwargs[parameter] = value
+            injected.append((injectable, value))
+
+    result = action.function(context.flow, **kwargs)
+
+    if action.plan.is_coroutine:
+        result = await result
+
+    for injectable, value in injected:
+        await injectable.release(value, context)
+
+    return result
@@ -0,0 +1,17 @@
+#
+#
+#   Instrumentation
+#
+#
+
+from .base import Instrumentation, NoopInstrumentation, Span   # noqa: F401
+from .base import STAGES, RENDER_STAGE, LLM_STAGE, PARSE_STAGE, TRACKER_STAGE   # noqa: F401
+from .base import ACTION_STAGE, SUMMARY_STAGE   # noqa: F401
+from .histogram import HistogramInstrumentation   # noqa: F401
+from .tracker import InstrumentedTracker   # noqa: F401
+from ..utils import lazy_attributes
+
+# Imported when first accessed, so OpenTelemetry is only imported if it's used
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    "OpenTelemetryInstrumentation": ".opentelemetry",
+})
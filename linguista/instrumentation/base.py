@@ -0,0 +1,138 @@
+#
+#
+#   Base instrumentation
+#
+#
+
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+# Stages of a turn timed by the bot
+RENDER_STAGE = "render"  # Render the command prompt
+LLM_STAGE = "llm"  # Call the model. Attributes: prompt_chars, completion_chars
+PARSE_STAGE = "parse"  # Parse the commands from the completion
+TRACKER_STAGE = "tracker"  # Call the tracker. Attributes: operation
+ACTION_STAGE = "action"  # Invoke an action function. Attributes: function
+SUMMARY_STAGE = "summary"  # Summarize the older messages of a conversation, after the turn. Attributes: messages
+
+STAGES = (RENDER_STAGE, LLM_STAGE, PARSE_STAGE, TRACKER_STAGE, ACTION_STAGE, SUMMARY_STAGE)
+
+
+@dataclass
+class Span:
+    """
+    A stage of a turn that has been timed.
+    """
+    stage: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    start_time: float = 0.0  # Seconds since the epoch
+    duration: float = 0.0  # Seconds
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+
+class _SpanTimer:
+    """
+    Context manager timing a span, which is recorded when it exits.
+    """
+
+    __slots__ = ("_instrumentation", "_span", "_start")
+
+    def __init__(self, instrumentation: "Instrumentation", span: Span):
+        self._instrumentation = instrumentation
+        self._span = span
+        self._start = 0.0
+
+    def __enter__(self) -> Span:
+        self._span.start_time = time.time()
+        self._start = time.perf_counter()
+        return self._span
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._span.duration = time.perf_counter() - self._start
+
+        if exc_type is not None:
+            self._span.set_attribute("error", exc_type.__name__)
+
+        self._instrumentation.record(self._span)
+
+
+class Instrumentation(ABC):
+    """
+    Receive the timings of the stages of the turns, e.g. to export them as metrics or traces.
+    """
+
+    # Whether the bot times the stages. When disabled, the bot skips the timings that aren't just a `span` call.
+    enabled = True
+
+    def span(self, stage: str, **attributes) -> _SpanTimer:
+        """
+        Time a stage with a `with` block. The span is recorded when the block exits.
+
+        Args:
+            stage: The name of the stage.
+            **attributes: The attributes of the span. More can be set with `Span.set_attribute` within the block.
+
+        Returns:
+            The context manager, which returns the span when entered.
+        """
+        return _SpanTimer(self, Span(stage, attributes))
+
+    def record_span(self, stage: str, start_time: float, duration: float, **attributes):
+        """
+        Record a stage timed by the caller, e.g. when its time is spread over several steps.
+
+        Args:
+            stage: The name of the stage.
+            start_time: When the stage started, in seconds since the epoch.
+            duration: The duration of the stage, in seconds.
+            **attributes: The attributes of the span.
+        """
+        self.record(Span(stage, attributes, start_time=start_time, duration=duration))
+
+    @abstractmethod
+    def record(self, span: Span):
+        """
+        Record a timed span. It may be called from several threads at the same time.
+
+        Args:
+            span: The span.
+        """
+        ...
+
+
+class _NoopSpanTimer:
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+
+_NOOP_SPAN_TIMER = _NoopSpanTimer()
+
+
+class NoopInstrumentation(Instrumentation):
+    """
+    Instrumentation that records nothing, used by default.
+    """
+
+    enabled = False
+
+    def span(self, stage: str, **attributes) -> _NoopSpanTimer:
+        return _NOOP_SPAN_TIMER
+
+    def record_span(self, stage: str, start_time: float, duration: float, **attributes):
+        pass
+
+    def record(self, span: Span):
+        pass
@@ -0,0 +1,143 @@
+#
+#
+#   Prometheus-style histograms
+#
+#
+
+import bisect
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+from .base import Instrumentation, Span, LLM_STAGE
+
+# Upper bounds of the buckets, the same as the default ones of the Prometheus clients
+DEFAULT_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+DEFAULT_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144)
+
+
+class Histogram:
+    """
+    Cumulative histogram of observations, like a Prometheus histogram.
+
+    Args:
+        buckets: The upper bounds of the buckets, in increasing order. The "+Inf" bucket is implicit.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # Not cumulative, the last one is "+Inf"
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self) -> List[int]:
+        counts = []
+        total = 0
+        for bucket_count in self.bucket_counts:
+            total += bucket_count
+            counts.append(total)
+        return counts
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], **extra) -> str:
+    pairs = list(labels) + list(extra.items())
+
+    if not pairs:
+        return ""
+
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+
+class HistogramInstrumentation(Instrumentation):
+    """
+    Aggregate the timings of the stages in histograms, to be scraped in the Prometheus text format.
+
+    The durations are in `linguista_stage_duration_seconds`, labeled by stage and by the attributes in `labels`.
+    The sizes of the prompts and completions of the model are in `linguista_llm_prompt_chars` and
+    `linguista_llm_completion_chars`.
+
+    Args:
+        duration_buckets: The upper bounds of the buckets of the durations, in seconds.
+        size_buckets: The upper bounds of the buckets of the sizes, in characters.
+        labels: The attributes of the spans used as labels. They must have a few distinct values, so the number of
+            histograms is bounded.
+    """
+
+    def __init__(self, duration_buckets: Sequence[float] = DEFAULT_DURATION_BUCKETS,
+                 size_buckets: Sequence[float] = DEFAULT_SIZE_BUCKETS,
+                 labels: Sequence[str] = ("operation", "function")):
+        self.duration_buckets = tuple(duration_buckets)
+        self.size_buckets = tuple(size_buckets)
+        self.labels = tuple(labels)
+
+        # Histograms by metric name and label values
+        self._histograms: Dict[str, Dict[Tuple[Tuple[str, str], ...], Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def _observe(self, name: str, labels: Tuple[Tuple[str, str], ...], buckets: Sequence[float], value: float):
+        histograms = self._histograms.setdefault(name, {})
+        histogram = histograms.get(labels)
+
+        if histogram is None:
+            histogram = histograms[labels] = Histogram(buckets)
+
+        histogram.observe(value)
+
+    def record(self, span: Span):
+        labels = (("stage", span.stage),) + tuple((label, str(span.attributes[label])) for label in self.labels
+                                                  if label in span.attributes)
+
+        with self._lock:
+            self._observe("linguista_stage_duration_seconds", labels, self.duration_buckets, span.duration)
+
+            if span.stage == LLM_STAGE:
+                for attribute in ("prompt_chars", "completion_chars"):
+                    if attribute in span.attributes:
+                        self._observe(f"linguista_llm_{attribute}", (), self.size_buckets, span.attributes[attribute])
+
+    def get_histogram(self, stage: str, **labels) -> Histogram:
+        """
+        Get the histogram of the durations of a stage.
+
+        Args:
+            stage: The name of the stage.
+            **labels: The values of the other labels of the histogram.
+
+        Returns:
+            The histogram, empty if nothing has been recorded.
+        """
+        key = (("stage", stage),) + tuple((label, labels[label]) for label in self.labels if label in labels)
+
+        with self._lock:
+            histogram = self._histograms.get("linguista_stage_duration_seconds", {}).get(key)
+
+        return histogram if histogram is not None else Histogram(self.duration_buckets)
+
+    def exposition(self) -> str:
+        """
+        Render the histograms in the Prometheus text exposition format.
+        """
+        lines = []
+
+        with self._lock:
+            for name, histograms in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+
+                for labels, histogram in sorted(histograms.items()):
+                    bounds = [_format_bound(bound) for bound in histogram.buckets] + ["+Inf"]
+
+                    for bound, count in zip(bounds, histogram.cumulative_counts()):
+                        lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {count}")
+
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,44 @@
+#
+#
+#   OpenTelemetry instrumentation
+#
+#
+
+from .base import Instrumentation, Span
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """
+    Export the stages of the turns as OpenTelemetry spans named `linguista.<stage>`.
+
+    The spans are created once each stage has finished, with its start and end times, as children of the span that is
+    current at that moment, e.g. the span of the request handling the message.
+
+    Args:
+        tracer_provider: The tracer provider. By default, the global one.
+    """
+
+    def __init__(self, tracer_provider=None):
+        if trace is None:
+            raise ImportError("Please install the 'linguista[opentelemetry]' package to use the OpenTelemetry "
+                              "instrumentation.")
+
+        self._tracer = trace.get_tracer("linguista", tracer_provider=tracer_provider)
+
+    def record(self, span: Span):
+        start_time = int(span.start_time * 1e9)
+        end_time = start_time + int(span.duration * 1e9)
+
+        otel_span = self._tracer.start_span(f"linguista.{span.stage}", start_time=start_time,
+                                            attributes={f"linguista.{key}": value
+                                                        for key, value in span.attributes.items()})
+
+        if "error" in span.attributes:
+            otel_span.set_status(trace.Status(trace.StatusCode.ERROR, span.attributes["error"]))
+
+        otel_span.end(end_time=end_time)
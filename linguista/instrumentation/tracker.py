@@ -0,0 +1,29 @@
+#
+#
+#   Tracker timing its calls
+#
+#
+
+from .base import Instrumentation, TRACKER_STAGE
+
+
+class InstrumentedTracker:
+    """
+    Wrap an asynchronous tracker to time each call as a "tracker" span, with the name of the method as operation.
+    """
+
+    def __init__(self, tracker, instrumentation: Instrumentation):
+        self.tracker = tracker
+        self.instrumentation = instrumentation
+
+    def __getattr__(self, name):
+        method = getattr(self.tracker, name)
+
+        if not callable(method):
+            return method
+
+        async def timed_method(*args, **kwargs):
+            with self.instrumentation.span(TRACKER_STAGE, operation=name):
+                return await method(*args, **kwargs)
+
+        return timed_method
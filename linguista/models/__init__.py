@@ -3,6 +3,14 @@
 #   LLMs
 #
 #
-from .base import LLM
-from .anthropic import Anthropic
-from .openai import OpenAI
+from .base import LLM, StructuredPrompt   # noqa: F401
+from .resilient import ResilientLLM, LLMDeadlineExceededError   # noqa: F401
+from .resilient import command_list_max_tokens, is_retryable_error   # noqa: F401
+from ..utils import lazy_attributes
+
+# The adapters are imported when first accessed, so only the SDKs of the providers used are imported
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    "Anthropic": ".anthropic",
+    "OpenAI": ".openai",
+    "RouterLLM": ".router",
+})
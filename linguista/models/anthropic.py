@@ -4,9 +4,9 @@
 #
 #
 
-from typing import Optional
+from typing import Optional, Iterator, AsyncIterator
 
-from .base import LLM
+from .base import LLM, StructuredPrompt, pooled_http_clients
 
 try:
     import anthropic
@@ -15,9 +15,29 @@ except ImportError:
 
 
 class Anthropic(LLM):
+    """
+    The static prefix of a `StructuredPrompt` is sent as the system prompt, marked with a cache breakpoint so Anthropic
+    caches it. Prefixes shorter than the minimum cacheable length of the model are sent as usual.
+
+    Args:
+        api_key: The API key. By default, the `ANTHROPIC_API_KEY` environment variable.
+        model: The model.
+        anthropic_client_kwargs: Keyword arguments of the Anthropic clients.
+        max_tokens: The maximum number of tokens of the completions.
+        timeout: Seconds to wait for each request. By default, the one of the SDK.
+        max_retries: The number of retries of the SDK. Set it to 0 if the model is wrapped in a `ResilientLLM`.
+        max_connections: The size of the pool of HTTP connections. By default, the pool of the SDK.
+        keepalive_expiry: Seconds an idle connection of the pool is kept alive. By default, the one of the SDK.
+        cache_prompt_prefix: Whether to mark the prefix of the structured prompts to be cached.
+    """
+
+    supports_call_options = True
 
     def __init__(self, api_key: Optional[str] = None, model: str = "claude-3-haiku-20240307",
-                 anthropic_client_kwargs: Optional[dict] = None):
+                 anthropic_client_kwargs: Optional[dict] = None, max_tokens: int = 1024,
+                 timeout: Optional[float] = None, max_retries: Optional[int] = None,
+                 max_connections: Optional[int] = None, keepalive_expiry: Optional[float] = None,
+                 cache_prompt_prefix: bool = True):
         if anthropic is None:
             raise ImportError("Please install the 'linguista[anthropic]' package to use the Anthropic LLM.")
 
@@ -25,16 +45,62 @@ class Anthropic(LLM):
             anthropic_client_kwargs = {}
 
         self.model = model
+        self.max_tokens = max_tokens
+        self.cache_prompt_prefix = cache_prompt_prefix
+
+        anthropic_client_kwargs = dict(anthropic_client_kwargs)
+        if timeout is not None:
+            anthropic_client_kwargs["timeout"] = timeout
+        if max_retries is not None:
+            anthropic_client_kwargs["max_retries"] = max_retries
+
+        client_kwargs, async_client_kwargs = {}, {}
+        if max_connections is not None or keepalive_expiry is not None:
+            client_kwargs, async_client_kwargs = pooled_http_clients(anthropic, max_connections, keepalive_expiry)
 
-        self._client = anthropic.Anthropic(api_key=api_key, **anthropic_client_kwargs)
+        self._client = anthropic.Anthropic(api_key=api_key, **anthropic_client_kwargs, **client_kwargs)
+        self._async_client = anthropic.AsyncAnthropic(api_key=api_key, **anthropic_client_kwargs, **async_client_kwargs)
 
-    def __call__(self, prompt: str):
-        message = self._client.messages.create(
+    def _message_kwargs(self, prompt: str, max_tokens: Optional[int], timeout: Optional[float]):
+        if isinstance(prompt, StructuredPrompt):
+            content = prompt.suffix
+        else:
+            content = prompt
+
+        message_kwargs = dict(
             model=self.model,
-            max_tokens=1024,
+            max_tokens=max_tokens if max_tokens is not None else self.max_tokens,
             messages=[
-                {"role": "user", "content": prompt}
+                {"role": "user", "content": content}
             ],
             temperature=0
         )
+
+        if isinstance(prompt, StructuredPrompt):
+            system = {"type": "text", "text": prompt.prefix}
+            if self.cache_prompt_prefix:
+                system["cache_control"] = {"type": "ephemeral"}
+            message_kwargs["system"] = [system]
+
+        if timeout is not None:
+            message_kwargs["timeout"] = timeout
+
+        return message_kwargs
+
+    def __call__(self, prompt: str, max_tokens: Optional[int] = None, timeout: Optional[float] = None):
+        message = self._client.messages.create(**self._message_kwargs(prompt, max_tokens, timeout))
+        return message.content[0].text
+
+    async def acall(self, prompt: str, max_tokens: Optional[int] = None, timeout: Optional[float] = None):
+        message = await self._async_client.messages.create(**self._message_kwargs(prompt, max_tokens, timeout))
         return message.content[0].text
+
+    def stream(self, prompt: str, max_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Iterator[str]:
+        with self._client.messages.stream(**self._message_kwargs(prompt, max_tokens, timeout)) as stream:
+            yield from stream.text_stream
+
+    async def astream(self, prompt: str, max_tokens: Optional[int] = None,
+                      timeout: Optional[float] = None) -> AsyncIterator[str]:
+        async with self._async_client.messages.stream(**self._message_kwargs(prompt, max_tokens, timeout)) as stream:
+            async for text in stream.text_stream:
+                yield text
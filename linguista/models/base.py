@@ -4,11 +4,78 @@
 #
 #
 
+import asyncio
 from abc import ABC, abstractmethod
+from typing import Iterator, AsyncIterator, Optional
+
+
+class StructuredPrompt(str):
+    """
+    A prompt made of a static prefix, identical across turns, and a dynamic suffix. It's the whole prompt as a string,
+    so any model can use it, but the models whose provider caches prompt prefixes send the prefix apart so it's cached.
+
+    Args:
+        prefix: The static part of the prompt, e.g. the instructions and the flow catalogue.
+        suffix: The dynamic part of the prompt, e.g. the conversation and the user message.
+    """
+
+    def __new__(cls, prefix: str, suffix: str):
+        prompt = super().__new__(cls, prefix + suffix)
+        prompt.prefix = prefix
+        prompt.suffix = suffix
+        return prompt
+
+    def __getnewargs__(self):
+        return self.prefix, self.suffix
 
 
 class LLM(ABC):
 
+    # Whether the calls accept the keyword arguments `max_tokens`, to cap the completion, and `timeout`, in seconds
+    supports_call_options = False
+
     @abstractmethod
     def __call__(self, prompt: str):
         ...
+
+    async def acall(self, prompt: str):
+        """
+        Asynchronous version of `__call__`. By default, the synchronous call is run in a worker thread so it doesn't
+        block the event loop. Subclasses with a native asynchronous client should override it.
+        """
+        return await asyncio.to_thread(self, prompt)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """
+        Stream the completion of the prompt in chunks of text. By default, the whole completion is a single chunk.
+        Subclasses whose API can stream the completion should override it.
+        """
+        yield self(prompt)
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Asynchronous version of `stream`.
+        """
+        yield await self.acall(prompt)
+
+
+def pooled_http_clients(sdk, max_connections: Optional[int] = None, keepalive_expiry: Optional[float] = None):
+    """
+    Make the synchronous and asynchronous HTTP clients of an SDK (`openai` or `anthropic`) with a tuned connection pool.
+
+    Args:
+        sdk: The SDK module.
+        max_connections: The maximum number of connections, which are all kept alive while idle.
+        keepalive_expiry: Seconds an idle connection is kept alive. A longer time than the default of the SDKs saves the
+            TLS handshake between the calls of a quiet bot.
+
+    Returns:
+        The keyword arguments of the SDK clients with the HTTP clients.
+    """
+    import httpx  # Dependency of both SDKs
+
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections,
+                          keepalive_expiry=keepalive_expiry)
+
+    return {"http_client": sdk.DefaultHttpxClient(limits=limits)}, \
+        {"http_client": sdk.DefaultAsyncHttpxClient(limits=limits)}
@@ -4,9 +4,9 @@
 #
 #
 
-from typing import Optional
+from typing import Optional, Iterator, AsyncIterator
 
-from .base import LLM
+from .base import LLM, StructuredPrompt, pooled_http_clients
 
 try:
     import openai
@@ -15,8 +15,26 @@ except ImportError:
 
 
 class OpenAI(LLM):
+    """
+    The static prefix of a `StructuredPrompt` is sent as the system message, so the prefix caching of OpenAI, which is
+    automatic, matches it across turns.
 
-    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-3.5-turbo", openai_client_kwargs: Optional[dict] = None):
+    Args:
+        api_key: The API key. By default, the `OPENAI_API_KEY` environment variable.
+        model: The model.
+        openai_client_kwargs: Keyword arguments of the OpenAI clients.
+        max_tokens: The maximum number of tokens of the completions. By default, no limit.
+        timeout: Seconds to wait for each request. By default, the one of the SDK.
+        max_retries: The number of retries of the SDK. Set it to 0 if the model is wrapped in a `ResilientLLM`.
+        max_connections: The size of the pool of HTTP connections. By default, the pool of the SDK.
+        keepalive_expiry: Seconds an idle connection of the pool is kept alive. By default, the one of the SDK.
+    """
+
+    supports_call_options = True
+
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-3.5-turbo", openai_client_kwargs: Optional[dict] = None,
+                 max_tokens: Optional[int] = None, timeout: Optional[float] = None, max_retries: Optional[int] = None,
+                 max_connections: Optional[int] = None, keepalive_expiry: Optional[float] = None):
         if openai is None:
             raise ImportError("Please install the 'linguista[openai]' package to use the OpenAI LLM.")
 
@@ -24,15 +42,71 @@ class OpenAI(LLM):
             openai_client_kwargs = {}
 
         self.model = model
+        self.max_tokens = max_tokens
 
-        self._client = openai.OpenAI(api_key=api_key, **openai_client_kwargs)
+        openai_client_kwargs = dict(openai_client_kwargs)
+        if timeout is not None:
+            openai_client_kwargs["timeout"] = timeout
+        if max_retries is not None:
+            openai_client_kwargs["max_retries"] = max_retries
 
-    def __call__(self, prompt: str):
-        completion = self._client.chat.completions.create(
-            model=self.model,
-            messages=[
+        client_kwargs, async_client_kwargs = {}, {}
+        if max_connections is not None or keepalive_expiry is not None:
+            client_kwargs, async_client_kwargs = pooled_http_clients(openai, max_connections, keepalive_expiry)
+
+        self._client = openai.OpenAI(api_key=api_key, **openai_client_kwargs, **client_kwargs)
+        self._async_client = openai.AsyncOpenAI(api_key=api_key, **openai_client_kwargs, **async_client_kwargs)
+
+    def _completion_kwargs(self, prompt: str, max_tokens: Optional[int], timeout: Optional[float], **kwargs):
+        if isinstance(prompt, StructuredPrompt):
+            messages = [
+                {"role": "system", "content": prompt.prefix},
+                {"role": "user", "content": prompt.suffix}
+            ]
+        else:
+            messages = [
                 {"role": "user", "content": prompt}
-            ],
-            temperature=0
+            ]
+
+        completion_kwargs = dict(
+            model=self.model,
+            messages=messages,
+            temperature=0,
+            **kwargs
         )
+
+        if max_tokens is None:
+            max_tokens = self.max_tokens
+        if max_tokens is not None:
+            completion_kwargs["max_tokens"] = max_tokens
+        if timeout is not None:
+            completion_kwargs["timeout"] = timeout
+
+        return completion_kwargs
+
+    def __call__(self, prompt: str, max_tokens: Optional[int] = None, timeout: Optional[float] = None):
+        completion = self._client.chat.completions.create(**self._completion_kwargs(prompt, max_tokens, timeout))
         return completion.choices[0].message.content
+
+    async def acall(self, prompt: str, max_tokens: Optional[int] = None, timeout: Optional[float] = None):
+        completion = await self._async_client.chat.completions.create(
+            **self._completion_kwargs(prompt, max_tokens, timeout)
+        )
+        return completion.choices[0].message.content
+
+    def stream(self, prompt: str, max_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Iterator[str]:
+        completion = self._client.chat.completions.create(
+            **self._completion_kwargs(prompt, max_tokens, timeout, stream=True)
+        )
+        for chunk in completion:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def astream(self, prompt: str, max_tokens: Optional[int] = None,
+                      timeout: Optional[float] = None) -> AsyncIterator[str]:
+        completion = await self._async_client.chat.completions.create(
+            **self._completion_kwargs(prompt, max_tokens, timeout, stream=True)
+        )
+        async for chunk in completion:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
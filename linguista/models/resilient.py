@@ -0,0 +1,448 @@
+#
+#
+#   Resilient LLM
+#
+#
+
+import asyncio
+import concurrent.futures
+import random
+import threading
+import time
+from collections import deque
+from typing import Optional, Iterator, AsyncIterator, Callable
+
+from .base import LLM
+from ..instrumentation.histogram import Histogram, DEFAULT_DURATION_BUCKETS
+
+# HTTP status codes worth retrying: timeout, conflict, rate limit and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class LLMDeadlineExceededError(TimeoutError):
+    """
+    Raised when a call to the model doesn't finish before its deadline, retries included.
+    """
+    pass
+
+
+def command_list_max_tokens(max_commands: int = 8, tokens_per_command: int = 32) -> int:
+    """
+    Estimate the maximum number of tokens of a completion with a command list, e.g. `SetSlot(amount, 50)` per line.
+
+    Args:
+        max_commands: The maximum number of commands expected in a completion.
+        tokens_per_command: The maximum number of tokens of a command, with the value of a slot.
+
+    Returns:
+        The maximum number of tokens.
+    """
+    return max_commands * tokens_per_command
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Whether a call that raised an error may succeed if made again: rate limits, server errors, timeouts and connection
+    errors. The errors of the SDKs are recognized by their status code and their name, so the SDKs aren't imported.
+    """
+    if isinstance(error, LLMDeadlineExceededError):
+        return False
+
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int):
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+
+    error_name = type(error).__name__
+    return "Timeout" in error_name or "Connection" in error_name
+
+
+def _get_retry_after(error: BaseException) -> Optional[float]:
+    # Seconds to wait before retrying that the API asked for, if any
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+
+    if headers is None:
+        return None
+
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+async def _get_first_chunk(chunks: AsyncIterator[str]) -> Optional[str]:
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+class ResilientLLM(LLM):
+    """
+    Wrap a model to bound the time of its calls and make them resilient to transient errors.
+
+    - Each call has a deadline, retries included. The remaining time is given as timeout to the calls of the wrapped
+      model, if it supports call options. Otherwise, the deadline is only enforced between attempts, unless the calls
+      are hedged or asynchronous.
+    - The calls that fail with a retryable error are retried with exponential backoff and full jitter, waiting at
+      least as long as the API asked for with a Retry-After header.
+    - With hedging, a second request is made when the first one is slower than usual, i.e. than a quantile of the
+      latencies observed, and the first response is taken. The slower request is cancelled if the call is asynchronous,
+      and abandoned in its worker thread otherwise.
+    - The completions are capped to `max_tokens`, unless a call gives its own. The bot caps the completions of the
+      command prompts to the size of a command list, see `Bot.command_max_tokens`, so the other prompts, e.g. of
+      `ConversationSummarizer`, aren't truncated.
+
+    Streams are retried only if they fail before the first chunk, and never hedged.
+
+    Disable the retries of the wrapped model, e.g. `OpenAI(max_retries=0)`, so they aren't multiplied.
+
+    Args:
+        llm: The wrapped model.
+        deadline: Seconds each call may take, retries included. None for no deadline.
+        max_attempts: The maximum number of attempts of each call.
+        backoff_base: Seconds of the first backoff, which doubles with each retry.
+        backoff_max: The maximum number of seconds of a backoff.
+        hedge_quantile: The quantile of the latencies after which a call is hedged, e.g. 0.95. None to not hedge.
+        hedge_after: Seconds after which a call is hedged, instead of a quantile of the latencies.
+        hedge_min_samples: The number of latencies to observe before hedging by quantile.
+        max_tokens: The maximum number of tokens of the completions. None to not cap them.
+        latency_window: The number of latest latencies kept to estimate the quantiles.
+        is_retryable: Function deciding whether a call that raised an error should be retried.
+        max_workers: The maximum number of threads of the synchronous hedged calls.
+    """
+
+    supports_call_options = True
+
+    def __init__(self, llm: LLM, deadline: Optional[float] = 30.0, max_attempts: int = 3, backoff_base: float = 0.25,
+                 backoff_max: float = 5.0, hedge_quantile: Optional[float] = None, hedge_after: Optional[float] = None,
+                 hedge_min_samples: int = 20, max_tokens: Optional[int] = None,
+                 latency_window: int = 500, is_retryable: Callable[[BaseException], bool] = is_retryable_error,
+                 max_workers: int = 16):
+        assert max_attempts >= 1, "There must be at least one attempt"
+        assert hedge_quantile is None or 0 < hedge_quantile < 1, f"Invalid hedge quantile: {hedge_quantile}"
+
+        self.llm = llm
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_quantile = hedge_quantile
+        self.hedge_after = hedge_after
+        self.hedge_min_samples = hedge_min_samples
+        self.max_tokens = max_tokens
+        self.is_retryable = is_retryable
+        self.max_workers = max_workers
+
+        # Latencies of the successful attempts, in seconds
+        self.latency_histogram = Histogram(DEFAULT_DURATION_BUCKETS)
+        self.attempts = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0  # Hedged calls answered by the second request
+        self.deadlines_exceeded = 0
+
+        self._latencies = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def latency_quantile(self, quantile: float) -> Optional[float]:
+        """
+        Estimate a quantile of the latencies of the latest successful attempts.
+
+        Returns:
+            The quantile, in seconds, or None if no attempt has succeeded yet.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+
+        if not latencies:
+            return None
+
+        return latencies[min(int(quantile * len(latencies)), len(latencies) - 1)]
+
+    def _get_hedge_delay(self) -> Optional[float]:
+        if self.hedge_after is not None:
+            return self.hedge_after
+
+        if self.hedge_quantile is None or len(self._latencies) < self.hedge_min_samples:
+            return None
+
+        return self.latency_quantile(self.hedge_quantile)
+
+    def _observe_latency(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+            self.latency_histogram.observe(latency)
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _get_deadline(self, timeout: Optional[float]) -> Optional[float]:
+        # The caller's timeout, if any, tightens the deadline
+        deadlines = [seconds for seconds in (self.deadline, timeout) if seconds is not None]
+
+        if not deadlines:
+            return None
+
+        return time.monotonic() + min(deadlines)
+
+    def _get_remaining(self, deadline: Optional[float]) -> Optional[float]:
+        if deadline is None:
+            return None
+
+        remaining = deadline - time.monotonic()
+
+        if remaining <= 0:
+            self._count("deadlines_exceeded")
+            raise LLMDeadlineExceededError("The model didn't respond before the deadline")
+
+        return remaining
+
+    def _get_call_options(self, max_tokens: Optional[int], remaining: Optional[float]) -> dict:
+        if not self.llm.supports_call_options:
+            return {}
+
+        if max_tokens is None:
+            max_tokens = self.max_tokens
+
+        options = {}
+        if max_tokens is not None:
+            options["max_tokens"] = max_tokens
+        if remaining is not None:
+            options["timeout"] = remaining
+
+        return options
+
+    def _get_backoff(self, attempt: int, error: BaseException) -> float:
+        backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+        retry_after = _get_retry_after(error)
+        if retry_after is not None:
+            backoff = max(backoff, retry_after)
+
+        return backoff
+
+    def _should_retry(self, attempt: int, error: BaseException, deadline: Optional[float]) -> Optional[float]:
+        # Backoff before the next attempt, or None to raise the error
+        if attempt >= self.max_attempts or not self.is_retryable(error):
+            return None
+
+        self._get_remaining(deadline)  # Raises if the attempt timed out because of the deadline
+
+        backoff = self._get_backoff(attempt, error)
+
+        if deadline is not None and time.monotonic() + backoff >= deadline:
+            return None
+
+        self._count("retries")
+        return backoff
+
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                                       thread_name_prefix="linguista-llm")
+            return self._executor
+
+    def _timed_call(self, prompt: str, options: dict):
+        self._count("attempts")
+
+        start = time.perf_counter()
+        completion = self.llm(prompt, **options)
+        self._observe_latency(time.perf_counter() - start)
+
+        return completion
+
+    async def _timed_acall(self, prompt: str, options: dict):
+        self._count("attempts")
+
+        start = time.perf_counter()
+        completion = await self.llm.acall(prompt, **options)
+        self._observe_latency(time.perf_counter() - start)
+
+        return completion
+
+    def _call_hedged(self, prompt: str, options: dict, hedge_delay: float, deadline: Optional[float]):
+        executor = self._get_executor()
+        first = executor.submit(self._timed_call, prompt, options)
+
+        remaining = self._get_remaining(deadline)
+        done, _ = concurrent.futures.wait([first], timeout=hedge_delay if remaining is None else
+                                          min(hedge_delay, remaining))
+
+        pending = {first}
+        if not done:
+            self._count("hedges")
+            hedge_options = self._get_call_options(options.get("max_tokens"), self._get_remaining(deadline))
+            pending.add(executor.submit(self._timed_call, prompt, hedge_options))
+
+        error = None
+        while pending:
+            remaining = self._get_remaining(deadline)
+            done, pending = concurrent.futures.wait(pending, timeout=remaining,
+                                                    return_when=concurrent.futures.FIRST_COMPLETED)
+
+            if not done:
+                self._get_remaining(deadline)  # Raises if the deadline has passed
+
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        self._count("hedge_wins")
+                    return future.result()
+
+                error = future.exception()
+
+        raise error
+
+    async def _acall_hedged(self, prompt: str, options: dict, hedge_delay: float, deadline: Optional[float]):
+        first = asyncio.ensure_future(self._timed_acall(prompt, options))
+        pending = {first}
+
+        try:
+            remaining = self._get_remaining(deadline)
+            done, _ = await asyncio.wait(pending, timeout=hedge_delay if remaining is None else
+                                         min(hedge_delay, remaining))
+
+            if not done:
+                self._count("hedges")
+                hedge_options = self._get_call_options(options.get("max_tokens"), self._get_remaining(deadline))
+                pending.add(asyncio.ensure_future(self._timed_acall(prompt, hedge_options)))
+
+            error = None
+            while pending:
+                remaining = self._get_remaining(deadline)
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    self._get_remaining(deadline)  # Raises if the deadline has passed
+
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self._count("hedge_wins")
+                        return task.result()
+
+                    error = task.exception()
+
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def __call__(self, prompt: str, max_tokens: Optional[int] = None, timeout: Optional[float] = None):
+        deadline = self._get_deadline(timeout)
+        attempt = 0
+
+        while True:
+            attempt += 1
+            options = self._get_call_options(max_tokens, self._get_remaining(deadline))
+
+            try:
+                hedge_delay = self._get_hedge_delay()
+
+                if hedge_delay is None:
+                    return self._timed_call(prompt, options)
+
+                return self._call_hedged(prompt, options, hedge_delay, deadline)
+            except Exception as error:
+                backoff = self._should_retry(attempt, error, deadline)
+
+                if backoff is None:
+                    raise
+
+            time.sleep(backoff)
+
+    async def acall(self, prompt: str, max_tokens: Optional[int] = None, timeout: Optional[float] = None):
+        deadline = self._get_deadline(timeout)
+        attempt = 0
+
+        while True:
+            attempt += 1
+            remaining = self._get_remaining(deadline)
+            options = self._get_call_options(max_tokens, remaining)
+
+            try:
+                hedge_delay = self._get_hedge_delay()
+
+                if hedge_delay is None:
+                    return await asyncio.wait_for(self._timed_acall(prompt, options), timeout=remaining)
+
+                return await self._acall_hedged(prompt, options, hedge_delay, deadline)
+            except Exception as error:
+                backoff = self._should_retry(attempt, error, deadline)
+
+                if backoff is None:
+                    raise
+
+            await asyncio.sleep(backoff)
+
+    def stream(self, prompt: str, max_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Iterator[str]:
+        deadline = self._get_deadline(timeout)
+        attempt = 0
+
+        while True:
+            attempt += 1
+            options = self._get_call_options(max_tokens, self._get_remaining(deadline))
+
+            self._count("attempts")
+            start = time.perf_counter()
+            chunks = self.llm.stream(prompt, **options)
+
+            try:
+                first_chunk = next(chunks, None)
+            except Exception as error:
+                backoff = self._should_retry(attempt, error, deadline)
+
+                if backoff is None:
+                    raise
+
+                time.sleep(backoff)
+                continue
+
+            # The latency of a stream is the time to its first chunk
+            self._observe_latency(time.perf_counter() - start)
+
+            if first_chunk is not None:
+                yield first_chunk
+            yield from chunks
+            return
+
+    async def astream(self, prompt: str, max_tokens: Optional[int] = None,
+                      timeout: Optional[float] = None) -> AsyncIterator[str]:
+        deadline = self._get_deadline(timeout)
+        attempt = 0
+
+        while True:
+            attempt += 1
+            remaining = self._get_remaining(deadline)
+            options = self._get_call_options(max_tokens, remaining)
+
+            self._count("attempts")
+            start = time.perf_counter()
+            chunks = self.llm.astream(prompt, **options).__aiter__()
+
+            try:
+                first_chunk = await asyncio.wait_for(_get_first_chunk(chunks), timeout=remaining)
+            except Exception as error:
+                backoff = self._should_retry(attempt, error, deadline)
+
+                if backoff is None:
+                    raise
+
+                await asyncio.sleep(backoff)
+                continue
+
+            # The latency of a stream is the time to its first chunk
+            self._observe_latency(time.perf_counter() - start)
+
+            if first_chunk is not None:
+                yield first_chunk
+            async for chunk in chunks:
+                yield chunk
+            return
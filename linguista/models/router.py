@@ -0,0 +1,300 @@
+#
+#
+#   Router of LLMs
+#
+#
+
+import threading
+import time
+from collections import deque
+from typing import Optional, Sequence, List, Iterator, AsyncIterator
+
+from .base import LLM
+from ..commands.command import parse_command_prompt_response
+
+CHEAPEST = "cheapest"  # The cheapest backend available
+LATENCY = "latency"  # The backend available with the lowest latency observed
+ESCALATE = "escalate"  # The cheapest backend available, then stronger ones while the completion has no commands
+
+ROUTING_POLICIES = (CHEAPEST, LATENCY, ESCALATE)
+
+# States of the circuit breaker of a backend
+CLOSED = "closed"  # The backend is called
+OPEN = "open"  # The backend is failing and it isn't called
+HALF_OPEN = "half_open"  # The backend was failing, a trial call decides whether to close or open the circuit again
+
+
+class BackendStats:
+    """
+    Latencies and errors of the latest calls to a backend, and the state of its circuit breaker.
+
+    Args:
+        name: The name of the backend.
+        cost: The relative cost of the backend.
+        window: The number of latest calls kept.
+    """
+
+    def __init__(self, name: str, cost: float, window: int):
+        self.name = name
+        self.cost = cost
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+        self._latencies = deque(maxlen=window)  # Of the successful calls, in seconds
+        self._errors = deque(maxlen=window)  # Whether each call failed
+
+    @property
+    def calls(self) -> int:
+        return len(self._errors)
+
+    @property
+    def mean_latency(self) -> Optional[float]:
+        if not self._latencies:
+            return None
+
+        return sum(self._latencies) / len(self._latencies)
+
+    @property
+    def error_rate(self) -> float:
+        if not self._errors:
+            return 0.0
+
+        return sum(self._errors) / len(self._errors)
+
+    def record_success(self, latency: float):
+        self._latencies.append(latency)
+        self._errors.append(False)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+
+    def record_failure(self, failure_threshold: int):
+        self._errors.append(True)
+        self.consecutive_failures += 1
+
+        if self.state == HALF_OPEN or self.consecutive_failures >= failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def __repr__(self):
+        return (f"BackendStats(name={self.name!r}, state={self.state!r}, calls={self.calls}, "
+                f"mean_latency={self.mean_latency}, error_rate={self.error_rate:.2f})")
+
+
+def _get_backend_name(llm: LLM) -> str:
+    model = getattr(llm, "model", None)
+    return f"{type(llm).__name__}({model})" if model is not None else type(llm).__name__
+
+
+class RouterLLM(LLM):
+    """
+    Route each call among several models, falling back to the next one if a call fails.
+
+    The backends are tried in the order given by the policy:
+
+    - "cheapest": by cost.
+    - "latency": by the mean latency of their latest calls. The backends without calls yet are tried first.
+    - "escalate": by cost, but a completion without commands is only accepted from the last backend. The weaker
+      backends answer the easy turns, and the stronger ones the turns that the weaker ones didn't understand. The
+      completion of the last backend tried is returned if none has commands.
+
+    A backend whose calls fail `failure_threshold` times in a row is skipped for `recovery_time` seconds, i.e. its
+    circuit breaker opens. After that time, the next call decides whether it's closed again. If the circuits of all
+    the backends are open, they are tried anyway.
+
+    Streams fall back to the next backend only if they fail before the first chunk. With the "escalate" policy, the
+    completion must be complete to know whether it has commands, so it's streamed as a single chunk.
+
+    Args:
+        backends: The models, from the cheapest or weakest to the most expensive or strongest.
+        policy: The routing policy: "cheapest", "latency" or "escalate".
+        costs: The relative cost of each backend. By default, the order of the backends.
+        window: The number of latest calls to each backend used for the stats.
+        failure_threshold: The number of consecutive failures of a backend that open its circuit.
+        recovery_time: Seconds a circuit stays open.
+    """
+
+    supports_call_options = True
+
+    def __init__(self, backends: Sequence[LLM], policy: str = CHEAPEST, costs: Optional[Sequence[float]] = None,
+                 window: int = 100, failure_threshold: int = 5, recovery_time: float = 30.0):
+        assert len(backends) > 0, "There must be at least one backend"
+        assert policy in ROUTING_POLICIES, f"Invalid routing policy: {policy}"
+        assert costs is None or len(costs) == len(backends), "There must be a cost for each backend"
+
+        if costs is None:
+            costs = range(len(backends))
+
+        self.backends = list(backends)
+        self.policy = policy
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.stats = [BackendStats(_get_backend_name(backend), cost, window)
+                      for backend, cost in zip(backends, costs)]
+
+        self._lock = threading.Lock()
+
+    def _get_route(self) -> List[int]:
+        # Indices of the backends in the order to try them
+        with self._lock:
+            if self.policy == LATENCY:
+                route = sorted(range(len(self.backends)), key=lambda i: (self.stats[i].mean_latency is not None,
+                                                                        self.stats[i].mean_latency or 0.0))
+            else:
+                route = sorted(range(len(self.backends)), key=lambda i: self.stats[i].cost)
+
+            now = time.monotonic()
+            available = []
+            for i in route:
+                stats = self.stats[i]
+
+                if stats.state == OPEN and now - stats.opened_at >= self.recovery_time:
+                    stats.state = HALF_OPEN
+
+                if stats.state != OPEN:
+                    available.append(i)
+
+        return available or route
+
+    def _record_success(self, index: int, latency: float):
+        with self._lock:
+            self.stats[index].record_success(latency)
+
+    def _record_failure(self, index: int):
+        with self._lock:
+            self.stats[index].record_failure(self.failure_threshold)
+
+    def _is_accepted(self, completion: str, position: int, route: List[int]) -> bool:
+        if self.policy != ESCALATE or position == len(route) - 1:
+            return True
+
+        return len(parse_command_prompt_response(completion)) > 0
+
+    @staticmethod
+    def _get_call_options(backend: LLM, max_tokens: Optional[int], timeout: Optional[float]) -> dict:
+        if not backend.supports_call_options:
+            return {}
+
+        options = {}
+        if max_tokens is not None:
+            options["max_tokens"] = max_tokens
+        if timeout is not None:
+            options["timeout"] = timeout
+
+        return options
+
+    def __call__(self, prompt: str, max_tokens: Optional[int] = None, timeout: Optional[float] = None):
+        route = self._get_route()
+        completion = None
+        error = None
+
+        for position, index in enumerate(route):
+            backend = self.backends[index]
+
+            start = time.perf_counter()
+            try:
+                completion = backend(prompt, **self._get_call_options(backend, max_tokens, timeout))
+            except Exception as backend_error:
+                self._record_failure(index)
+                error = backend_error
+                continue
+
+            self._record_success(index, time.perf_counter() - start)
+
+            if self._is_accepted(completion, position, route):
+                return completion
+
+        # A completion without commands is better than an error
+        if completion is not None:
+            return completion
+
+        raise error
+
+    async def acall(self, prompt: str, max_tokens: Optional[int] = None, timeout: Optional[float] = None):
+        route = self._get_route()
+        completion = None
+        error = None
+
+        for position, index in enumerate(route):
+            backend = self.backends[index]
+
+            start = time.perf_counter()
+            try:
+                completion = await backend.acall(prompt, **self._get_call_options(backend, max_tokens, timeout))
+            except Exception as backend_error:
+                self._record_failure(index)
+                error = backend_error
+                continue
+
+            self._record_success(index, time.perf_counter() - start)
+
+            if self._is_accepted(completion, position, route):
+                return completion
+
+        # A completion without commands is better than an error
+        if completion is not None:
+            return completion
+
+        raise error
+
+    def stream(self, prompt: str, max_tokens: Optional[int] = None, timeout: Optional[float] = None) -> Iterator[str]:
+        if self.policy == ESCALATE:
+            yield self(prompt, max_tokens=max_tokens, timeout=timeout)
+            return
+
+        error = None
+        for index in self._get_route():
+            backend = self.backends[index]
+
+            start = time.perf_counter()
+            chunks = backend.stream(prompt, **self._get_call_options(backend, max_tokens, timeout))
+
+            try:
+                first_chunk = next(chunks, None)
+            except Exception as backend_error:
+                self._record_failure(index)
+                error = backend_error
+                continue
+
+            # The latency of a stream is the time to its first chunk
+            self._record_success(index, time.perf_counter() - start)
+
+            if first_chunk is not None:
+                yield first_chunk
+            yield from chunks
+            return
+
+        raise error
+
+    async def astream(self, prompt: str, max_tokens: Optional[int] = None,
+                      timeout: Optional[float] = None) -> AsyncIterator[str]:
+        if self.policy == ESCALATE:
+            yield await self.acall(prompt, max_tokens=max_tokens, timeout=timeout)
+            return
+
+        error = None
+        for index in self._get_route():
+            backend = self.backends[index]
+
+            start = time.perf_counter()
+            chunks = backend.astream(prompt, **self._get_call_options(backend, max_tokens, timeout)).__aiter__()
+
+            try:
+                first_chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                first_chunk = None
+            except Exception as backend_error:
+                self._record_failure(index)
+                error = backend_error
+                continue
+
+            # The latency of a stream is the time to its first chunk
+            self._record_success(index, time.perf_counter() - start)
+
+            if first_chunk is not None:
+                yield first_chunk
+            async for chunk in chunks:
+                yield chunk
+            return
+
+        raise error
@@ -0,0 +1,111 @@
+#
+#
+#   Flow registry
+#
+#
+
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Sequence, Type
+
+from .event_flows import (CancelFlow, CannotHandle, ChitChat, Clarify, Completed, ContinueInterrupted, Correction,
+                          HumanHandoff, InternalError, SkipQuestion)
+from .event_flows.base import EventFlow
+from .flow import Flow
+
+DEFAULT_EVENT_FLOWS: Dict[str, Type[EventFlow]] = {
+    "cancel": CancelFlow,
+    "cannot_handle": CannotHandle,
+    "chit_chat": ChitChat,
+    "clarify": Clarify,
+    "completed": Completed,
+    "continue_interrupted": ContinueInterrupted,
+    "correction": Correction,
+    "human_handoff": HumanHandoff,
+    "internal_error": InternalError,
+    "skip_question": SkipQuestion
+}
+
+
+class FlowRegistry:
+    """
+    The flows of a bot, indexed by name and by event.
+
+    The event flows are bound to their default implementation unless an instance of a subclass of it is registered,
+    in which case the first one registered overrides it.
+    """
+
+    def __init__(self, flows: Sequence[Flow] = ()):
+        self._flows: List[Flow] = []
+        self._user_flows: List[Flow] = []
+        self._event_flows: Dict[str, Flow] = {event: event_flow_cls()
+                                              for event, event_flow_cls in DEFAULT_EVENT_FLOWS.items()}
+        self._overriden_events = set()
+        self._flows_by_name: Dict[str, Flow] = {flow.name: flow for flow in self._event_flows.values()}
+
+        for flow in flows:
+            self.add(flow)
+
+    def add(self, flow: Flow):
+        """
+        Register a flow.
+
+        Raises:
+            ValueError: If there's already a flow with the same name.
+        """
+        assert isinstance(flow, Flow), "All flows must be subclasses of Flow."
+
+        event = None
+        if isinstance(flow, EventFlow):
+            event = next((event for event, event_flow_cls in DEFAULT_EVENT_FLOWS.items()
+                          if isinstance(flow, event_flow_cls) and event not in self._overriden_events), None)
+
+        registered_flow = self._flows_by_name.get(flow.name)
+
+        # Overriding an event flow may reuse the name of its default implementation
+        is_overriding_default = event is not None and registered_flow is self._event_flows[event]
+
+        if registered_flow is not None and not is_overriding_default:
+            raise ValueError(f"Flow '{flow.name}' is already registered.")
+
+        if event is not None:
+            del self._flows_by_name[self._event_flows[event].name]
+            self._event_flows[event] = flow
+            self._overriden_events.add(event)
+        elif not isinstance(flow, EventFlow):
+            self._user_flows.append(flow)
+
+        self._flows_by_name[flow.name] = flow
+        self._flows.append(flow)
+
+    def get(self, name: str) -> Optional[Flow]:
+        """
+        Get a user flow or an event flow by its name, or None if there's no such flow.
+        """
+        return self._flows_by_name.get(name)
+
+    @property
+    def flows(self) -> List[Flow]:
+        """
+        The flows registered, in order of registration.
+        """
+        return list(self._flows)
+
+    @property
+    def user_flows(self) -> List[Flow]:
+        """
+        The flows registered that are not event flows, i.e. the flows that can be started by the user.
+        """
+        return list(self._user_flows)
+
+    @property
+    def event_flows(self) -> Mapping[str, Flow]:
+        """
+        The flow bound to each event, as a read-only view.
+        """
+        return MappingProxyType(self._event_flows)
+
+    def __contains__(self, name: str):
+        return name in self._flows_by_name
+
+    def __len__(self):
+        return len(self._flows)
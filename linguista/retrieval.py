@@ -0,0 +1,116 @@
+#
+#
+#   Flow retrieval
+#
+#
+
+import re
+import zlib
+from typing import Callable, Optional, Sequence, List
+
+from .flow import Flow
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _flow_to_text(flow: Flow) -> str:
+    """
+    The text of a flow that is embedded: its name, description and the descriptions of its slots.
+    """
+    return "\n".join([flow.name, flow.description] + [f"{slot.name}: {slot.description}" for slot in flow.get_slots()])
+
+
+def _normalize_rows(embeddings):
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+class HashingEmbedding:
+    """
+    Embed texts by hashing their words and the character trigrams of the words into a fixed number of dimensions.
+    It needs no model, so it only captures lexical similarity.
+
+    Args:
+        dim: The number of dimensions of the embeddings.
+    """
+
+    def __init__(self, dim: int = 1024):
+        if np is None:
+            raise ImportError("Please install the 'linguista[retrieval]' package to use the hashing embedding.")
+
+        self.dim = dim
+
+    def __call__(self, texts: Sequence[str]):
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+
+        for row, text in enumerate(texts):
+            for word in re.findall(r"[a-z0-9]+", text.lower()):
+                padded_word = f"<{word}>"
+                features = [word] + [padded_word[i:i + 3] for i in range(len(padded_word) - 2)]
+
+                for feature in features:
+                    embeddings[row, zlib.crc32(feature.encode()) % self.dim] += 1.0
+
+        return embeddings
+
+
+class FlowRetriever:
+    """
+    Select the flows relevant to a message, so the prompt doesn't list the whole catalogue of flows. The flows are
+    embedded once when they are indexed, and the message is compared to them by cosine similarity.
+
+    Args:
+        embed: Function that embeds a list of texts into an array of shape (num_texts, dim). By default,
+            `HashingEmbedding`.
+        top_k: The number of flows to retrieve.
+    """
+
+    def __init__(self, embed: Optional[Callable[[Sequence[str]], Sequence[Sequence[float]]]] = None, top_k: int = 5):
+        if np is None:
+            raise ImportError("Please install the 'linguista[retrieval]' package to use the flow retriever.")
+
+        assert top_k > 0, "The number of flows to retrieve must be positive."
+
+        if embed is None:
+            embed = HashingEmbedding()
+
+        self.embed = embed
+        self.top_k = top_k
+
+        self._flows: List[Flow] = []
+        self._embeddings = None
+
+    def index(self, flows: Sequence[Flow]):
+        """
+        Index the flows that can be retrieved, replacing the previous ones.
+        """
+        self._flows = list(flows)
+
+        if self._flows:
+            embeddings = np.asarray(self.embed([_flow_to_text(flow) for flow in self._flows]), dtype=np.float32)
+            self._embeddings = _normalize_rows(embeddings)
+        else:
+            self._embeddings = None
+
+    def retrieve(self, query: str) -> List[Flow]:
+        """
+        Retrieve the flows most similar to a query.
+
+        Args:
+            query: The text to compare the flows to, usually the message from the user.
+
+        Returns:
+            The `top_k` most similar flows, in the order they were indexed.
+        """
+        if len(self._flows) <= self.top_k:
+            return list(self._flows)
+
+        query_embedding = _normalize_rows(np.asarray(self.embed([query]), dtype=np.float32))[0]
+        scores = self._embeddings @ query_embedding
+
+        top_indices = np.sort(np.argpartition(-scores, self.top_k - 1)[:self.top_k])
+
+        return [self._flows[index] for index in top_indices]
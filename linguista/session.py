@@ -5,20 +5,40 @@
 #
 
 class Session:
+    """
+    Lightweight handle to talk to a bot in a session. Creating one is free, the state of the session is kept by the
+    tracker of the bot. The slot methods return what the tracker returns, i.e. awaitables for asynchronous trackers.
 
-    def __init__(self, session_id: str, tracker):
+    Args:
+        session_id: The session ID.
+        bot: The bot.
+    """
+
+    def __init__(self, session_id: str, bot):
         self.session_id = session_id
-        self.tracker = tracker
+        self.bot = bot
 
     @property
     def id(self):
         return self.session_id
 
+    def message(self, message: str, stream: bool = False):
+        """
+        Listen to the user. See `Bot.message`.
+        """
+        return self.bot.message(self.session_id, message, stream=stream)
+
+    async def amessage(self, message: str, stream: bool = False):
+        """
+        Listen to the user asynchronously. See `Bot.amessage`.
+        """
+        return await self.bot.amessage(self.session_id, message, stream=stream)
+
     def get_slot(self, slot_name: str):
-        ...
+        return self.bot.tracker.get_slot(self.session_id, slot_name)
 
     def set_slot(self, slot_name: str, value):
-        ...
+        return self.bot.tracker.set_slot(self.session_id, slot_name, value)
 
     def delete_slot(self, slot_name: str):
-        ...
+        return self.bot.tracker.delete_slot(self.session_id, slot_name)
@@ -0,0 +1,105 @@
+#
+#
+#   Conversation summary
+#
+#
+
+import os
+from typing import Dict, List, Optional
+
+import jinja2
+
+from .commands.command import ROLE_TO_STR
+from .models.base import LLM
+
+current_dir = os.path.dirname(os.path.realpath(__file__))
+
+with open(os.path.join(current_dir, "summary_prompt_template.jinja2")) as fp:
+    SUMMARY_PROMPT_TEMPLATE = fp.read()
+
+
+class ConversationSummarizer:
+    """
+    Fold the older messages of long conversations into a rolling summary, so the prompt keeps the same size however
+    long the session is.
+
+    Once the conversation stored for a session has more than `threshold` messages, all but the `keep_last` latest ones
+    are added to the summary of the session and deleted from the conversation. The bot does it after committing the
+    turn, in the background, so no turn waits for the summary. The prompt then has the summary followed by the latest
+    messages.
+
+    The tracker must keep more than `threshold` messages, see its `history_size`, or the messages would be dropped
+    before they are summarized.
+
+    Args:
+        model: The model writing the summaries. A small and fast one is usually enough.
+        threshold: The number of messages of a conversation above which it's summarized.
+        keep_last: The number of latest messages kept as they are.
+        max_tokens: The maximum number of tokens of a summary, if the model accepts call options.
+        max_workers: The number of threads summarizing the conversations of the synchronous bot.
+    """
+
+    def __init__(self, model: LLM, threshold: int = 16, keep_last: int = 8, max_tokens: Optional[int] = 256,
+                 max_workers: int = 4):
+        assert 0 <= keep_last < threshold, "The messages kept must be fewer than the threshold"
+
+        self.model = model
+        self.threshold = threshold
+        self.keep_last = keep_last
+        self.max_tokens = max_tokens
+        self.max_workers = max_workers
+
+        self._template = jinja2.Template(SUMMARY_PROMPT_TEMPLATE)
+
+    def should_summarize(self, num_messages: int) -> bool:
+        """
+        Whether a conversation with that number of messages must be summarized.
+        """
+        return num_messages > self.threshold
+
+    def get_messages_to_summarize(self, conversation: List[Dict]) -> List[Dict]:
+        """
+        Get the oldest messages of a conversation, the ones to add to the summary.
+        """
+        return conversation[:len(conversation) - self.keep_last]
+
+    def render(self, summary: str, messages: List[Dict]) -> str:
+        """
+        Render the prompt to add some messages to a summary.
+
+        Args:
+            summary: The summary so far, empty if there's none.
+            messages: The messages to add, as stored in the conversation.
+
+        Returns:
+            The prompt.
+        """
+        return self._template.render({
+            "summary": summary,
+            "messages": "\n".join(f"{ROLE_TO_STR[message['role']]}: {message['message']}" for message in messages)
+        })
+
+    def _get_call_options(self) -> dict:
+        if self.max_tokens is None or not self.model.supports_call_options:
+            return {}
+
+        return {"max_tokens": self.max_tokens}
+
+    def summarize(self, summary: str, messages: List[Dict]) -> str:
+        """
+        Add some messages to a summary.
+
+        Args:
+            summary: The summary so far, empty if there's none.
+            messages: The messages to add, as stored in the conversation.
+
+        Returns:
+            The new summary.
+        """
+        return self.model(self.render(summary, messages), **self._get_call_options()).strip()
+
+    async def asummarize(self, summary: str, messages: List[Dict]) -> str:
+        """
+        Asynchronous version of `summarize`.
+        """
+        return (await self.model.acall(self.render(summary, messages), **self._get_call_options())).strip()
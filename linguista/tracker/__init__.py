@@ -4,6 +4,18 @@
 #
 #
 
-from .base import Tracker
-from .redis import RedisTracker
-from .proxy import ProxyTracker
+from .base import Tracker, AsyncTracker   # noqa: F401
+from .adapter import AsyncTrackerAdapter   # noqa: F401
+from .turn_state import TurnState, TurnChanges, PreparedTurn   # noqa: F401
+from .memory import InMemoryTracker   # noqa: F401
+from .proxy import ProxyTracker   # noqa: F401
+from ..utils import lazy_attributes
+
+# Imported when first accessed, so the Redis and MessagePack clients are only imported if they're used
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    "RedisTracker": ".redis",
+    "AsyncRedisTracker": ".redis",
+    "ActionCodec": ".codecs",
+    "JSONActionCodec": ".codecs",
+    "MsgpackActionCodec": ".codecs",
+})
@@ -0,0 +1,111 @@
+#
+#
+#   Adapter to use a synchronous tracker where an asynchronous one is expected
+#
+#
+
+from typing import Sequence, Tuple, TYPE_CHECKING
+
+from .base import Tracker, AsyncTracker
+from ..enums import Role
+
+if TYPE_CHECKING:
+    from ..actions import Action
+
+
+class AsyncTrackerAdapter(AsyncTracker):
+    """
+    Expose a synchronous tracker through the `AsyncTracker` interface.
+
+    The calls are made directly on the wrapped tracker, without offloading them to a thread. This way the coroutines
+    never suspend and `Bot.message` can drive them without an event loop.
+    """
+
+    def __init__(self, tracker: Tracker):
+        self.tracker = tracker
+
+    @property
+    def supports_prepared_turns(self) -> bool:
+        return self.tracker.supports_prepared_turns
+
+    async def get_conversation(self, session_id: str):
+        return self.tracker.get_conversation(session_id)
+
+    async def add_message_to_conversation(self, session_id: str, role: Role, message: str):
+        return self.tracker.add_message_to_conversation(session_id, role, message)
+
+    async def get_slot(self, session_id: str, slot_name: str):
+        return self.tracker.get_slot(session_id, slot_name)
+
+    async def set_slot(self, session_id: str, slot_name: str, value):
+        return self.tracker.set_slot(session_id, slot_name, value)
+
+    async def delete_slot(self, session_id: str, slot_name: str):
+        return self.tracker.delete_slot(session_id, slot_name)
+
+    async def get_flow_slot(self, session_id: str, flow_name: str, slot_name: str):
+        return self.tracker.get_flow_slot(session_id, flow_name, slot_name)
+
+    async def set_flow_slot(self, session_id: str, flow_name: str, slot_name: str, value):
+        return self.tracker.set_flow_slot(session_id, flow_name, slot_name, value)
+
+    async def delete_flow_slot(self, session_id: str, flow_name: str, slot_name: str):
+        return self.tracker.delete_flow_slot(session_id, flow_name, slot_name)
+
+    async def get_flow_slots(self, session_id: str, flow_name: str):
+        return self.tracker.get_flow_slots(session_id, flow_name)
+
+    async def delete_flow_slots(self, session_id: str):
+        return self.tracker.delete_flow_slots(session_id)
+
+    async def save_current_actions(self, session_id: str, actions_with_flows: Sequence[Tuple["Action", str]]):
+        return self.tracker.save_current_actions(session_id, actions_with_flows)
+
+    async def get_current_actions(self, session_id: str):
+        return self.tracker.get_current_actions(session_id)
+
+    async def delete_current_actions(self, session_id: str):
+        return self.tracker.delete_current_actions(session_id)
+
+    async def save_following_actions_for_flow_slot(self, session_id: str, flow_name: str, slot_name: str,
+                                                   actions: Sequence["Action"]):
+        return self.tracker.save_following_actions_for_flow_slot(session_id, flow_name, slot_name, actions)
+
+    async def get_following_actions_for_flow_slot(self, session_id: str, flow_name: str, slot_name: str):
+        return self.tracker.get_following_actions_for_flow_slot(session_id, flow_name, slot_name)
+
+    async def delete_following_actions(self, session_id: str):
+        return self.tracker.delete_following_actions(session_id)
+
+    async def load_turn_state(self, session_id: str):
+        return self.tracker.load_turn_state(session_id)
+
+    async def commit_turn_state(self, turn_state):
+        return self.tracker.commit_turn_state(turn_state)
+
+    async def load_turn_states(self, session_ids: Sequence[str]):
+        return self.tracker.load_turn_states(session_ids)
+
+    async def commit_turn_states(self, turn_states):
+        return self.tracker.commit_turn_states(turn_states)
+
+    async def acquire_turn_lock(self, session_id: str, ttl: float):
+        return self.tracker.acquire_turn_lock(session_id, ttl)
+
+    async def release_turn_lock(self, session_id: str, token: int):
+        return self.tracker.release_turn_lock(session_id, token)
+
+    async def push_pending_message(self, session_id: str, message: str):
+        return self.tracker.push_pending_message(session_id, message)
+
+    async def pop_pending_messages(self, session_id: str):
+        return self.tracker.pop_pending_messages(session_id)
+
+    async def get_summary(self, session_id: str):
+        return self.tracker.get_summary(session_id)
+
+    async def get_message_count(self, session_id: str):
+        return self.tracker.get_message_count(session_id)
+
+    async def compact_conversation(self, session_id: str, summary: str, message_count: int):
+        return self.tracker.compact_conversation(session_id, summary, message_count)
@@ -5,12 +5,20 @@
 #
 
 from abc import ABC, abstractmethod
+from typing import Sequence, Tuple, Dict, List, Optional, TYPE_CHECKING
 
 from ..enums import Role
 
+if TYPE_CHECKING:
+    from ..actions import Action
+    from .turn_state import TurnState
+
 
 class Tracker(ABC):
 
+    # Whether the tracker loads and commits `TurnState.prepared_turn`, so the bot prepares the turns answering asks
+    supports_prepared_turns = False
+
     @abstractmethod
     def get_conversation(self, session_id: str):
         """
@@ -112,3 +120,644 @@ class Tracker(ABC):
             slot_name: The name of the slot.
         """
         raise NotImplementedError()
+
+    @abstractmethod
+    def get_flow_slots(self, session_id: str, flow_name: str) -> Dict[str, str]:
+        """
+        Get all the slots for a flow in a session.
+
+        Args:
+            session_id: The session ID.
+            flow_name: The name of the flow.
+
+        Returns:
+            The slot values by slot name.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def delete_flow_slots(self, session_id: str):
+        """
+        Delete the slots of all the flows in a session.
+
+        Args:
+            session_id: The session ID.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def save_current_actions(self, session_id: str, actions_with_flows: Sequence[Tuple["Action", str]]):
+        """
+        Save the pending actions for a session.
+
+        Args:
+            session_id: The session ID.
+            actions_with_flows: The pending actions with the name of the flow they belong to.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_current_actions(self, session_id: str) -> Sequence[Tuple["Action", str]]:
+        """
+        Get the pending actions for a session.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The pending actions with the name of the flow they belong to.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def delete_current_actions(self, session_id: str):
+        """
+        Delete the pending actions for a session.
+
+        Args:
+            session_id: The session ID.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def save_following_actions_for_flow_slot(self, session_id: str, flow_name: str, slot_name: str,
+                                             actions: Sequence["Action"]):
+        """
+        Save the actions that follow the ask of a flow slot, so the flow can be resumed after a correction.
+
+        Args:
+            session_id: The session ID.
+            flow_name: The name of the flow.
+            slot_name: The name of the slot.
+            actions: The actions following the ask.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_following_actions_for_flow_slot(self, session_id: str, flow_name: str,
+                                            slot_name: str) -> Sequence["Action"]:
+        """
+        Get the actions that follow the ask of a flow slot.
+
+        Args:
+            session_id: The session ID.
+            flow_name: The name of the flow.
+            slot_name: The name of the slot.
+
+        Returns:
+            The actions following the ask.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def delete_following_actions(self, session_id: str):
+        """
+        Delete the following actions of all the flow slots in a session.
+
+        Args:
+            session_id: The session ID.
+        """
+        raise NotImplementedError()
+
+    def load_turn_state(self, session_id: str) -> "TurnState":
+        """
+        Load the state of a session at the start of a turn. By default, the conversation and the pending actions are
+        preloaded and the flow state is loaded lazily.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The turn state, buffering the writes until it's committed.
+        """
+        from .turn_state import TurnState
+
+        turn_state = TurnState(session_id, self, conversation=self.get_conversation(session_id),
+                               current_actions=self.get_current_actions(session_id))
+        turn_state.round_trips += 2
+
+        return turn_state
+
+    def commit_turn_state(self, turn_state: "TurnState"):
+        """
+        Flush the writes buffered during a turn. By default, they are applied one by one.
+
+        Args:
+            turn_state: The turn state returned by `load_turn_state`.
+        """
+        session_id = turn_state.session_id
+        changes = turn_state.changes
+
+        for role, message in changes.messages:
+            self.add_message_to_conversation(session_id, role, message)
+            turn_state.round_trips += 1
+
+        if changes.flow_slots_deleted:
+            self.delete_flow_slots(session_id)
+            turn_state.round_trips += 1
+
+        for flow_name, flow_slots in changes.flow_slots.items():
+            for slot_name, value in flow_slots.items():
+                if value is None:
+                    self.delete_flow_slot(session_id, flow_name, slot_name)
+                else:
+                    self.set_flow_slot(session_id, flow_name, slot_name, value)
+                turn_state.round_trips += 1
+
+        if changes.following_actions_deleted:
+            self.delete_following_actions(session_id)
+            turn_state.round_trips += 1
+
+        for flow_name, following_actions in changes.following_actions.items():
+            for slot_name, actions in following_actions.items():
+                self.save_following_actions_for_flow_slot(session_id, flow_name, slot_name, actions)
+                turn_state.round_trips += 1
+
+        if changes.current_actions_deleted:
+            self.delete_current_actions(session_id)
+            turn_state.round_trips += 1
+        elif changes.current_actions is not None:
+            self.save_current_actions(session_id, changes.current_actions)
+            turn_state.round_trips += 1
+
+    def load_turn_states(self, session_ids: Sequence[str]) -> List["TurnState"]:
+        """
+        Load the state of several sessions at the start of their turns. By default, they are loaded one by one.
+
+        Args:
+            session_ids: The session IDs.
+
+        Returns:
+            The turn states, in the same order.
+        """
+        return [self.load_turn_state(session_id) for session_id in session_ids]
+
+    def commit_turn_states(self, turn_states: Sequence["TurnState"]):
+        """
+        Flush the writes buffered during the turns of several sessions. By default, they are committed one by one.
+
+        Args:
+            turn_states: The turn states returned by `load_turn_states`.
+        """
+        for turn_state in turn_states:
+            self.commit_turn_state(turn_state)
+
+    def acquire_turn_lock(self, session_id: str, ttl: float) -> Optional[int]:
+        """
+        Try to lock a session for a turn. The lock is released when the turn state is committed, see
+        `TurnState.lock_token`.
+
+        Args:
+            session_id: The session ID.
+            ttl: Seconds after which the lock expires, in case the turn never finishes.
+
+        Returns:
+            The fencing token of the lock, increasing with every lock of the session, or None if it's already locked.
+        """
+        raise NotImplementedError("The tracker doesn't support session locks.")
+
+    def release_turn_lock(self, session_id: str, token: int):
+        """
+        Release a session lock without committing a turn, if it's still held with the token.
+
+        Args:
+            session_id: The session ID.
+            token: The fencing token returned by `acquire_turn_lock`.
+        """
+        raise NotImplementedError("The tracker doesn't support session locks.")
+
+    def push_pending_message(self, session_id: str, message: str):
+        """
+        Save a message waiting for the session lock, to be merged with the other waiting messages.
+
+        Args:
+            session_id: The session ID.
+            message: The message from the user.
+        """
+        raise NotImplementedError("The tracker doesn't support pending messages.")
+
+    def pop_pending_messages(self, session_id: str) -> List[str]:
+        """
+        Get and remove the messages waiting for the session lock.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The messages, in the order they were received.
+        """
+        raise NotImplementedError("The tracker doesn't support pending messages.")
+
+    def get_summary(self, session_id: str) -> str:
+        """
+        Get the summary of the messages deleted from the conversation by `compact_conversation`.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The summary, empty if the conversation hasn't been summarized.
+        """
+        raise NotImplementedError("The tracker doesn't support conversation summaries.")
+
+    def get_message_count(self, session_id: str) -> int:
+        """
+        Get the number of messages ever added to the conversation, including the ones trimmed or compacted since. The
+        latest message is identified by it, whatever messages have been deleted before it.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The number of messages.
+        """
+        raise NotImplementedError("The tracker doesn't support conversation summaries.")
+
+    def compact_conversation(self, session_id: str, summary: str, message_count: int):
+        """
+        Replace the oldest messages of a conversation, up to the latest one summarized, with their summary. The messages
+        are identified by their count, so the ones trimmed and added in the meantime are taken into account.
+
+        Args:
+            session_id: The session ID.
+            summary: The summary of the previous summary and the messages deleted.
+            message_count: The message count of the conversation up to the latest message summarized, see
+                `get_message_count`.
+        """
+        raise NotImplementedError("The tracker doesn't support conversation summaries.")
+
+
+class AsyncTracker(ABC):
+    """
+    Asynchronous version of `Tracker`, to serve many sessions concurrently from a single event loop.
+    """
+
+    # Whether the tracker loads and commits `TurnState.prepared_turn`, so the bot prepares the turns answering asks
+    supports_prepared_turns = False
+
+    @abstractmethod
+    async def get_conversation(self, session_id: str):
+        """
+        Get the conversation for a session.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The conversation.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def add_message_to_conversation(self, session_id: str, role: Role, message: str):
+        """
+        Add a message to a conversation.
+
+        Args:
+            session_id: The session ID.
+            role: The role of the speaker.
+            message: The message.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_slot(self, session_id: str, slot_name: str):
+        """
+        Get the slots for a session.
+
+        Args:
+            session_id: The session ID.
+            slot_name: The name of the slot.
+
+        Returns:
+            The slots.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def set_slot(self, session_id: str, slot_name: str, value):
+        """
+        Update a slot for a session.
+
+        Args:
+            session_id: The session ID.
+            slot_name: The name of the slot.
+            value: The value of the slot.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def delete_slot(self, session_id: str, slot_name: str):
+        """
+        Delete a slot for a session.
+
+        Args:
+            session_id: The session ID.
+            slot_name: The name of the slot.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_flow_slot(self, session_id: str, flow_name: str, slot_name: str):
+        """
+        Get the slots for a flow in a session.
+
+        Args:
+            session_id: The session ID.
+            flow_name: The name of the flow.
+            slot_name: The name of the slot.
+
+        Returns:
+            The slots.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def set_flow_slot(self, session_id: str, flow_name: str, slot_name: str, value):
+        """
+        Update a slot for a flow in a session.
+
+        Args:
+            session_id: The session ID.
+            flow_name: The name of the flow.
+            slot_name: The name of the slot.
+            value: The value of the slot.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def delete_flow_slot(self, session_id: str, flow_name: str, slot_name: str):
+        """
+        Delete a slot for a flow in a session.
+
+        Args:
+            session_id: The session ID.
+            flow_name: The name of the flow.
+            slot_name: The name of the slot.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_flow_slots(self, session_id: str, flow_name: str) -> Dict[str, str]:
+        """
+        Get all the slots for a flow in a session.
+
+        Args:
+            session_id: The session ID.
+            flow_name: The name of the flow.
+
+        Returns:
+            The slot values by slot name.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def delete_flow_slots(self, session_id: str):
+        """
+        Delete the slots of all the flows in a session.
+
+        Args:
+            session_id: The session ID.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def save_current_actions(self, session_id: str, actions_with_flows: Sequence[Tuple["Action", str]]):
+        """
+        Save the pending actions for a session.
+
+        Args:
+            session_id: The session ID.
+            actions_with_flows: The pending actions with the name of the flow they belong to.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_current_actions(self, session_id: str) -> Sequence[Tuple["Action", str]]:
+        """
+        Get the pending actions for a session.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The pending actions with the name of the flow they belong to.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def delete_current_actions(self, session_id: str):
+        """
+        Delete the pending actions for a session.
+
+        Args:
+            session_id: The session ID.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def save_following_actions_for_flow_slot(self, session_id: str, flow_name: str, slot_name: str,
+                                             actions: Sequence["Action"]):
+        """
+        Save the actions that follow the ask of a flow slot, so the flow can be resumed after a correction.
+
+        Args:
+            session_id: The session ID.
+            flow_name: The name of the flow.
+            slot_name: The name of the slot.
+            actions: The actions following the ask.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def get_following_actions_for_flow_slot(self, session_id: str, flow_name: str,
+                                            slot_name: str) -> Sequence["Action"]:
+        """
+        Get the actions that follow the ask of a flow slot.
+
+        Args:
+            session_id: The session ID.
+            flow_name: The name of the flow.
+            slot_name: The name of the slot.
+
+        Returns:
+            The actions following the ask.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    async def delete_following_actions(self, session_id: str):
+        """
+        Delete the following actions of all the flow slots in a session.
+
+        Args:
+            session_id: The session ID.
+        """
+        raise NotImplementedError()
+
+    async def load_turn_state(self, session_id: str) -> "TurnState":
+        """
+        Load the state of a session at the start of a turn. By default, the conversation and the pending actions are
+        preloaded and the flow state is loaded lazily.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The turn state, buffering the writes until it's committed.
+        """
+        from .turn_state import TurnState
+
+        turn_state = TurnState(session_id, self, conversation=await self.get_conversation(session_id),
+                               current_actions=await self.get_current_actions(session_id))
+        turn_state.round_trips += 2
+
+        return turn_state
+
+    async def commit_turn_state(self, turn_state: "TurnState"):
+        """
+        Flush the writes buffered during a turn. By default, they are applied one by one.
+
+        Args:
+            turn_state: The turn state returned by `load_turn_state`.
+        """
+        session_id = turn_state.session_id
+        changes = turn_state.changes
+
+        for role, message in changes.messages:
+            await self.add_message_to_conversation(session_id, role, message)
+            turn_state.round_trips += 1
+
+        if changes.flow_slots_deleted:
+            await self.delete_flow_slots(session_id)
+            turn_state.round_trips += 1
+
+        for flow_name, flow_slots in changes.flow_slots.items():
+            for slot_name, value in flow_slots.items():
+                if value is None:
+                    await self.delete_flow_slot(session_id, flow_name, slot_name)
+                else:
+                    await self.set_flow_slot(session_id, flow_name, slot_name, value)
+                turn_state.round_trips += 1
+
+        if changes.following_actions_deleted:
+            await self.delete_following_actions(session_id)
+            turn_state.round_trips += 1
+
+        for flow_name, following_actions in changes.following_actions.items():
+            for slot_name, actions in following_actions.items():
+                await self.save_following_actions_for_flow_slot(session_id, flow_name, slot_name, actions)
+                turn_state.round_trips += 1
+
+        if changes.current_actions_deleted:
+            await self.delete_current_actions(session_id)
+            turn_state.round_trips += 1
+        elif changes.current_actions is not None:
+            await self.save_current_actions(session_id, changes.current_actions)
+            turn_state.round_trips += 1
+
+    async def load_turn_states(self, session_ids: Sequence[str]) -> List["TurnState"]:
+        """
+        Load the state of several sessions at the start of their turns. By default, they are loaded one by one.
+
+        Args:
+            session_ids: The session IDs.
+
+        Returns:
+            The turn states, in the same order.
+        """
+        return [await self.load_turn_state(session_id) for session_id in session_ids]
+
+    async def commit_turn_states(self, turn_states: Sequence["TurnState"]):
+        """
+        Flush the writes buffered during the turns of several sessions. By default, they are committed one by one.
+
+        Args:
+            turn_states: The turn states returned by `load_turn_states`.
+        """
+        for turn_state in turn_states:
+            await self.commit_turn_state(turn_state)
+
+    async def acquire_turn_lock(self, session_id: str, ttl: float) -> Optional[int]:
+        """
+        Try to lock a session for a turn. The lock is released when the turn state is committed, see
+        `TurnState.lock_token`.
+
+        Args:
+            session_id: The session ID.
+            ttl: Seconds after which the lock expires, in case the turn never finishes.
+
+        Returns:
+            The fencing token of the lock, increasing with every lock of the session, or None if it's already locked.
+        """
+        raise NotImplementedError("The tracker doesn't support session locks.")
+
+    async def release_turn_lock(self, session_id: str, token: int):
+        """
+        Release a session lock without committing a turn, if it's still held with the token.
+
+        Args:
+            session_id: The session ID.
+            token: The fencing token returned by `acquire_turn_lock`.
+        """
+        raise NotImplementedError("The tracker doesn't support session locks.")
+
+    async def push_pending_message(self, session_id: str, message: str):
+        """
+        Save a message waiting for the session lock, to be merged with the other waiting messages.
+
+        Args:
+            session_id: The session ID.
+            message: The message from the user.
+        """
+        raise NotImplementedError("The tracker doesn't support pending messages.")
+
+    async def pop_pending_messages(self, session_id: str) -> List[str]:
+        """
+        Get and remove the messages waiting for the session lock.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The messages, in the order they were received.
+        """
+        raise NotImplementedError("The tracker doesn't support pending messages.")
+
+    async def get_summary(self, session_id: str) -> str:
+        """
+        Get the summary of the messages deleted from the conversation by `compact_conversation`.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The summary, empty if the conversation hasn't been summarized.
+        """
+        raise NotImplementedError("The tracker doesn't support conversation summaries.")
+
+    async def get_message_count(self, session_id: str) -> int:
+        """
+        Get the number of messages ever added to the conversation, including the ones trimmed or compacted since. The
+        latest message is identified by it, whatever messages have been deleted before it.
+
+        Args:
+            session_id: The session ID.
+
+        Returns:
+            The number of messages.
+        """
+        raise NotImplementedError("The tracker doesn't support conversation summaries.")
+
+    async def compact_conversation(self, session_id: str, summary: str, message_count: int):
+        """
+        Replace the oldest messages of a conversation, up to the latest one summarized, with their summary. The messages
+        are identified by their count, so the ones trimmed and added in the meantime are taken into account.
+
+        Args:
+            session_id: The session ID.
+            summary: The summary of the previous summary and the messages deleted.
+            message_count: The message count of the conversation up to the latest message summarized, see
+                `get_message_count`.
+        """
+        raise NotImplementedError("The tracker doesn't support conversation summaries.")
@@ -0,0 +1,231 @@
+#
+#
+#   Codecs of the actions stored by the trackers
+#
+#
+
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence, Tuple
+
+from ..actions import Action, ActionFunction, Ask, CallFlow, Reply, End
+from ..flow import Flow
+from ..flow_slot import FlowSlot
+from ..registry import FlowRegistry
+from ..types import Categorical
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+
+class ActionCodec(ABC):
+    """
+    Encode the pending actions of a session, and the actions following each slot of a flow, to store them.
+    """
+
+    @abstractmethod
+    def encode_actions_with_flows(self, actions_with_flows: Sequence[Tuple[Action, str]]) -> bytes | str:
+        """
+        Encode actions paired with the name of their flow.
+        """
+        ...
+
+    @abstractmethod
+    def decode_actions_with_flows(self, data: Optional[bytes]) -> List[Tuple[Action, str]]:
+        """
+        Decode the actions paired with the name of their flow. None, for missing data, decodes to no actions.
+        """
+        ...
+
+    @abstractmethod
+    def encode_actions(self, actions: Sequence[Action], flow_name: str) -> bytes | str:
+        """
+        Encode actions of a flow.
+        """
+        ...
+
+    @abstractmethod
+    def decode_actions(self, data: Optional[bytes], flow_name: str) -> List[Action]:
+        """
+        Decode actions of a flow. None, for missing data, decodes to no actions.
+        """
+        ...
+
+    def bind_registry(self, registry: FlowRegistry):
+        """
+        Resolve the flows of the actions through the registry of a bot. It's called by the bot with its registry, every
+        time its flows change.
+        """
+        pass
+
+
+class JSONActionCodec(ActionCodec):
+    """
+    Encode the actions as JSON with `Action.to_dict`. Verbose, but readable.
+    """
+
+    def encode_actions_with_flows(self, actions_with_flows: Sequence[Tuple[Action, str]]) -> str:
+        return json.dumps([(action.to_dict(), flow) for action, flow in actions_with_flows])
+
+    def decode_actions_with_flows(self, data: Optional[bytes]) -> List[Tuple[Action, str]]:
+        if data is None:
+            return []
+
+        return [(Action.from_dict(action_dict), flow) for action_dict, flow in json.loads(data)]
+
+    def encode_actions(self, actions: Sequence[Action], flow_name: str) -> str:
+        return json.dumps([action.to_dict() for action in actions])
+
+    def decode_actions(self, data: Optional[bytes], flow_name: str) -> List[Action]:
+        if data is None:
+            return []
+
+        return [Action.from_dict(action_dict) for action_dict in json.loads(data)]
+
+
+# Type tags of the actions encoded by `MsgpackActionCodec`
+ACTION_FUNCTION_TAG = 0
+ASK_TAG = 1
+ASK_REF_TAG = 2  # Ask with a reference to the slot of a flow
+CALL_FLOW_TAG = 3
+REPLY_TAG = 4
+END_TAG = 5
+
+SLOT_TYPE_NAMES = {int: "int", float: "float", bool: "bool", str: "str"}
+SLOT_TYPES = {name: slot_type for slot_type, name in SLOT_TYPE_NAMES.items()}
+
+
+def _encode_flow_slot(flow_slot: FlowSlot) -> list:
+    if isinstance(flow_slot.type, Categorical):
+        slot_type = list(flow_slot.type.categories)
+    else:
+        slot_type = SLOT_TYPE_NAMES[flow_slot.type]
+
+    return [flow_slot.name, flow_slot.description, slot_type, flow_slot.ask_before_filling, flow_slot.required]
+
+
+def _decode_flow_slot(data: list) -> FlowSlot:
+    name, description, slot_type, ask_before_filling, required = data
+
+    if isinstance(slot_type, list):
+        slot_type = Categorical(slot_type)
+    else:
+        slot_type = SLOT_TYPES[slot_type]
+
+    return FlowSlot(name=name, description=description, type=slot_type, ask_before_filling=ask_before_filling,
+                    required=required)
+
+
+class MsgpackActionCodec(ActionCodec):
+    """
+    Encode the actions with MessagePack, as arrays starting with a type tag.
+
+    An `Ask` of a flow of the registry only stores the name of its slot, and the slot is taken from the flow when it's
+    decoded. Otherwise, the whole slot is stored. The asks referencing a slot that is no longer in the registry, e.g.
+    of a flow renamed or removed, are dropped when they're decoded. The data encoded as JSON by `JSONActionCodec` is
+    still decoded, so a tracker can switch codecs without losing the state of the sessions.
+
+    The bot binds its registry to the codec of its tracker, so the flows it adds are known to the codec.
+
+    Args:
+        flows: The flows to store the slots of the asks by reference, until a bot binds its registry.
+    """
+
+    def __init__(self, flows: Optional[Sequence[Flow]] = None):
+        if msgpack is None:
+            raise ImportError("Please install the 'linguista[msgpack]' package to use the MessagePack codec.")
+
+        self._registry: Optional[FlowRegistry] = None
+        if flows is not None:
+            self._registry = FlowRegistry(flows)
+
+        self._json_codec = JSONActionCodec()
+
+        self._decoders = {
+            ACTION_FUNCTION_TAG: lambda data, flow_name: ActionFunction(function=data[1]),
+            ASK_TAG: lambda data, flow_name: Ask(slot=_decode_flow_slot(data[1]), prompt=data[2]),
+            ASK_REF_TAG: self._decode_ask_ref,
+            CALL_FLOW_TAG: lambda data, flow_name: CallFlow(flow_name=data[1]),
+            REPLY_TAG: lambda data, flow_name: Reply(message=data[1]),
+            END_TAG: lambda data, flow_name: End(),
+        }
+
+    def bind_registry(self, registry: FlowRegistry):
+        self._registry = registry
+
+    def _get_flow_slot(self, flow_name: str, slot_name: str) -> Optional[FlowSlot]:
+        flow = self._registry.get(flow_name) if self._registry is not None else None
+        return flow.get_slot(slot_name) if flow is not None else None
+
+    def _decode_ask_ref(self, data: list, flow_name: str) -> Optional[Ask]:
+        flow_slot = self._get_flow_slot(flow_name, data[1])
+
+        if flow_slot is None:
+            logger.warning("Dropping the ask of slot '%s' of flow '%s', the flow or the slot no longer exists.",
+                           data[1], flow_name)
+            return None
+
+        return Ask(slot=flow_slot, prompt=data[2])
+
+    def _encode_action(self, action: Action, flow_name: str) -> list:
+        if isinstance(action, ActionFunction):
+            function_name = action.function if isinstance(action.function, str) else action.function.__name__
+            return [ACTION_FUNCTION_TAG, function_name]
+        elif isinstance(action, Ask):
+            if self._get_flow_slot(flow_name, action.slot.name) is not None:
+                return [ASK_REF_TAG, action.slot.name, action.prompt]
+            return [ASK_TAG, _encode_flow_slot(action.slot), action.prompt]
+        elif isinstance(action, CallFlow):
+            return [CALL_FLOW_TAG, action.flow_name]
+        elif isinstance(action, Reply):
+            return [REPLY_TAG, action.message]
+        elif isinstance(action, End):
+            return [END_TAG]
+
+        raise ValueError(f"Invalid action: {action}")
+
+    def _decode_action(self, data: list, flow_name: str) -> Optional[Action]:
+        decoder = self._decoders.get(data[0])
+
+        if decoder is None:
+            raise ValueError(f"Invalid action type tag: {data[0]}")
+
+        return decoder(data, flow_name)
+
+    @staticmethod
+    def _is_json(data: bytes) -> bool:
+        # JSON arrays start with "[", MessagePack arrays never do
+        return data[:1] == b"["
+
+    def encode_actions_with_flows(self, actions_with_flows: Sequence[Tuple[Action, str]]) -> bytes:
+        return msgpack.packb([[flow_name, self._encode_action(action, flow_name)]
+                              for action, flow_name in actions_with_flows])
+
+    def decode_actions_with_flows(self, data: Optional[bytes]) -> List[Tuple[Action, str]]:
+        if data is None:
+            return []
+
+        if self._is_json(data):
+            return self._json_codec.decode_actions_with_flows(data)
+
+        actions_with_flows = [(self._decode_action(action_data, flow_name), flow_name)
+                              for flow_name, action_data in msgpack.unpackb(data)]
+        return [(action, flow_name) for action, flow_name in actions_with_flows if action is not None]
+
+    def encode_actions(self, actions: Sequence[Action], flow_name: str) -> bytes:
+        return msgpack.packb([self._encode_action(action, flow_name) for action in actions])
+
+    def decode_actions(self, data: Optional[bytes], flow_name: str) -> List[Action]:
+        if data is None:
+            return []
+
+        if self._is_json(data):
+            return self._json_codec.decode_actions(data, flow_name)
+
+        actions = [self._decode_action(action_data, flow_name) for action_data in msgpack.unpackb(data)]
+        return [action for action in actions if action is not None]
@@ -0,0 +1,297 @@
+#
+#
+#   In-memory tracker
+#
+#
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Sequence, Tuple, List, Dict, Callable, TYPE_CHECKING
+
+from .base import Tracker
+from .turn_state import TurnState, PreparedTurn
+from ..concurrency import SessionLockLostError
+from ..enums import Role
+
+if TYPE_CHECKING:
+    from ..actions import Action
+
+
+@dataclass
+class _Session:
+    conversation: List[Dict] = field(default_factory=list)
+    summary: str = ""
+    message_count: int = 0  # Messages ever added to the conversation
+    slots: Dict[str, str] = field(default_factory=dict)
+    flow_slots: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    current_actions: List[Tuple["Action", str]] = field(default_factory=list)
+    prepared_turn: Optional[PreparedTurn] = None  # Valid only with the current actions
+    following_actions: Dict[str, Dict[str, List["Action"]]] = field(default_factory=dict)
+    pending_messages: List[str] = field(default_factory=list)
+    lock_token: Optional[int] = None
+    lock_expires_at: Optional[float] = None
+    expires_at: Optional[float] = None
+
+    def is_locked(self, token: Optional[int] = None) -> bool:
+        """
+        Whether the session lock is held, with the given token if any.
+        """
+        if self.lock_token is None or self.lock_expires_at <= time.monotonic():
+            return False
+
+        return token is None or self.lock_token == token
+
+
+class InMemoryTracker(Tracker):
+    """
+    Tracker keeping the sessions in the memory of the process, for single-node deployments and tests. The actions are
+    stored as they are, without serializing them.
+
+    Args:
+        ttl: Seconds of inactivity after which a session expires. None to never expire them.
+        max_sessions: Maximum number of sessions to keep, evicting the least recently used ones. None for no limit.
+        history_size: The number of latest messages of each conversation to keep. None to keep them all.
+        archive: Function called with the session ID and the messages added to the conversation, to keep the full
+            transcripts somewhere else.
+    """
+
+    supports_prepared_turns = True
+
+    def __init__(self, ttl: Optional[float] = 60 * 60 * 24, max_sessions: Optional[int] = None,
+                 history_size: Optional[int] = 20, archive: Optional[Callable[[str, List[Dict]], None]] = None):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.history_size = history_size
+        self.archive = archive
+
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._lock_tokens = itertools.count(1)
+
+    def __len__(self):
+        with self._lock:
+            self._evict_expired()
+            return len(self._sessions)
+
+    def _evict_expired(self):
+        # Every session gets the same TTL when it's used, so the expired ones are the least recently used
+        now = time.monotonic()
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.expires_at is None or session.expires_at > now:
+                break
+            self._sessions.popitem(last=False)
+
+    def _get_session(self, session_id: str, create: bool = True) -> _Session:
+        """
+        Get the session, creating it if it doesn't exist or has expired. Must be called with the lock held.
+
+        Args:
+            session_id: The session ID.
+            create: Whether to create a missing session. If False, an empty session that isn't stored is returned, so
+                reads don't evict other sessions.
+        """
+        self._evict_expired()
+
+        session = self._sessions.get(session_id)
+
+        if session is None:
+            session = _Session()
+
+            if not create:
+                return session
+
+            self._sessions[session_id] = session
+
+            if self.max_sessions is not None:
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)  # Least recently used
+        else:
+            self._sessions.move_to_end(session_id)
+
+        if self.ttl is not None:
+            session.expires_at = time.monotonic() + self.ttl
+
+        return session
+
+    def _add_messages(self, session_id: str, session: _Session, messages: List[Dict]):
+        session.conversation.extend(messages)
+        session.message_count += len(messages)
+
+        if self.history_size is not None:
+            del session.conversation[:-self.history_size]
+
+        if self.archive is not None:
+            self.archive(session_id, messages)
+
+    def get_conversation(self, session_id: str):
+        with self._lock:
+            return list(self._get_session(session_id, create=False).conversation)
+
+    def add_message_to_conversation(self, session_id: str, role: Role, message: str):
+        with self._lock:
+            session = self._get_session(session_id)
+            self._add_messages(session_id, session, [{"role": role, "message": message}])
+            session.prepared_turn = None
+
+    def get_summary(self, session_id: str) -> str:
+        with self._lock:
+            return self._get_session(session_id, create=False).summary
+
+    def get_message_count(self, session_id: str) -> int:
+        with self._lock:
+            return self._get_session(session_id, create=False).message_count
+
+    def compact_conversation(self, session_id: str, summary: str, message_count: int):
+        with self._lock:
+            session = self._get_session(session_id)
+            session.summary = summary
+
+            # The messages summarized that are still in the conversation, the others have been trimmed meanwhile
+            first_message_count = session.message_count - len(session.conversation)
+            del session.conversation[:max(0, message_count - first_message_count)]
+
+    def get_slot(self, session_id: str, slot_name: str):
+        with self._lock:
+            return self._get_session(session_id, create=False).slots.get(slot_name)
+
+    def set_slot(self, session_id: str, slot_name: str, value):
+        with self._lock:
+            self._get_session(session_id).slots[slot_name] = str(value)
+
+    def delete_slot(self, session_id: str, slot_name: str):
+        with self._lock:
+            self._get_session(session_id, create=False).slots.pop(slot_name, None)
+
+    def get_flow_slot(self, session_id: str, flow_name: str, slot_name: str):
+        with self._lock:
+            return self._get_session(session_id, create=False).flow_slots.get(flow_name, {}).get(slot_name)
+
+    def get_flow_slots(self, session_id: str, flow_name: str):
+        with self._lock:
+            return dict(self._get_session(session_id, create=False).flow_slots.get(flow_name, {}))
+
+    def set_flow_slot(self, session_id: str, flow_name: str, slot_name: str, value):
+        with self._lock:
+            self._get_session(session_id).flow_slots.setdefault(flow_name, {})[slot_name] = str(value)
+
+    def delete_flow_slot(self, session_id: str, flow_name: str, slot_name: str):
+        with self._lock:
+            self._get_session(session_id, create=False).flow_slots.get(flow_name, {}).pop(slot_name, None)
+
+    def delete_flow_slots(self, session_id: str):
+        with self._lock:
+            self._get_session(session_id, create=False).flow_slots = {}
+
+    def save_current_actions(self, session_id: str, actions_with_flows: Sequence[Tuple["Action", str]]):
+        with self._lock:
+            session = self._get_session(session_id)
+            session.current_actions = list(actions_with_flows)
+            session.prepared_turn = None
+
+    def get_current_actions(self, session_id: str):
+        with self._lock:
+            return list(self._get_session(session_id, create=False).current_actions)
+
+    def delete_current_actions(self, session_id: str):
+        with self._lock:
+            session = self._get_session(session_id, create=False)
+            session.current_actions = []
+            session.prepared_turn = None
+
+    def save_following_actions_for_flow_slot(self, session_id: str, flow_name: str, slot_name: str,
+                                             actions: Sequence["Action"]):
+        with self._lock:
+            self._get_session(session_id).following_actions.setdefault(flow_name, {})[slot_name] = list(actions)
+
+    def get_following_actions_for_flow_slot(self, session_id: str, flow_name: str, slot_name: str):
+        with self._lock:
+            following_actions = self._get_session(session_id, create=False).following_actions
+            return list(following_actions.get(flow_name, {}).get(slot_name, []))
+
+    def delete_following_actions(self, session_id: str):
+        with self._lock:
+            self._get_session(session_id, create=False).following_actions = {}
+
+    def load_turn_state(self, session_id: str) -> TurnState:
+        with self._lock:
+            session = self._get_session(session_id, create=False)
+
+            return TurnState(session_id, self, conversation=session.conversation,
+                             current_actions=session.current_actions, flow_slots=session.flow_slots,
+                             following_actions=session.following_actions,
+                             flow_names=set(session.flow_slots) | set(session.following_actions),
+                             summary=session.summary, message_count=session.message_count,
+                             prepared_turn=session.prepared_turn)
+
+    def commit_turn_state(self, turn_state: TurnState):
+        changes = turn_state.changes
+
+        with self._lock:
+            session = self._get_session(turn_state.session_id)
+
+            if turn_state.lock_token is not None:
+                if not session.is_locked(turn_state.lock_token):
+                    raise SessionLockLostError(f"The lock of session '{turn_state.session_id}' was lost.")
+
+                session.lock_token = None
+
+            if changes.messages:
+                self._add_messages(turn_state.session_id, session,
+                                   [{"role": role, "message": message} for role, message in changes.messages])
+
+            if changes.flow_slots_deleted:
+                session.flow_slots = {}
+
+            for flow_name, flow_slots in changes.flow_slots.items():
+                session_flow_slots = session.flow_slots.setdefault(flow_name, {})
+                for slot_name, value in flow_slots.items():
+                    if value is None:
+                        session_flow_slots.pop(slot_name, None)
+                    else:
+                        session_flow_slots[slot_name] = str(value)
+
+            if changes.following_actions_deleted:
+                session.following_actions = {}
+
+            for flow_name, following_actions in changes.following_actions.items():
+                session.following_actions.setdefault(flow_name, {}).update(following_actions)
+
+            if changes.current_actions_deleted:
+                session.current_actions = []
+            elif changes.current_actions is not None:
+                session.current_actions = list(changes.current_actions)
+
+            session.prepared_turn = changes.prepared_turn
+
+    def acquire_turn_lock(self, session_id: str, ttl: float) -> Optional[int]:
+        with self._lock:
+            session = self._get_session(session_id)
+
+            if session.is_locked():
+                return None
+
+            session.lock_token = next(self._lock_tokens)
+            session.lock_expires_at = time.monotonic() + ttl
+
+            return session.lock_token
+
+    def release_turn_lock(self, session_id: str, token: int):
+        with self._lock:
+            session = self._get_session(session_id, create=False)
+
+            if session.is_locked(token):
+                session.lock_token = None
+
+    def push_pending_message(self, session_id: str, message: str):
+        with self._lock:
+            self._get_session(session_id).pending_messages.append(message)
+
+    def pop_pending_messages(self, session_id: str) -> List[str]:
+        with self._lock:
+            session = self._get_session(session_id, create=False)
+            pending_messages, session.pending_messages = session.pending_messages, []
+            return pending_messages
@@ -4,7 +4,7 @@
 #
 #
 
-from typing import Any
+from typing import Any, Dict
 
 from ..flow import Flow
 from ..flow_slot import FlowSlot
@@ -12,16 +12,23 @@ from ..utils import strtobool
 
 
 class ProxyTracker:
+    """
+    Tracker given to the action functions. It works on a snapshot of the flow slots, so it can be used synchronously
+    even if the bot runs on an asynchronous tracker. The slots set are available in `changes` and persisted by the
+    bot once the action function returns.
+    """
 
-    def __init__(self, tracker, session_id: str, current_flow: Flow):
+    def __init__(self, tracker, session_id: str, current_flow: Flow, flow_slot_values: Dict[str, str]):
         self.tracker = tracker
         self.session_id = session_id
         self.current_flow = current_flow
+        self.flow_slot_values = dict(flow_slot_values)
+        self.changes = {}
 
         self.session = SessionProxyTracker(tracker, session_id)
 
     def get_slot(self, slot: FlowSlot):
-        value = self.tracker.get_flow_slot(self.session_id, self.current_flow.name, slot.name)
+        value = self.flow_slot_values.get(slot.name)
 
         if value is None:
             return None
@@ -36,7 +43,8 @@ class ProxyTracker:
             return value
 
     def set_slot(self, slot: FlowSlot, value: Any):
-        self.tracker.set_flow_slot(self.session_id, self.current_flow.name, slot.name, value)
+        self.flow_slot_values[slot.name] = str(value)
+        self.changes[slot.name] = value
 
 
 class SessionProxyTracker:
@@ -4,73 +4,655 @@
 #
 #
 
+import dataclasses
+import inspect
 import json
-from typing import Optional, Sequence, Tuple
+from typing import Sequence, Tuple, List, Dict, Optional, Callable
 
-from .base import Tracker
+from .base import Tracker, AsyncTracker
+from .turn_state import TurnState, PreparedTurn
+from ..concurrency import SessionLockLostError
 from ..enums import Role
+from .codecs import ActionCodec, JSONActionCodec
 from ..actions import Action
 
 try:
     import redis
+    import redis.asyncio
 except ImportError:
     redis = None
 
+CONVERSATION_EXPIRATION = 60 * 60 * 24  # FIXME: Make this configurable
+
+# Every key of a session has the session ID as its hash tag, i.e. between braces, so all of them are in the same slot of
+# a Redis Cluster and the scripts and transactions of a session can use any of them. The session IDs must not start
+# with "}", or the hash tag would be empty.
+
 
 def _get_redis_conversation_key(session_id: str) -> str:
-    return f"linguista:conversation:{session_id}"
+    return f"linguista:conversation:{{{session_id}}}"
+
+
+def _get_redis_summary_key(session_id: str) -> str:
+    return f"linguista:summary:{{{session_id}}}"
+
+
+def _get_redis_message_count_key(session_id: str) -> str:
+    # Counter of the messages ever added to the conversation
+    return f"linguista:message_count:{{{session_id}}}"
 
 
 def _get_redis_current_flow_key(session_id: str) -> str:
-    return f"linguista:current:{session_id}"
+    return f"linguista:current:{{{session_id}}}"
 
 
 def _get_redis_current_slot_key(session_id: str) -> str:
-    return f"linguista:current_slot:{session_id}"
+    return f"linguista:current_slot:{{{session_id}}}"
 
 
 def _get_redis_current_actions_key(session_id: str) -> str:
-    return f"linguista:current_actions:{session_id}"
+    return f"linguista:current_actions:{{{session_id}}}"
+
+
+def _get_redis_prepared_turn_key(session_id: str) -> str:
+    return f"linguista:prepared_turn:{{{session_id}}}"
 
 
 def _get_redis_slots_key(session_id: str) -> str:
-    return f"linguista:slots:{session_id}"
+    return f"linguista:slots:{{{session_id}}}"
 
 
 def _get_redis_flow_slots_key(session_id: str, flow_name: str) -> str:
-    return f"linguista:flow_slots:{session_id}:{flow_name}"
+    return f"linguista:flow_slots:{{{session_id}}}:{flow_name}"
 
 
 def _get_redis_following_actions_key(session_id: str, flow_name: str) -> str:
-    return f"linguista:following_actions:{session_id}:{flow_name}"
+    return f"linguista:following_actions:{{{session_id}}}:{flow_name}"
+
+
+def _get_redis_flows_key(session_id: str) -> str:
+    # Set with the names of the flows with slots or following actions in the session
+    return f"linguista:flows:{{{session_id}}}"
+
+
+def _get_redis_lock_key(session_id: str) -> str:
+    return f"linguista:lock:{{{session_id}}}"
+
+
+def _get_redis_lock_fence_key(session_id: str) -> str:
+    # Counter of the locks of the session, the fencing tokens
+    return f"linguista:lock_fence:{{{session_id}}}"
+
+
+def _get_redis_pending_messages_key(session_id: str) -> str:
+    return f"linguista:pending_messages:{{{session_id}}}"
+
+
+# Whether the index of the flows in the given key doesn't have exactly the flow names in ARGV from the given position,
+# the flows whose keys were declared
+FLOWS_INDEX_CHANGED_FUNCTION = """
+local function flows_index_changed(flows_key, first)
+    if redis.call('SCARD', flows_key) ~= #ARGV - first + 1 then
+        return true
+    end
+    for i = first, #ARGV do
+        if redis.call('SISMEMBER', flows_key, ARGV[i]) == 0 then
+            return true
+        end
+    end
+    return false
+end
+"""
+
+# Load the conversation, its summary and message count, the current actions, the prepared turn and the state of every
+# flow of the session. The keys of the flows, whose names are in ARGV, are declared after the others, with the keys of
+# the slots and of the following actions of each flow. False if the index of the flows changed since it was read
+LOAD_TURN_STATE_SCRIPT = FLOWS_INDEX_CHANGED_FUNCTION + """
+if flows_index_changed(KEYS[3], 2) then
+    return false
+end
+local result = {}
+result[1] = redis.call('LRANGE', KEYS[1], tonumber(ARGV[1]), -1)
+result[2] = redis.call('GET', KEYS[2])
+result[3] = redis.call('GET', KEYS[4])
+result[4] = redis.call('GET', KEYS[5])
+result[5] = redis.call('GET', KEYS[6])
+for i = 2, #ARGV do
+    table.insert(result, ARGV[i])
+    table.insert(result, redis.call('HGETALL', KEYS[2 * i + 3]))
+    table.insert(result, redis.call('HGETALL', KEYS[2 * i + 4]))
+end
+return result
+"""
+
+# Delete a kind of state (slots or following actions) of every flow of the session, keeping the flows with the other
+# kind of state in the index. The keys of the flows, whose names are in ARGV, are declared after the index, with the
+# key to delete and the key of the other kind of state of each flow. False if the index changed since it was read
+DELETE_FLOWS_STATE_SCRIPT = FLOWS_INDEX_CHANGED_FUNCTION + """
+if flows_index_changed(KEYS[1], 1) then
+    return false
+end
+for i = 1, #ARGV do
+    redis.call('DEL', KEYS[2 * i])
+    if redis.call('EXISTS', KEYS[2 * i + 1]) == 0 then
+        redis.call('SREM', KEYS[1], ARGV[i])
+    end
+end
+return true
+"""
+
+# Lock the session if it isn't locked, with the next fencing token
+ACQUIRE_TURN_LOCK_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return false
+end
+local token = redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+redis.call('SET', KEYS[1], token, 'PX', ARGV[1])
+return token
+"""
+
+# Unlock the session if it's still locked with the token
+RELEASE_TURN_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+end
+"""
+
+# Run the writes of a turn and unlock the session, only if it's still locked with the token. Each command is passed as
+# its name, its number of keys and of arguments, the indices of its keys in KEYS and its arguments. Only the commands
+# writing the state of a turn are run, and only on the keys declared in KEYS after the lock
+FENCED_COMMIT_SCRIPT = """
+local allowed = {RPUSH = true, LTRIM = true, EXPIRE = true, DEL = true, HSET = true, HDEL = true, SADD = true,
+                 SET = true, INCRBY = true}
+local commands = {}
+local i = 2
+while i <= #ARGV do
+    local name, num_keys, num_args = ARGV[i], tonumber(ARGV[i + 1]), tonumber(ARGV[i + 2])
+    if not allowed[name] then
+        return redis.error_reply('Invalid command in a turn commit: ' .. name)
+    end
+    local command = {name}
+    for j = 1, num_keys do
+        local key_index = tonumber(ARGV[i + 2 + j])
+        if key_index < 2 or key_index > #KEYS then
+            return redis.error_reply('Invalid key index in a turn commit: ' .. ARGV[i + 2 + j])
+        end
+        table.insert(command, KEYS[key_index])
+    end
+    for j = 1, num_args do
+        table.insert(command, ARGV[i + 2 + num_keys + j])
+    end
+    table.insert(commands, command)
+    i = i + 3 + num_keys + num_args
+end
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+for _, command in ipairs(commands) do
+    redis.call(unpack(command))
+end
+redis.call('DEL', KEYS[1])
+return 1
+"""
+
+# Replace the oldest messages of the conversation with their summary, up to the message with the given count. Its
+# position is found from the message count, as the conversation may have been trimmed since it was summarized
+COMPACT_CONVERSATION_SCRIPT = """
+local first_message_count = tonumber(redis.call('GET', KEYS[3]) or '0') - redis.call('LLEN', KEYS[1])
+local num_messages = tonumber(ARGV[2]) - first_message_count
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[3])
+if num_messages > 0 then
+    redis.call('LTRIM', KEYS[1], num_messages, -1)
+end
+"""
+
+# Get and remove the pending messages
+POP_PENDING_MESSAGES_SCRIPT = """
+local messages = redis.call('LRANGE', KEYS[1], 0, -1)
+redis.call('DEL', KEYS[1])
+return messages
+"""
+
+
+class _CommandRecorder:
+    """
+    Record the commands queued by `_queue_turn_changes`, with the interface of a pipeline, to run them from the fenced
+    commit script. Their keys are declared after the lock key and referenced by their index.
+    """
+
+    def __init__(self, lock_key: str):
+        self.keys = [lock_key]
+        self.args = []
+        self._key_indices = {lock_key: 1}
+
+    def _get_key_index(self, key: str) -> int:
+        if key not in self._key_indices:
+            self.keys.append(key)
+            self._key_indices[key] = len(self.keys)
+
+        return self._key_indices[key]
+
+    def _record(self, command: str, keys: Sequence[str], args: Sequence = ()):
+        self.args.extend([command, len(keys), len(args)])
+        self.args.extend(self._get_key_index(key) for key in keys)
+        self.args.extend(args)
+
+    def rpush(self, key, *values):
+        self._record("RPUSH", [key], values)
+
+    def ltrim(self, key, start, end):
+        self._record("LTRIM", [key], [start, end])
+
+    def expire(self, key, seconds):
+        self._record("EXPIRE", [key], [seconds])
+
+    def delete(self, *keys):
+        self._record("DEL", keys)
+
+    def hset(self, key, mapping):
+        self._record("HSET", [key], [item for field_value in mapping.items() for item in field_value])
+
+    def hdel(self, key, *fields):
+        self._record("HDEL", [key], fields)
+
+    def sadd(self, key, *members):
+        self._record("SADD", [key], members)
+
+    def set(self, key, value, ex=None):
+        self._record("SET", [key], [value] if ex is None else [value, "EX", ex])
+
+    def incrby(self, key, amount):
+        self._record("INCRBY", [key], [amount])
+
+
+def _fenced_commit_keys_and_args(turn_state: TurnState, history_size: Optional[int], codec: ActionCodec):
+    recorder = _CommandRecorder(_get_redis_lock_key(turn_state.session_id))
+    _queue_turn_changes(recorder, turn_state, history_size, codec)
+    return recorder.keys, [turn_state.lock_token] + recorder.args
+
+
+def _compact_conversation_keys_and_args(session_id: str, summary: str, message_count: int):
+    keys = [_get_redis_conversation_key(session_id), _get_redis_summary_key(session_id),
+            _get_redis_message_count_key(session_id)]
+    return keys, [summary, message_count, CONVERSATION_EXPIRATION]
+
+
+def _acquire_turn_lock_keys_and_args(session_id: str, ttl: float):
+    keys = [_get_redis_lock_key(session_id), _get_redis_lock_fence_key(session_id)]
+    return keys, [int(ttl * 1000), CONVERSATION_EXPIRATION]
+
+
+def _encode_message(role: Role, message: str) -> str:
+    return json.dumps({"role": role.value, "message": message})
+
+
+def _decode_conversation(conversation) -> List[Dict]:
+    if conversation is None:
+        return []
+
+    conversation_json = [json.loads(message) for message in conversation]
+    return [{"role": Role(message["role"]), "message": message["message"]} for message in conversation_json]
+
+
+def _decode_summary(summary: Optional[bytes]) -> str:
+    return "" if summary is None else summary.decode()
+
+
+def _decode_message_count(message_count: Optional[bytes]) -> int:
+    return 0 if message_count is None else int(message_count)
+
+
+def _encode_prepared_turn(prepared_turn: PreparedTurn) -> str:
+    return json.dumps(dataclasses.asdict(prepared_turn))
+
+
+def _decode_prepared_turn(prepared_turn_data: Optional[bytes]) -> Optional[PreparedTurn]:
+    if prepared_turn_data is None:
+        return None
+
+    return PreparedTurn(**json.loads(prepared_turn_data))
+
+
+def _decode_hash(values) -> Dict[str, str]:
+    if values is None:
+        return {}
+
+    return {key.decode(): value.decode() for key, value in values.items()}
+
+
+def _decode_hash_pairs(values, decode_values: bool = True) -> Dict[str, str | bytes]:
+    # HGETALL replies from Lua scripts are flat lists of keys and values
+    if not decode_values:
+        return {values[i].decode(): values[i + 1] for i in range(0, len(values), 2)}
+
+    return {values[i].decode(): values[i + 1].decode() for i in range(0, len(values), 2)}
+
+
+def _get_conversation_start(history_size: Optional[int]) -> int:
+    # Index of the first message of the conversation to fetch
+    return 0 if history_size is None else -history_size
+
+
+def _decode_flow_names(flow_names) -> List[str]:
+    return sorted(flow_name.decode() for flow_name in flow_names)
+
+
+def _load_turn_state_keys_and_args(session_id: str, history_size: Optional[int], flow_names: Sequence[str]):
+    keys = [_get_redis_conversation_key(session_id), _get_redis_current_actions_key(session_id),
+            _get_redis_flows_key(session_id), _get_redis_summary_key(session_id),
+            _get_redis_prepared_turn_key(session_id), _get_redis_message_count_key(session_id)]
+    for flow_name in flow_names:
+        keys.extend([_get_redis_flow_slots_key(session_id, flow_name),
+                     _get_redis_following_actions_key(session_id, flow_name)])
+
+    return keys, [_get_conversation_start(history_size), *flow_names]
+
+
+def _decode_turn_state(session_id: str, tracker, reply) -> TurnState:
+    conversation, current_actions_data, summary, prepared_turn_data, message_count, *flows_state = reply
+
+    flow_slots = {}
+    following_actions = {}
+    for i in range(0, len(flows_state), 3):
+        flow_name = flows_state[i].decode()
+        flow_slots[flow_name] = _decode_hash_pairs(flows_state[i + 1])
+        following_actions[flow_name] = {
+            slot_name: tracker.codec.decode_actions(actions_data, flow_name)
+            for slot_name, actions_data in _decode_hash_pairs(flows_state[i + 2], decode_values=False).items()
+        }
+
+    return TurnState(session_id, tracker, conversation=_decode_conversation(conversation),
+                     current_actions=tracker.codec.decode_actions_with_flows(current_actions_data), flow_slots=flow_slots,
+                     following_actions=following_actions, flow_names=set(flow_slots),
+                     summary=_decode_summary(summary), message_count=_decode_message_count(message_count),
+                     prepared_turn=_decode_prepared_turn(prepared_turn_data))
+
+
+def _queue_turn_changes(pipe, turn_state: TurnState, history_size: Optional[int], codec: ActionCodec):
+    """
+    Queue the writes buffered in the turn state into a pipeline.
+    """
+    session_id = turn_state.session_id
+    changes = turn_state.changes
+    flows_key = _get_redis_flows_key(session_id)
+
+    if changes.messages:
+        conversation_key = _get_redis_conversation_key(session_id)
+        pipe.rpush(conversation_key, *[_encode_message(role, message) for role, message in changes.messages])
+        if history_size is not None:
+            pipe.ltrim(conversation_key, -history_size, -1)
+        pipe.expire(conversation_key, CONVERSATION_EXPIRATION)
+        pipe.incrby(_get_redis_message_count_key(session_id), len(changes.messages))
+        pipe.expire(_get_redis_message_count_key(session_id), CONVERSATION_EXPIRATION)
+        pipe.expire(_get_redis_summary_key(session_id), CONVERSATION_EXPIRATION)
+
+    indexed_flow_names = turn_state.flow_names
+
+    if changes.flow_slots_deleted and indexed_flow_names:
+        pipe.delete(*[_get_redis_flow_slots_key(session_id, flow_name) for flow_name in indexed_flow_names])
+
+    if changes.following_actions_deleted and indexed_flow_names:
+        pipe.delete(*[_get_redis_following_actions_key(session_id, flow_name) for flow_name in indexed_flow_names])
+
+    if changes.flow_slots_deleted and changes.following_actions_deleted:
+        pipe.delete(flows_key)
+
+    for flow_name, flow_slots in changes.flow_slots.items():
+        slots_key = _get_redis_flow_slots_key(session_id, flow_name)
+
+        slots_to_set = {slot_name: value for slot_name, value in flow_slots.items() if value is not None}
+        slots_to_delete = [slot_name for slot_name, value in flow_slots.items() if value is None]
+
+        if slots_to_set:
+            pipe.hset(slots_key, mapping=slots_to_set)
+        if slots_to_delete:
+            pipe.hdel(slots_key, *slots_to_delete)
+
+    for flow_name, following_actions in changes.following_actions.items():
+        following_actions_key = _get_redis_following_actions_key(session_id, flow_name)
+        pipe.hset(following_actions_key, mapping={slot_name: codec.encode_actions(actions, flow_name)
+                                                  for slot_name, actions in following_actions.items()})
+
+    flow_names_written = set(changes.flow_slots) | set(changes.following_actions)
+    if flow_names_written:
+        pipe.sadd(flows_key, *flow_names_written)
+
+    # The state of the flows expires with the conversation
+    if changes.messages:
+        pipe.expire(flows_key, CONVERSATION_EXPIRATION)
+        for flow_name in sorted((indexed_flow_names or set()) | flow_names_written):
+            pipe.expire(_get_redis_flow_slots_key(session_id, flow_name), CONVERSATION_EXPIRATION)
+            pipe.expire(_get_redis_following_actions_key(session_id, flow_name), CONVERSATION_EXPIRATION)
+
+    current_actions_key = _get_redis_current_actions_key(session_id)
+    if changes.current_actions_deleted:
+        pipe.delete(current_actions_key)
+    elif changes.current_actions is not None:
+        pipe.set(current_actions_key, codec.encode_actions_with_flows(changes.current_actions))
+
+    # The prepared turn is only valid for the next turn
+    prepared_turn_key = _get_redis_prepared_turn_key(session_id)
+    if changes.prepared_turn is not None:
+        pipe.set(prepared_turn_key, _encode_prepared_turn(changes.prepared_turn), ex=CONVERSATION_EXPIRATION)
+    elif turn_state.prepared_turn is not None:
+        pipe.delete(prepared_turn_key)
+
+
+def _delete_flows_state_keys_and_args(session_id: str, flow_slots: bool, flow_names: Sequence[str]):
+    keys = [_get_redis_flows_key(session_id)]
+    for flow_name in flow_names:
+        flow_slots_key = _get_redis_flow_slots_key(session_id, flow_name)
+        following_actions_key = _get_redis_following_actions_key(session_id, flow_name)
+        keys.extend([flow_slots_key, following_actions_key] if flow_slots else [following_actions_key, flow_slots_key])
+
+    return keys, list(flow_names)
+
+
+# Kinds of keys stored by the versions without hash tags, by their functions and whether they're flow keys
+LEGACY_KEY_KINDS = {
+    "conversation": (_get_redis_conversation_key, False),
+    "current": (_get_redis_current_flow_key, False),
+    "current_slot": (_get_redis_current_slot_key, False),
+    "current_actions": (_get_redis_current_actions_key, False),
+    "slots": (_get_redis_slots_key, False),
+    "flow_slots": (_get_redis_flow_slots_key, True),
+    "following_actions": (_get_redis_following_actions_key, True),
+}
+
+
+def _parse_legacy_key(key: bytes) -> Optional[Tuple[str, str, Optional[str]]]:
+    """
+    Get the key with a hash tag, the session ID and the flow name, if it's a flow key, of a key stored without a hash
+    tag. None if it isn't one of those keys.
+    """
+    key = key.decode()
+
+    parts = key.split(":", 2)
+    if len(parts) < 3 or parts[1] not in LEGACY_KEY_KINDS or parts[2].startswith("{"):
+        return None
+
+    _, kind, rest = parts
+    get_key, is_flow_key = LEGACY_KEY_KINDS[kind]
+
+    if not is_flow_key:
+        return get_key(rest), rest, None
+
+    if ":" not in rest:
+        return None
+
+    session_id, flow_name = rest.rsplit(":", 1)
+    return get_key(session_id, flow_name), session_id, flow_name
 
 
 class RedisTracker(Tracker):
+    """
+    Args:
+        host: The Redis host.
+        port: The Redis port.
+        db: The Redis database.
+        history_size: The number of latest messages of each conversation to keep. None to keep them all.
+        archive: Function called with the session ID and the messages added to the conversation, to keep
+            the full transcripts somewhere else.
+        codec: The codec of the stored actions. By default, JSON.
+    """
 
-    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0):
+    supports_prepared_turns = True
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0, history_size: Optional[int] = 20,
+                 archive: Optional[Callable[[str, List[Dict]], None]] = None, codec: Optional[ActionCodec] = None):
         if redis is None:
             raise ImportError("Please install the 'linguista[redis]' package to use the Redis tracker.")
 
         self.host = host
         self.port = port
         self.db = db
+        self.history_size = history_size
+        self.archive = archive
+        self.codec = codec if codec is not None else JSONActionCodec()
 
         self._client = redis.Redis(host=host, port=port, db=db)
+        self._load_turn_state_script = self._client.register_script(LOAD_TURN_STATE_SCRIPT)
+        self._delete_flows_state_script = self._client.register_script(DELETE_FLOWS_STATE_SCRIPT)
+        self._acquire_turn_lock_script = self._client.register_script(ACQUIRE_TURN_LOCK_SCRIPT)
+        self._release_turn_lock_script = self._client.register_script(RELEASE_TURN_LOCK_SCRIPT)
+        self._fenced_commit_script = self._client.register_script(FENCED_COMMIT_SCRIPT)
+        self._pop_pending_messages_script = self._client.register_script(POP_PENDING_MESSAGES_SCRIPT)
+        self._compact_conversation_script = self._client.register_script(COMPACT_CONVERSATION_SCRIPT)
 
-    def get_conversation(self, session_id: str):
-        conversation_key = _get_redis_conversation_key(session_id)
-        conversation = self._client.lrange(conversation_key, 0, -1)
+    def _get_flow_names(self, session_id: str) -> List[str]:
+        return _decode_flow_names(self._client.smembers(_get_redis_flows_key(session_id)))
+
+    def load_turn_state(self, session_id: str) -> TurnState:
+        round_trips = 0
+        reply = None
+
+        # The keys of the flows are read from their index first, again if it changes before the state is loaded
+        while reply is None:
+            flow_names = self._get_flow_names(session_id)
+            keys, args = _load_turn_state_keys_and_args(session_id, self.history_size, flow_names)
+            reply = self._load_turn_state_script(keys=keys, args=args)
+            round_trips += 2
+
+        turn_state = _decode_turn_state(session_id, self, reply)
+        turn_state.round_trips += round_trips
+
+        return turn_state
+
+    def commit_turn_state(self, turn_state: TurnState):
+        if turn_state.lock_token is None:
+            pipe = self._client.pipeline(transaction=True)
+            _queue_turn_changes(pipe, turn_state, self.history_size, self.codec)
+            pipe.execute()
+        else:
+            keys, args = _fenced_commit_keys_and_args(turn_state, self.history_size, self.codec)
+            committed = self._fenced_commit_script(keys=keys, args=args)
+
+            if not committed:
+                raise SessionLockLostError(f"The lock of session '{turn_state.session_id}' was lost.")
+
+        turn_state.round_trips += 1
+
+        if turn_state.changes.messages:
+            self._archive(turn_state.session_id, turn_state.changes.messages)
+
+    def load_turn_states(self, session_ids: Sequence[str]) -> List[TurnState]:
+        pipe = self._client.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.smembers(_get_redis_flows_key(session_id))
+        flow_names_of_sessions = [_decode_flow_names(flow_names) for flow_names in pipe.execute()]
+
+        pipe = self._client.pipeline(transaction=False)
+        for session_id, flow_names in zip(session_ids, flow_names_of_sessions):
+            keys, args = _load_turn_state_keys_and_args(session_id, self.history_size, flow_names)
+            self._load_turn_state_script(keys=keys, args=args, client=pipe)
+        replies = pipe.execute()
+
+        turn_states = []
+        for session_id, reply in zip(session_ids, replies):
+            if reply is None:
+                # The index of its flows changed meanwhile
+                turn_state = self.load_turn_state(session_id)
+            else:
+                turn_state = _decode_turn_state(session_id, self, reply)
+
+            turn_state.round_trips += 2
+            turn_states.append(turn_state)
+
+        return turn_states
+
+    def commit_turn_states(self, turn_states: Sequence[TurnState]):
+        if any(turn_state.lock_token is not None for turn_state in turn_states):
+            # Every locked turn is committed on its own, by a script checking its lock
+            return super().commit_turn_states(turn_states)
+
+        pipe = self._client.pipeline(transaction=True)
+        for turn_state in turn_states:
+            _queue_turn_changes(pipe, turn_state, self.history_size, self.codec)
+        pipe.execute()
+
+        for turn_state in turn_states:
+            turn_state.round_trips += 1
+
+            if turn_state.changes.messages:
+                self._archive(turn_state.session_id, turn_state.changes.messages)
+
+    def acquire_turn_lock(self, session_id: str, ttl: float) -> Optional[int]:
+        keys, args = _acquire_turn_lock_keys_and_args(session_id, ttl)
+        token = self._acquire_turn_lock_script(keys=keys, args=args)
+        return None if token is None else int(token)
+
+    def release_turn_lock(self, session_id: str, token: int):
+        self._release_turn_lock_script(keys=[_get_redis_lock_key(session_id)], args=[token])
+
+    def push_pending_message(self, session_id: str, message: str):
+        pending_messages_key = _get_redis_pending_messages_key(session_id)
+
+        pipe = self._client.pipeline()
+        pipe.rpush(pending_messages_key, message)
+        pipe.expire(pending_messages_key, CONVERSATION_EXPIRATION)
+        pipe.execute()
+
+    def pop_pending_messages(self, session_id: str) -> List[str]:
+        messages = self._pop_pending_messages_script(keys=[_get_redis_pending_messages_key(session_id)])
+        return [message.decode() for message in messages]
+
+    def _archive(self, session_id: str, messages: Sequence[Tuple[Role, str]]):
+        if self.archive is None:
+            return
 
-        if conversation is None:
-            return []
+        self.archive(session_id, [{"role": role, "message": message} for role, message in messages])
 
-        conversation_json = [json.loads(message) for message in conversation]
-        return [{"role": Role(message["role"]), "message": message["message"]} for message in conversation_json]
+    def get_conversation(self, session_id: str):
+        conversation_key = _get_redis_conversation_key(session_id)
+        conversation = self._client.lrange(conversation_key, _get_conversation_start(self.history_size), -1)
+        return _decode_conversation(conversation)
 
     def add_message_to_conversation(self, session_id: str, role: Role, message: str):
         conversation_key = _get_redis_conversation_key(session_id)
-        self._client.rpush(conversation_key, json.dumps({"role": role.value, "message": message}))
-        self._client.expire(conversation_key, 60 * 60 * 24)  # FIXME: Make this configurable
+        message_count_key = _get_redis_message_count_key(session_id)
+
+        pipe = self._client.pipeline()
+        pipe.rpush(conversation_key, _encode_message(role, message))
+        if self.history_size is not None:
+            pipe.ltrim(conversation_key, -self.history_size, -1)
+        pipe.expire(conversation_key, CONVERSATION_EXPIRATION)
+        pipe.incrby(message_count_key, 1)
+        pipe.expire(message_count_key, CONVERSATION_EXPIRATION)
+        pipe.delete(_get_redis_prepared_turn_key(session_id))
+        pipe.execute()
+
+        self._archive(session_id, [(role, message)])
+
+    def get_summary(self, session_id: str) -> str:
+        return _decode_summary(self._client.get(_get_redis_summary_key(session_id)))
+
+    def get_message_count(self, session_id: str) -> int:
+        return _decode_message_count(self._client.get(_get_redis_message_count_key(session_id)))
+
+    def compact_conversation(self, session_id: str, summary: str, message_count: int):
+        keys, args = _compact_conversation_keys_and_args(session_id, summary, message_count)
+        self._compact_conversation_script(keys=keys, args=args)
 
     def get_slot(self, session_id: str, slot_name: str):
         slots_key = _get_redis_slots_key(session_id)
@@ -93,15 +675,18 @@ class RedisTracker(Tracker):
     def get_flow_slots(self, session_id: str, flow_name: str):
         slots_key = _get_redis_flow_slots_key(session_id, flow_name)
         slots = self._client.hgetall(slots_key)
-
-        if slots is None:
-            return {}
-
-        return {key.decode(): value.decode() for key, value in slots.items()}
+        return _decode_hash(slots)
 
     def set_flow_slot(self, session_id: str, flow_name: str, slot_name: str, slot_value: str):
         slots_key = _get_redis_flow_slots_key(session_id, flow_name)
-        self._client.hset(slots_key, slot_name, slot_value)
+        flows_key = _get_redis_flows_key(session_id)
+
+        pipe = self._client.pipeline()
+        pipe.hset(slots_key, slot_name, slot_value)
+        pipe.expire(slots_key, CONVERSATION_EXPIRATION)
+        pipe.sadd(flows_key, flow_name)
+        pipe.expire(flows_key, CONVERSATION_EXPIRATION)
+        pipe.execute()
 
     def set_slot(self, session_id: str, slot_name: str, slot_value: str):
         slots_key = _get_redis_slots_key(session_id)
@@ -115,50 +700,379 @@ class RedisTracker(Tracker):
         slots_key = _get_redis_flow_slots_key(session_id, flow_name)
         self._client.hdel(slots_key, slot_name)
 
-    def delete_flow_slots(self, session_id: str):
-        slots_key = _get_redis_flow_slots_key(session_id, "*")
+    def _delete_flows_state(self, session_id: str, flow_slots: bool):
+        deleted = False
+        while not deleted:
+            flow_names = self._get_flow_names(session_id)
+            keys, args = _delete_flows_state_keys_and_args(session_id, flow_slots, flow_names)
+            deleted = self._delete_flows_state_script(keys=keys, args=args)
 
-        pipe = self._client.pipeline()
-        for key in self._client.scan_iter(slots_key):
-            pipe.delete(key)
-        pipe.execute()
+    def delete_flow_slots(self, session_id: str):
+        self._delete_flows_state(session_id, flow_slots=True)
 
     def save_current_actions(self, session_id: str, actions_with_flows: Sequence[Tuple["Action", str]]):
         current_actions_key = _get_redis_current_actions_key(session_id)
 
-        to_save = [(action.to_dict(), flow) for action, flow in actions_with_flows]
-        self._client.set(current_actions_key, json.dumps(to_save))
+        pipe = self._client.pipeline()
+        pipe.set(current_actions_key, self.codec.encode_actions_with_flows(actions_with_flows))
+        pipe.delete(_get_redis_prepared_turn_key(session_id))
+        pipe.execute()
 
     def get_current_actions(self, session_id: str) -> Sequence[Tuple["Action", str]]:
         current_actions_key = _get_redis_current_actions_key(session_id)
-        current_actions_json_str = self._client.get(current_actions_key)
-
-        if current_actions_json_str is None:
-            return []
-
-        return [(Action.from_dict(action_dict), flow) for action_dict, flow in json.loads(current_actions_json_str)]
+        current_actions_data = self._client.get(current_actions_key)
+        return self.codec.decode_actions_with_flows(current_actions_data)
 
     def delete_current_actions(self, session_id: str):
         current_actions_key = _get_redis_current_actions_key(session_id)
-        self._client.delete(current_actions_key)
+        self._client.delete(current_actions_key, _get_redis_prepared_turn_key(session_id))
 
     def save_following_actions_for_flow_slot(self, session_id: str, flow_name: str, slot_name: str, actions: Sequence["Action"]):
         following_actions_key = _get_redis_following_actions_key(session_id, flow_name)
-        self._client.hset(following_actions_key, slot_name, json.dumps([action.to_dict() for action in actions]))
+        flows_key = _get_redis_flows_key(session_id)
+
+        pipe = self._client.pipeline()
+        pipe.hset(following_actions_key, slot_name, self.codec.encode_actions(actions, flow_name))
+        pipe.expire(following_actions_key, CONVERSATION_EXPIRATION)
+        pipe.sadd(flows_key, flow_name)
+        pipe.expire(flows_key, CONVERSATION_EXPIRATION)
+        pipe.execute()
 
     def get_following_actions_for_flow_slot(self, session_id: str, flow_name: str, slot_name: str) -> Sequence["Action"]:
         following_actions_key = _get_redis_following_actions_key(session_id, flow_name)
-        following_actions_json_str = self._client.hget(following_actions_key, slot_name)
+        following_actions_data = self._client.hget(following_actions_key, slot_name)
+        return self.codec.decode_actions(following_actions_data, flow_name)
+
+    def delete_following_actions(self, session_id: str):
+        self._delete_flows_state(session_id, flow_slots=False)
 
-        if following_actions_json_str is None:
-            return []
+    def migrate_keys(self, batch_size: int = 1000) -> int:
+        """
+        Move the state stored by the versions without hash tags in the keys to the keys with the hash tag of their
+        session, and index the flows. It scans the whole keyspace, so it's meant to be run once after upgrading, not
+        while serving traffic.
 
-        return [Action.from_dict(action_dict) for action_dict in json.loads(following_actions_json_str)]
+        Args:
+            batch_size: The number of keys to fetch per scan call.
 
-    def delete_following_actions(self, session_id: str):
-        following_actions_key = _get_redis_following_actions_key(session_id, "*")
+        Returns:
+            The number of keys moved.
+        """
+        num_keys = 0
 
         pipe = self._client.pipeline()
-        for key in self._client.scan_iter(following_actions_key):
-            pipe.delete(key)
+        for key in self._client.scan_iter("linguista:*", count=batch_size):
+            legacy_key = _parse_legacy_key(key)
+            if legacy_key is None:
+                continue
+
+            new_key, session_id, flow_name = legacy_key
+            pipe.rename(key, new_key)
+            if flow_name is not None:
+                pipe.sadd(_get_redis_flows_key(session_id), flow_name)
+            num_keys += 1
+
+            if len(pipe) >= batch_size:
+                pipe.execute()
         pipe.execute()
+
+        return num_keys
+
+
+class AsyncRedisTracker(AsyncTracker):
+    """
+    Args:
+        host: The Redis host.
+        port: The Redis port.
+        db: The Redis database.
+        history_size: The number of latest messages of each conversation to keep. None to keep them all.
+        archive: Function, or coroutine function, called with the session ID and the messages added to the
+            conversation, to keep the full transcripts somewhere else.
+        codec: The codec of the stored actions. By default, JSON.
+    """
+
+    supports_prepared_turns = True
+
+    def __init__(self, host: str = "localhost", port: int = 6379, db: int = 0, history_size: Optional[int] = 20,
+                 archive: Optional[Callable] = None, codec: Optional[ActionCodec] = None):
+        if redis is None:
+            raise ImportError("Please install the 'linguista[redis]' package to use the Redis tracker.")
+
+        self.host = host
+        self.port = port
+        self.db = db
+        self.history_size = history_size
+        self.archive = archive
+        self.codec = codec if codec is not None else JSONActionCodec()
+
+        self._client = redis.asyncio.Redis(host=host, port=port, db=db)
+        self._load_turn_state_script = self._client.register_script(LOAD_TURN_STATE_SCRIPT)
+        self._delete_flows_state_script = self._client.register_script(DELETE_FLOWS_STATE_SCRIPT)
+        self._acquire_turn_lock_script = self._client.register_script(ACQUIRE_TURN_LOCK_SCRIPT)
+        self._release_turn_lock_script = self._client.register_script(RELEASE_TURN_LOCK_SCRIPT)
+        self._fenced_commit_script = self._client.register_script(FENCED_COMMIT_SCRIPT)
+        self._pop_pending_messages_script = self._client.register_script(POP_PENDING_MESSAGES_SCRIPT)
+        self._compact_conversation_script = self._client.register_script(COMPACT_CONVERSATION_SCRIPT)
+
+    async def _get_flow_names(self, session_id: str) -> List[str]:
+        return _decode_flow_names(await self._client.smembers(_get_redis_flows_key(session_id)))
+
+    async def load_turn_state(self, session_id: str) -> TurnState:
+        round_trips = 0
+        reply = None
+
+        # The keys of the flows are read from their index first, again if it changes before the state is loaded
+        while reply is None:
+            flow_names = await self._get_flow_names(session_id)
+            keys, args = _load_turn_state_keys_and_args(session_id, self.history_size, flow_names)
+            reply = await self._load_turn_state_script(keys=keys, args=args)
+            round_trips += 2
+
+        turn_state = _decode_turn_state(session_id, self, reply)
+        turn_state.round_trips += round_trips
+
+        return turn_state
+
+    async def commit_turn_state(self, turn_state: TurnState):
+        if turn_state.lock_token is None:
+            pipe = self._client.pipeline(transaction=True)
+            _queue_turn_changes(pipe, turn_state, self.history_size, self.codec)
+            await pipe.execute()
+        else:
+            keys, args = _fenced_commit_keys_and_args(turn_state, self.history_size, self.codec)
+            committed = await self._fenced_commit_script(keys=keys, args=args)
+
+            if not committed:
+                raise SessionLockLostError(f"The lock of session '{turn_state.session_id}' was lost.")
+
+        turn_state.round_trips += 1
+
+        if turn_state.changes.messages:
+            await self._archive(turn_state.session_id, turn_state.changes.messages)
+
+    async def load_turn_states(self, session_ids: Sequence[str]) -> List[TurnState]:
+        pipe = self._client.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.smembers(_get_redis_flows_key(session_id))
+        flow_names_of_sessions = [_decode_flow_names(flow_names) for flow_names in await pipe.execute()]
+
+        pipe = self._client.pipeline(transaction=False)
+        for session_id, flow_names in zip(session_ids, flow_names_of_sessions):
+            keys, args = _load_turn_state_keys_and_args(session_id, self.history_size, flow_names)
+            await self._load_turn_state_script(keys=keys, args=args, client=pipe)
+        replies = await pipe.execute()
+
+        turn_states = []
+        for session_id, reply in zip(session_ids, replies):
+            if reply is None:
+                # The index of its flows changed meanwhile
+                turn_state = await self.load_turn_state(session_id)
+            else:
+                turn_state = _decode_turn_state(session_id, self, reply)
+
+            turn_state.round_trips += 2
+            turn_states.append(turn_state)
+
+        return turn_states
+
+    async def commit_turn_states(self, turn_states: Sequence[TurnState]):
+        if any(turn_state.lock_token is not None for turn_state in turn_states):
+            # Every locked turn is committed on its own, by a script checking its lock
+            return await super().commit_turn_states(turn_states)
+
+        pipe = self._client.pipeline(transaction=True)
+        for turn_state in turn_states:
+            _queue_turn_changes(pipe, turn_state, self.history_size, self.codec)
+        await pipe.execute()
+
+        for turn_state in turn_states:
+            turn_state.round_trips += 1
+
+            if turn_state.changes.messages:
+                await self._archive(turn_state.session_id, turn_state.changes.messages)
+
+    async def acquire_turn_lock(self, session_id: str, ttl: float) -> Optional[int]:
+        keys, args = _acquire_turn_lock_keys_and_args(session_id, ttl)
+        token = await self._acquire_turn_lock_script(keys=keys, args=args)
+        return None if token is None else int(token)
+
+    async def release_turn_lock(self, session_id: str, token: int):
+        await self._release_turn_lock_script(keys=[_get_redis_lock_key(session_id)], args=[token])
+
+    async def push_pending_message(self, session_id: str, message: str):
+        pending_messages_key = _get_redis_pending_messages_key(session_id)
+
+        pipe = self._client.pipeline()
+        pipe.rpush(pending_messages_key, message)
+        pipe.expire(pending_messages_key, CONVERSATION_EXPIRATION)
+        await pipe.execute()
+
+    async def pop_pending_messages(self, session_id: str) -> List[str]:
+        messages = await self._pop_pending_messages_script(keys=[_get_redis_pending_messages_key(session_id)])
+        return [message.decode() for message in messages]
+
+    async def _archive(self, session_id: str, messages: Sequence[Tuple[Role, str]]):
+        if self.archive is None:
+            return
+
+        result = self.archive(session_id, [{"role": role, "message": message} for role, message in messages])
+
+        if inspect.isawaitable(result):
+            await result
+
+    async def get_conversation(self, session_id: str):
+        conversation_key = _get_redis_conversation_key(session_id)
+        conversation = await self._client.lrange(conversation_key, _get_conversation_start(self.history_size), -1)
+        return _decode_conversation(conversation)
+
+    async def add_message_to_conversation(self, session_id: str, role: Role, message: str):
+        conversation_key = _get_redis_conversation_key(session_id)
+        message_count_key = _get_redis_message_count_key(session_id)
+
+        pipe = self._client.pipeline()
+        pipe.rpush(conversation_key, _encode_message(role, message))
+        if self.history_size is not None:
+            pipe.ltrim(conversation_key, -self.history_size, -1)
+        pipe.expire(conversation_key, CONVERSATION_EXPIRATION)
+        pipe.incrby(message_count_key, 1)
+        pipe.expire(message_count_key, CONVERSATION_EXPIRATION)
+        pipe.delete(_get_redis_prepared_turn_key(session_id))
+        await pipe.execute()
+
+        await self._archive(session_id, [(role, message)])
+
+    async def get_summary(self, session_id: str) -> str:
+        return _decode_summary(await self._client.get(_get_redis_summary_key(session_id)))
+
+    async def get_message_count(self, session_id: str) -> int:
+        return _decode_message_count(await self._client.get(_get_redis_message_count_key(session_id)))
+
+    async def compact_conversation(self, session_id: str, summary: str, message_count: int):
+        keys, args = _compact_conversation_keys_and_args(session_id, summary, message_count)
+        await self._compact_conversation_script(keys=keys, args=args)
+
+    async def get_slot(self, session_id: str, slot_name: str):
+        slots_key = _get_redis_slots_key(session_id)
+        slot = await self._client.hget(slots_key, slot_name)
+
+        if slot is None:
+            return None
+
+        return slot.decode()
+
+    async def get_flow_slot(self, session_id: str, flow_name: str, slot_name: str):
+        slots_key = _get_redis_flow_slots_key(session_id, flow_name)
+        slot = await self._client.hget(slots_key, slot_name)
+
+        if slot is None:
+            return None
+
+        return slot.decode()
+
+    async def get_flow_slots(self, session_id: str, flow_name: str):
+        slots_key = _get_redis_flow_slots_key(session_id, flow_name)
+        slots = await self._client.hgetall(slots_key)
+        return _decode_hash(slots)
+
+    async def set_flow_slot(self, session_id: str, flow_name: str, slot_name: str, slot_value: str):
+        slots_key = _get_redis_flow_slots_key(session_id, flow_name)
+        flows_key = _get_redis_flows_key(session_id)
+
+        pipe = self._client.pipeline()
+        pipe.hset(slots_key, slot_name, slot_value)
+        pipe.expire(slots_key, CONVERSATION_EXPIRATION)
+        pipe.sadd(flows_key, flow_name)
+        pipe.expire(flows_key, CONVERSATION_EXPIRATION)
+        await pipe.execute()
+
+    async def set_slot(self, session_id: str, slot_name: str, slot_value: str):
+        slots_key = _get_redis_slots_key(session_id)
+        await self._client.hset(slots_key, slot_name, slot_value)
+
+    async def delete_slot(self, session_id: str, slot_name: str):
+        slots_key = _get_redis_slots_key(session_id)
+        await self._client.hdel(slots_key, slot_name)
+
+    async def delete_flow_slot(self, session_id: str, flow_name: str, slot_name: str):
+        slots_key = _get_redis_flow_slots_key(session_id, flow_name)
+        await self._client.hdel(slots_key, slot_name)
+
+    async def _delete_flows_state(self, session_id: str, flow_slots: bool):
+        deleted = False
+        while not deleted:
+            flow_names = await self._get_flow_names(session_id)
+            keys, args = _delete_flows_state_keys_and_args(session_id, flow_slots, flow_names)
+            deleted = await self._delete_flows_state_script(keys=keys, args=args)
+
+    async def delete_flow_slots(self, session_id: str):
+        await self._delete_flows_state(session_id, flow_slots=True)
+
+    async def save_current_actions(self, session_id: str, actions_with_flows: Sequence[Tuple["Action", str]]):
+        current_actions_key = _get_redis_current_actions_key(session_id)
+
+        pipe = self._client.pipeline()
+        pipe.set(current_actions_key, self.codec.encode_actions_with_flows(actions_with_flows))
+        pipe.delete(_get_redis_prepared_turn_key(session_id))
+        await pipe.execute()
+
+    async def get_current_actions(self, session_id: str) -> Sequence[Tuple["Action", str]]:
+        current_actions_key = _get_redis_current_actions_key(session_id)
+        current_actions_data = await self._client.get(current_actions_key)
+        return self.codec.decode_actions_with_flows(current_actions_data)
+
+    async def delete_current_actions(self, session_id: str):
+        current_actions_key = _get_redis_current_actions_key(session_id)
+        await self._client.delete(current_actions_key, _get_redis_prepared_turn_key(session_id))
+
+    async def save_following_actions_for_flow_slot(self, session_id: str, flow_name: str, slot_name: str,
+                                                   actions: Sequence["Action"]):
+        following_actions_key = _get_redis_following_actions_key(session_id, flow_name)
+        flows_key = _get_redis_flows_key(session_id)
+
+        pipe = self._client.pipeline()
+        pipe.hset(following_actions_key, slot_name, self.codec.encode_actions(actions, flow_name))
+        pipe.expire(following_actions_key, CONVERSATION_EXPIRATION)
+        pipe.sadd(flows_key, flow_name)
+        pipe.expire(flows_key, CONVERSATION_EXPIRATION)
+        await pipe.execute()
+
+    async def get_following_actions_for_flow_slot(self, session_id: str, flow_name: str,
+                                                  slot_name: str) -> Sequence["Action"]:
+        following_actions_key = _get_redis_following_actions_key(session_id, flow_name)
+        following_actions_data = await self._client.hget(following_actions_key, slot_name)
+        return self.codec.decode_actions(following_actions_data, flow_name)
+
+    async def delete_following_actions(self, session_id: str):
+        await self._delete_flows_state(session_id, flow_slots=False)
+
+    async def migrate_keys(self, batch_size: int = 1000) -> int:
+        """
+        Move the state stored by the versions without hash tags in the keys to the keys with the hash tag of their
+        session, and index the flows. It scans the whole keyspace, so it's meant to be run once after upgrading, not
+        while serving traffic.
+
+        Args:
+            batch_size: The number of keys to fetch per scan call.
+
+        Returns:
+            The number of keys moved.
+        """
+        num_keys = 0
+
+        pipe = self._client.pipeline()
+        async for key in self._client.scan_iter("linguista:*", count=batch_size):
+            legacy_key = _parse_legacy_key(key)
+            if legacy_key is None:
+                continue
+
+            new_key, session_id, flow_name = legacy_key
+            pipe.rename(key, new_key)
+            if flow_name is not None:
+                pipe.sadd(_get_redis_flows_key(session_id), flow_name)
+            num_keys += 1
+
+            if len(pipe) >= batch_size:
+                await pipe.execute()
+        await pipe.execute()
+
+        return num_keys
@@ -0,0 +1,232 @@
+#
+#
+#   Turn state
+#
+#
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Set, Tuple, TYPE_CHECKING
+
+from .base import AsyncTracker
+from ..enums import Role
+
+if TYPE_CHECKING:
+    from ..actions import Action
+
+
+@dataclass
+class PreparedTurn:
+    """
+    The state of the next turn of a session that doesn't depend on the user message, prepared when a turn stops at an
+    ask. The next turn only fills in the message, as long as no message has been added to the conversation and it
+    hasn't been summarized since.
+    """
+    flow_name: str
+    slot_name: str
+    flow_slot_values: Dict[str, str]
+    prompt_parts: List[str]  # See `PromptRenderer.prepare`
+    message_count: int  # The message count of the conversation in the prompt, see `Tracker.get_message_count`
+    num_messages: int  # The number of messages of the conversation in the prompt
+    conversation_summary: Optional[str] = None
+
+
+@dataclass
+class TurnChanges:
+    """
+    The writes buffered during a turn, to be flushed at once by `Tracker.commit_turn_state`.
+
+    The deletions of all flow slots and following actions are applied before the writes of the same kind.
+    """
+    messages: List[Tuple[Role, str]] = field(default_factory=list)
+    current_actions: Optional[List[Tuple["Action", str]]] = None
+    current_actions_deleted: bool = False
+    flow_slots_deleted: bool = False
+    flow_slots: Dict[str, Dict[str, Optional[str]]] = field(default_factory=dict)  # None values are deletions
+    following_actions_deleted: bool = False
+    following_actions: Dict[str, Dict[str, List["Action"]]] = field(default_factory=dict)
+    prepared_turn: Optional[PreparedTurn] = None  # Replaces the prepared turn loaded, if any
+
+
+class TurnState(AsyncTracker):
+    """
+    In-memory state of a session during a turn.
+
+    The state preloaded by the tracker is served from memory, anything else is loaded lazily from the tracker and
+    cached. The writes are buffered in `changes` until the turn is committed with `Tracker.commit_turn_state`.
+
+    Args:
+        session_id: The session ID.
+        tracker: The tracker to load the state missing from.
+        conversation: The preloaded conversation.
+        current_actions: The preloaded pending actions.
+        flow_slots: The preloaded slot values by flow name.
+        following_actions: The preloaded following actions by flow name and slot name.
+        flow_names: The names of the flows with state in the tracker, if known.
+        summary: The preloaded summary of the conversation.
+        message_count: The preloaded message count of the conversation, see `Tracker.get_message_count`.
+        prepared_turn: The preloaded turn prepared by the previous one, if any.
+    """
+
+    def __init__(self, session_id: str, tracker, conversation: Optional[List[Dict]] = None,
+                 current_actions: Optional[Sequence[Tuple["Action", str]]] = None,
+                 flow_slots: Optional[Dict[str, Dict[str, str]]] = None,
+                 following_actions: Optional[Dict[str, Dict[str, List["Action"]]]] = None,
+                 flow_names: Optional[Set[str]] = None, summary: Optional[str] = None,
+                 message_count: Optional[int] = None, prepared_turn: Optional[PreparedTurn] = None):
+        from .adapter import AsyncTrackerAdapter
+
+        if not isinstance(tracker, AsyncTracker):
+            tracker = AsyncTrackerAdapter(tracker)
+
+        self.session_id = session_id
+        self.tracker = tracker
+        self.changes = TurnChanges()
+        self.round_trips = 0  # Requests made to the tracker during the turn
+        # Fencing token of the session lock held during the turn, if any. The commit fails if the lock was lost and
+        # releases it otherwise
+        self.lock_token: Optional[int] = None
+        self.flow_names = flow_names
+        self.prepared_turn = prepared_turn
+
+        self._conversation = None if conversation is None else list(conversation)
+        self._summary = summary
+        self._message_count = message_count
+        self._current_actions = None if current_actions is None else list(current_actions)
+        self._flow_slots = {} if flow_slots is None else {name: dict(slots) for name, slots in flow_slots.items()}
+        self._following_actions = {} if following_actions is None else {
+            name: dict(actions) for name, actions in following_actions.items()
+        }
+        # With the list of flows with state, the flows not preloaded are known to be empty
+        self._flow_state_complete = flow_names is not None
+
+    def _check_session(self, session_id: str):
+        if session_id != self.session_id:
+            raise ValueError(f"The turn state belongs to session '{self.session_id}', not '{session_id}'.")
+
+    async def _load_flow_slots(self, flow_name: str) -> Dict[str, str]:
+        if flow_name not in self._flow_slots:
+            if self._flow_state_complete or self.changes.flow_slots_deleted:
+                self._flow_slots[flow_name] = {}
+            else:
+                self.round_trips += 1
+                self._flow_slots[flow_name] = dict(await self.tracker.get_flow_slots(self.session_id, flow_name))
+
+        return self._flow_slots[flow_name]
+
+    async def get_conversation(self, session_id: str):
+        self._check_session(session_id)
+
+        if self._conversation is None:
+            self.round_trips += 1
+            self._conversation = list(await self.tracker.get_conversation(session_id))
+
+        return self._conversation + [{"role": role, "message": message} for role, message in self.changes.messages]
+
+    async def add_message_to_conversation(self, session_id: str, role: Role, message: str):
+        self._check_session(session_id)
+        self.changes.messages.append((role, message))
+
+    async def get_summary(self, session_id: str):
+        self._check_session(session_id)
+
+        if self._summary is None:
+            self.round_trips += 1
+            self._summary = await self.tracker.get_summary(session_id)
+
+        return self._summary
+
+    async def get_message_count(self, session_id: str):
+        self._check_session(session_id)
+
+        if self._message_count is None:
+            self.round_trips += 1
+            self._message_count = await self.tracker.get_message_count(session_id)
+
+        return self._message_count + len(self.changes.messages)
+
+    async def get_slot(self, session_id: str, slot_name: str):
+        self.round_trips += 1
+        return await self.tracker.get_slot(session_id, slot_name)
+
+    async def set_slot(self, session_id: str, slot_name: str, value):
+        self.round_trips += 1
+        return await self.tracker.set_slot(session_id, slot_name, value)
+
+    async def delete_slot(self, session_id: str, slot_name: str):
+        self.round_trips += 1
+        return await self.tracker.delete_slot(session_id, slot_name)
+
+    async def get_flow_slot(self, session_id: str, flow_name: str, slot_name: str):
+        self._check_session(session_id)
+        flow_slots = await self._load_flow_slots(flow_name)
+        return flow_slots.get(slot_name)
+
+    async def get_flow_slots(self, session_id: str, flow_name: str):
+        self._check_session(session_id)
+        return dict(await self._load_flow_slots(flow_name))
+
+    async def set_flow_slot(self, session_id: str, flow_name: str, slot_name: str, value):
+        self._check_session(session_id)
+        flow_slots = await self._load_flow_slots(flow_name)
+        flow_slots[slot_name] = str(value)
+        self.changes.flow_slots.setdefault(flow_name, {})[slot_name] = value
+
+    async def delete_flow_slot(self, session_id: str, flow_name: str, slot_name: str):
+        self._check_session(session_id)
+        flow_slots = await self._load_flow_slots(flow_name)
+        flow_slots.pop(slot_name, None)
+        self.changes.flow_slots.setdefault(flow_name, {})[slot_name] = None
+
+    async def delete_flow_slots(self, session_id: str):
+        self._check_session(session_id)
+        self._flow_slots = {}
+        self.changes.flow_slots = {}
+        self.changes.flow_slots_deleted = True
+
+    async def save_current_actions(self, session_id: str, actions_with_flows: Sequence[Tuple["Action", str]]):
+        self._check_session(session_id)
+        self._current_actions = list(actions_with_flows)
+        self.changes.current_actions = list(actions_with_flows)
+        self.changes.current_actions_deleted = False
+
+    async def get_current_actions(self, session_id: str):
+        self._check_session(session_id)
+
+        if self._current_actions is None:
+            self.round_trips += 1
+            self._current_actions = list(await self.tracker.get_current_actions(session_id))
+
+        return list(self._current_actions)
+
+    async def delete_current_actions(self, session_id: str):
+        self._check_session(session_id)
+        self._current_actions = []
+        self.changes.current_actions = None
+        self.changes.current_actions_deleted = True
+
+    async def save_following_actions_for_flow_slot(self, session_id: str, flow_name: str, slot_name: str,
+                                                   actions: Sequence["Action"]):
+        self._check_session(session_id)
+        self._following_actions.setdefault(flow_name, {})[slot_name] = list(actions)
+        self.changes.following_actions.setdefault(flow_name, {})[slot_name] = list(actions)
+
+    async def get_following_actions_for_flow_slot(self, session_id: str, flow_name: str, slot_name: str):
+        self._check_session(session_id)
+
+        following_actions = self._following_actions.setdefault(flow_name, {})
+
+        if slot_name not in following_actions:
+            if self._flow_state_complete or self.changes.following_actions_deleted:
+                return []
+
+            self.round_trips += 1
+            following_actions[slot_name] = list(await self.tracker.get_following_actions_for_flow_slot(
+                session_id, flow_name, slot_name))
+
+        return list(following_actions[slot_name])
+
+    async def delete_following_actions(self, session_id: str):
+        self._check_session(session_id)
+        self._following_actions = {}
+        self.changes.following_actions = {}
+        self.changes.following_actions_deleted = True
@@ -4,13 +4,76 @@
 #
 #
 
-from rich.console import Console
+import importlib
+import importlib.util
+import logging
+import re
+import sys
+from typing import Dict
 
 
-def debug(*message):
-    console = Console()
-    message_str = "[DEBUG] " + " ".join([str(m) for m in message])
-    console.print(message_str, style="bold yellow")
+def lazy_attributes(module_name: str, attributes: Dict[str, str]):
+    """
+    Make the `__getattr__` and `__dir__` functions of a module (PEP 562) to import some of its attributes from their
+    submodules when they're first accessed, e.g. so optional dependencies are only imported if they're used.
+
+    Args:
+        module_name: The name of the module, i.e. its `__name__`.
+        attributes: The name of the submodule of each attribute, relative to the module.
+
+    Returns:
+        The `__getattr__` and `__dir__` functions of the module.
+    """
+    module = sys.modules[module_name]
+
+    def __getattr__(name):
+        submodule_name = attributes.get(name)
+
+        if submodule_name is None:
+            # Submodules not imported yet, e.g. `linguista.models`, are imported as well
+            if not name.startswith("_") and importlib.util.find_spec(f"{module_name}.{name}") is not None:
+                return importlib.import_module(f"{module_name}.{name}")
+
+            raise AttributeError(f"module {module_name!r} has no attribute {name!r}")
+
+        value = getattr(importlib.import_module(submodule_name, module_name), name)
+        setattr(module, name, value)  # Next accesses don't go through `__getattr__`
+        return value
+
+    def __dir__():
+        return sorted(set(vars(module)) | set(attributes))
+
+    return __getattr__, __dir__
+
+
+def enable_debug_logging(use_rich: bool = True):
+    """
+    Print the debug messages of linguista, which are logged to the "linguista" logger.
+
+    By default the messages are only formatted if the application configures `logging` to show them. This is a shortcut
+    for development.
+
+    Args:
+        use_rich: Whether to print the messages with rich, if installed.
+    """
+    logger = logging.getLogger("linguista")
+    logger.setLevel(logging.DEBUG)
+
+    RichHandler = None
+    if use_rich:
+        try:
+            from rich.logging import RichHandler
+        except ImportError:
+            pass
+
+    if RichHandler is not None:
+        handler = RichHandler(show_path=False)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+    else:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("[%(levelname)s] %(name)s: %(message)s"))
+
+    logger.addHandler(handler)
 
 
 def strtobool(val):
@@ -28,5 +91,59 @@ def strtobool(val):
         raise ValueError("invalid truth value %r" % (val,))
 
 
+def normalize_message(message: str) -> str:
+    """
+    Normalize a user message so trivial variations, e.g. "Yes!" and "yes", are equal.
+    """
+    message = re.sub(r"\s+", " ", message.strip().lower())
+    return message.strip(" .,;:!?¡¿")
+
+
 def extract_digits(input_string):
     return ''.join(filter(lambda x: x.isdigit() or x == '.', input_string))
+
+
+def run_sync(awaitable):
+    """
+    Run an awaitable to completion without an event loop.
+
+    This is only possible for awaitables that never suspend, e.g. coroutines that only await synchronous trackers and
+    models through their asynchronous interface. A `RuntimeError` is raised otherwise.
+    """
+    coroutine = awaitable.__await__()
+
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+
+    coroutine.close()
+
+    raise RuntimeError("The awaitable suspended, it must be run in an event loop. Use the asynchronous API instead.")
+
+
+def iterate_sync(async_iterator):
+    """
+    Iterate an asynchronous iterator without an event loop. See `run_sync`.
+    """
+    try:
+        while True:
+            try:
+                yield run_sync(async_iterator.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        if hasattr(async_iterator, "aclose"):
+            run_sync(async_iterator.aclose())
+
+
+async def aiterate(iterable):
+    """
+    Iterate an iterable or an asynchronous iterable asynchronously.
+    """
+    if hasattr(iterable, "__aiter__"):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
@@ -36,12 +36,15 @@ setup(
         "setuptools"
     ],
     install_requires=[
-        "Jinja2",
-        "rich"
+        "Jinja2"
     ],
     extras_require={
         "openai": ["openai>=1.0.0"],
         "anthropic": ["anthropic"],
         "redis": ["redis[hiredis]"],
+        "retrieval": ["numpy"],
+        "msgpack": ["msgpack"],
+        "opentelemetry": ["opentelemetry-api"],
+        "rich": ["rich"],
     }
 )
@@ -202,8 +202,9 @@ claude_opus = linguista.Anthropic(
     model="claude-3-opus-20240229"
 )
 
+linguista.enable_debug_logging()
+
 bot = linguista.Bot(
-    session_id=session_id,
     flows=[
         TransferMoneyFlow(),
         CheckBalanceFlow(),
@@ -213,10 +214,12 @@ bot = linguista.Bot(
     model=claude_haiku
 )
 
+session = bot.session(session_id)
+
 try:
     while True:
         user_message = input(">>> ")
-        response_stream = bot.message(user_message, stream=True)
+        response_stream = session.message(user_message, stream=True)
 
         for response in response_stream:
             print(response)
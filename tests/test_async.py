@@ -0,0 +1,121 @@
+#
+#
+#   Tests of the asynchronous turn pipeline
+#
+#
+
+import asyncio
+import functools
+import unittest
+from unittest import mock
+
+import linguista
+from linguista.actions import Ask, Reply
+from linguista.models import LLM
+from linguista.tracker import InMemoryTracker
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class TransferFlow(linguista.Flow):
+    amount = linguista.FlowSlot(name="amount", description="Amount to transfer", type=float)
+
+    @property
+    def name(self):
+        return "transfer"
+
+    @property
+    def description(self):
+        return "Transfer money"
+
+    @linguista.action
+    def start(self):
+        return Ask(self.amount, prompt="How much?") >> Reply("Done")
+
+
+class ScriptedLLM(LLM):
+    """
+    LLM answering the prompts of a conversation in order, counting the synchronous and asynchronous calls.
+    """
+
+    COMPLETIONS = ["StartFlow(transfer)", "SetSlot(amount, 50)"]
+
+    def __init__(self):
+        self.calls = 0
+        self.async_calls = 0
+
+    def __call__(self, prompt: str):
+        self.calls += 1
+        return self.COMPLETIONS[(self.calls + self.async_calls - 1) % len(self.COMPLETIONS)]
+
+    async def acall(self, prompt: str):
+        self.async_calls += 1
+        await asyncio.sleep(0)
+        return self.COMPLETIONS[(self.calls + self.async_calls - 1) % len(self.COMPLETIONS)]
+
+
+class AsyncPipelineTest(unittest.TestCase):
+
+    def run_conversation(self, tracker, stream: bool = False):
+        model = ScriptedLLM()
+        bot = linguista.Bot(tracker=tracker, model=model, flows=[TransferFlow()])
+
+        async def converse():
+            responses = []
+            for message in ["I want to transfer money", "50"]:
+                if stream:
+                    responses.append([response async for response in await bot.amessage("session", message, True)])
+                else:
+                    responses.append(await bot.amessage("session", message))
+
+            return responses
+
+        return model, asyncio.run(converse())
+
+    def test_amessage(self):
+        model, responses = self.run_conversation(InMemoryTracker())
+
+        self.assertEqual(responses[0], ["How much?"])
+        self.assertEqual(responses[1][0], "Done")
+
+        # The asynchronous pipeline awaits the model instead of calling it
+        self.assertEqual((model.calls, model.async_calls), (0, 2))
+
+    def test_amessage_stream(self):
+        _, responses = self.run_conversation(InMemoryTracker(), stream=True)
+        _, expected_responses = self.run_conversation(InMemoryTracker())
+
+        self.assertEqual(responses, expected_responses)
+
+    def test_same_responses_as_message(self):
+        _, responses = self.run_conversation(InMemoryTracker())
+
+        bot = linguista.Bot(tracker=InMemoryTracker(), model=ScriptedLLM(), flows=[TransferFlow()])
+        expected_responses = [bot.message("session", message) for message in ["I want to transfer money", "50"]]
+
+        self.assertEqual(responses, expected_responses)
+
+    @unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+    def test_async_redis_tracker(self):
+        from linguista.tracker import AsyncRedisTracker
+
+        with mock.patch("redis.asyncio.Redis", functools.partial(fakeredis.FakeAsyncRedis,
+                                                                 server=fakeredis.FakeServer())):
+            tracker = AsyncRedisTracker()
+
+        _, responses = self.run_conversation(tracker)
+        _, expected_responses = self.run_conversation(InMemoryTracker())
+
+        self.assertEqual(responses, expected_responses)
+
+        # The synchronous pipeline can't drive an asynchronous tracker
+        bot = linguista.Bot(tracker=tracker, model=ScriptedLLM(), flows=[TransferFlow()])
+        with self.assertRaises(TypeError):
+            bot.message("session", "Hello")
+
+
+if __name__ == "__main__":
+    unittest.main()
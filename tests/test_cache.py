@@ -0,0 +1,115 @@
+#
+#
+#   Tests of the command caches
+#
+#
+
+import re
+import unittest
+from unittest import mock
+
+import linguista
+from linguista.actions import Ask
+from linguista.cache import InMemoryCommandCache
+from linguista.models import LLM
+from linguista.tracker import InMemoryTracker
+
+
+class TransferFlow(linguista.Flow):
+    amount = linguista.FlowSlot(name="amount", description="Amount to transfer", type=float)
+
+    @property
+    def name(self):
+        return "transfer"
+
+    @property
+    def description(self):
+        return "Transfer money"
+
+    @linguista.action
+    def start(self):
+        return Ask(self.amount, prompt="How much?")
+
+
+class CountingLLM(LLM):
+    """
+    LLM answering by the message of the user, counting the prompts.
+    """
+
+    RESPONSES = {
+        "I want to transfer money": "StartFlow(transfer)",
+        "Hello": "ChitChat()",
+        "Gibberish": "I don't know",
+    }
+
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt: str):
+        self.prompts.append(prompt)
+        message = re.search(r'The user just said """(.*)"""', prompt, re.S).group(1)
+        return self.RESPONSES.get(message, "SetSlot(amount, 50)")
+
+
+class CommandCacheTest(unittest.TestCase):
+
+    def run_sessions(self, cache, sessions):
+        model = CountingLLM()
+        bot = linguista.Bot(tracker=InMemoryTracker(), model=model, flows=[TransferFlow()], command_cache=cache)
+
+        responses = {}
+        for session_id, messages in sessions.items():
+            responses[session_id] = [bot.message(session_id, message) for message in messages]
+
+        return model, responses
+
+    def test_key_by_prompt(self):
+        cache = InMemoryCommandCache(key_by="prompt")
+        model, responses = self.run_sessions(cache, {
+            "a": ["I want to transfer money", "50"],
+            "b": ["I want to transfer money", "50"],
+            "c": ["Hello", "I want to transfer money", "50"],
+        })
+
+        # The turns of "b" have the same prompts as the turns of "a", the turns of "c" don't
+        self.assertEqual(len(model.prompts), 5)
+        self.assertEqual((cache.hits, cache.misses), (2, 5))
+        self.assertEqual(responses["a"], responses["b"])
+
+    def test_key_by_state(self):
+        cache = InMemoryCommandCache(key_by="state")
+        model, responses = self.run_sessions(cache, {
+            "a": ["I want to transfer money", "50"],
+            "c": ["Hello", "I want to transfer money", "50!"],
+        })
+
+        # The state keys ignore the conversation and the trivial variations of the message
+        self.assertEqual(len(model.prompts), 3)
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+        self.assertEqual(responses["a"], responses["c"][1:])
+
+    def test_responses_without_commands_not_cached(self):
+        cache = InMemoryCommandCache()
+        model, _ = self.run_sessions(cache, {"a": ["Gibberish"], "b": ["Gibberish"]})
+
+        self.assertEqual(len(model.prompts), 2)
+        self.assertEqual(len(cache), 0)
+
+    def test_ttl_and_lru(self):
+        now = [1000.0]
+
+        with mock.patch("linguista.cache.memory.time.monotonic", lambda: now[0]):
+            cache = InMemoryCommandCache(max_size=2, ttl=10)
+            cache.set("a", "A")
+            cache.set("b", "B")
+            cache.get("a")
+            cache.set("c", "C")
+
+            self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), ("A", None, "C"))
+
+            now[0] += 11
+            self.assertIsNone(cache.get("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
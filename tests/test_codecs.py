@@ -0,0 +1,138 @@
+#
+#
+#   Tests of the codecs of the actions stored by the trackers
+#
+#
+
+import unittest
+
+import linguista
+from linguista.actions import ActionFunction, Ask, CallFlow, End, Reply
+from linguista.models import LLM
+from linguista.tracker import InMemoryTracker
+from linguista.types import Categorical
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class TransferFlow(linguista.Flow):
+    amount = linguista.FlowSlot(name="amount", description="Amount to transfer", type=float)
+    account = linguista.FlowSlot(name="account", description="Account type", type=Categorical(["checking", "savings"]))
+
+    @property
+    def name(self):
+        return "transfer"
+
+    @property
+    def description(self):
+        return "Transfer money"
+
+    @linguista.action
+    def start(self):
+        return Ask(self.amount, prompt="How much?")
+
+
+class PayFlow(TransferFlow):
+
+    @property
+    def name(self):
+        return "pay"
+
+
+class ChitChatLLM(LLM):
+
+    def __call__(self, prompt: str):
+        return "ChitChat()"
+
+
+class CodecTracker(InMemoryTracker):
+    """
+    In-memory tracker with a codec, like the Redis trackers.
+    """
+
+    def __init__(self, codec, **kwargs):
+        super().__init__(**kwargs)
+        self.codec = codec
+
+
+@unittest.skipIf(msgpack is None, "msgpack is not installed")
+class MsgpackActionCodecTest(unittest.TestCase):
+
+    def setUp(self):
+        from linguista.tracker import MsgpackActionCodec
+
+        self.flow = TransferFlow()
+        self.codec = MsgpackActionCodec([self.flow])
+
+    def assertActionsEqual(self, actions, expected_actions):
+        self.assertEqual([action.to_dict() for action in actions], [action.to_dict() for action in expected_actions])
+
+    def test_round_trip(self):
+        actions = [ActionFunction(function="start"), Ask(self.flow.amount, prompt="How much?"),
+                   Ask(self.flow.account, prompt=None), CallFlow(flow_name="pay"), Reply(message="Done"), End()]
+
+        self.assertActionsEqual(self.codec.decode_actions(self.codec.encode_actions(actions, "transfer"), "transfer"),
+                                actions)
+
+        actions_with_flows = [(action, "transfer") for action in actions]
+        decoded = self.codec.decode_actions_with_flows(self.codec.encode_actions_with_flows(actions_with_flows))
+        self.assertEqual([flow_name for _, flow_name in decoded], ["transfer"] * len(actions))
+        self.assertActionsEqual([action for action, _ in decoded], actions)
+
+    def test_asks_by_reference(self):
+        ask = Ask(self.flow.amount, prompt="How much?")
+
+        # The slot of a known flow isn't stored, only its name
+        self.assertLess(len(self.codec.encode_actions([ask], "transfer")), len(self.codec.encode_actions([ask], "pay")))
+        self.assertIs(self.codec.decode_actions(self.codec.encode_actions([ask], "transfer"), "transfer")[0].slot,
+                      self.flow.amount)
+
+    def test_unknown_flow(self):
+        ask = Ask(self.flow.amount, prompt="How much?")
+
+        # Asks of flows unknown to the codec are stored with their slot
+        self.assertActionsEqual(self.codec.decode_actions(self.codec.encode_actions([ask], "pay"), "pay"), [ask])
+
+    def test_removed_flow(self):
+        from linguista.tracker import MsgpackActionCodec
+
+        data = self.codec.encode_actions_with_flows([(Ask(self.flow.amount, prompt="How much?"), "transfer"),
+                                                     (Reply(message="Done"), "transfer")])
+
+        # The asks referencing a flow that no longer exists are dropped
+        decoded = MsgpackActionCodec([PayFlow()]).decode_actions_with_flows(data)
+        self.assertEqual([(action.to_dict(), flow_name) for action, flow_name in decoded],
+                         [(Reply(message="Done").to_dict(), "transfer")])
+
+    def test_json_data(self):
+        from linguista.tracker import JSONActionCodec
+
+        actions = [Ask(self.flow.amount, prompt="How much?"), Reply(message="Done")]
+        data = JSONActionCodec().encode_actions(actions, "transfer")
+
+        self.assertActionsEqual(self.codec.decode_actions(data.encode(), "transfer"), actions)
+
+    def test_bot_registry(self):
+        from linguista.tracker import MsgpackActionCodec
+
+        codec = MsgpackActionCodec()
+        bot = linguista.Bot(tracker=CodecTracker(codec), model=ChitChatLLM(), flows=[])
+        pay_flow = PayFlow()
+        bot.add_flow(pay_flow)
+
+        # The flows added to the bot are known to the codec of its tracker
+        ask = Ask(pay_flow.amount, prompt="How much?")
+        self.assertIs(codec.decode_actions(codec.encode_actions([ask], "pay"), "pay")[0].slot, pay_flow.amount)
+
+        bot.flows = [self.flow]
+        self.assertEqual(codec.decode_actions(codec.encode_actions([ask], "pay"), "pay")[0].slot.to_dict(),
+                         pay_flow.amount.to_dict())
+        self.assertIs(codec.decode_actions(codec.encode_actions([ask], "transfer"), "transfer")[0].slot,
+                      self.flow.amount)
+
+
+if __name__ == "__main__":
+    unittest.main()
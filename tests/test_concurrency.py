@@ -0,0 +1,194 @@
+#
+#
+#   Tests of the concurrency control of the turns of a session
+#
+#
+
+import functools
+import threading
+import time
+import unittest
+from unittest import mock
+
+import linguista
+from linguista.actions import Reply
+from linguista.concurrency import SessionBusyError, SessionLockLostError
+from linguista.enums import Role
+from linguista.models import LLM
+from linguista.tracker import InMemoryTracker
+from linguista.utils import run_sync
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class GreetFlow(linguista.Flow):
+
+    @property
+    def name(self):
+        return "greet"
+
+    @property
+    def description(self):
+        return "Greet the user"
+
+    @linguista.action
+    def start(self):
+        return Reply("Hi!")
+
+
+class BlockingLLM(LLM):
+    """
+    LLM that doesn't answer the first prompt until it's released, so other messages arrive during the first turn.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.started = threading.Event()
+        self.released = threading.Event()
+        self.calls = 0
+
+    def __call__(self, prompt: str):
+        self.calls += 1
+        if self.calls == 1:
+            self.started.set()
+            self.released.wait(timeout=10)
+
+        time.sleep(self.delay)
+        return "ChitChat()"
+
+
+class ConcurrencyPolicyTestMixin:
+
+    def make_tracker(self):
+        raise NotImplementedError
+
+    def get_pending_messages(self, tracker):
+        raise NotImplementedError
+
+    def get_user_messages(self, tracker):
+        return [message["message"] for message in tracker.get_conversation("session") if message["role"] == Role.USER]
+
+    def start_turns(self, policy: str, messages, lock_ttl: float = 60.0, delay: float = 0.0):
+        """
+        Run the turn of "first" until it calls the model, and the turns of the other messages in other threads.
+        """
+        self.tracker = self.make_tracker()
+        self.model = BlockingLLM(delay)
+        self.bot = linguista.Bot(tracker=self.tracker, model=self.model, flows=[GreetFlow()],
+                                 concurrency_policy=policy, lock_ttl=lock_ttl, lock_timeout=5.0)
+        self.results = {}
+
+        def send(message):
+            try:
+                self.results[message] = self.bot.message("session", message)
+            except Exception as e:
+                self.results[message] = e
+
+        self.threads = [threading.Thread(target=send, args=("first",))]
+        self.threads[0].start()
+        self.assertTrue(self.model.started.wait(timeout=5))
+
+        for message in messages:
+            thread = threading.Thread(target=send, args=(message,))
+            thread.start()
+            self.threads.append(thread)
+
+    def finish_turns(self):
+        self.model.released.set()
+        for thread in self.threads:
+            thread.join(timeout=10)
+
+    def test_queue(self):
+        self.start_turns("queue", ["second"])
+
+        time.sleep(0.1)
+        self.assertTrue(self.threads[1].is_alive())
+
+        self.finish_turns()
+        self.assertEqual(self.get_user_messages(self.tracker), ["first", "second"])
+        self.assertTrue(self.results["second"])
+
+    def test_reject(self):
+        self.start_turns("reject", ["second"])
+        self.threads[1].join(timeout=5)
+
+        self.assertIsInstance(self.results["second"], SessionBusyError)
+
+        self.finish_turns()
+        self.assertEqual(self.get_user_messages(self.tracker), ["first"])
+
+    def test_merge(self):
+        self.start_turns("merge", ["second", "third"])
+
+        deadline = time.monotonic() + 5
+        while len(self.get_pending_messages(self.tracker)) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.finish_turns()
+
+        # The messages received during the first turn are run as a single turn, the other call gets no responses
+        self.assertIn(self.get_user_messages(self.tracker), [["first", "second\nthird"], ["first", "third\nsecond"]])
+        self.assertEqual(sorted(bool(self.results[message]) for message in ["second", "third"]), [False, True])
+
+    def test_lock_lost(self):
+        self.start_turns("queue", [], lock_ttl=0.05, delay=0.2)
+        self.finish_turns()
+
+        # The lock expired before the commit, so the turn is discarded
+        self.assertIsInstance(self.results["first"], SessionLockLostError)
+        self.assertEqual(self.get_user_messages(self.tracker), [])
+
+    def test_stale_fencing_token(self):
+        tracker = self.make_tracker()
+
+        stale_token = tracker.acquire_turn_lock("session", ttl=0.05)
+        time.sleep(0.1)
+        token = tracker.acquire_turn_lock("session", ttl=60)
+        self.assertGreater(token, stale_token)
+
+        stale_turn_state = tracker.load_turn_state("session")
+        stale_turn_state.lock_token = stale_token
+        run_sync(stale_turn_state.add_message_to_conversation("session", Role.USER, "stale"))
+
+        with self.assertRaises(SessionLockLostError):
+            tracker.commit_turn_state(stale_turn_state)
+
+        turn_state = tracker.load_turn_state("session")
+        turn_state.lock_token = token
+        run_sync(turn_state.add_message_to_conversation("session", Role.USER, "current"))
+        tracker.commit_turn_state(turn_state)
+
+        self.assertEqual(self.get_user_messages(tracker), ["current"])
+
+        # The commit released the lock
+        self.assertIsNotNone(tracker.acquire_turn_lock("session", ttl=60))
+
+
+class InMemoryConcurrencyPolicyTest(ConcurrencyPolicyTestMixin, unittest.TestCase):
+
+    def make_tracker(self):
+        return InMemoryTracker()
+
+    def get_pending_messages(self, tracker):
+        with tracker._lock:
+            return list(tracker._get_session("session", create=False).pending_messages)
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class RedisConcurrencyPolicyTest(ConcurrencyPolicyTestMixin, unittest.TestCase):
+
+    def make_tracker(self):
+        from linguista.tracker import RedisTracker
+
+        with mock.patch("redis.Redis", functools.partial(fakeredis.FakeRedis, server=fakeredis.FakeServer())):
+            return RedisTracker()
+
+    def get_pending_messages(self, tracker):
+        return tracker._client.lrange("linguista:pending_messages:{session}", 0, -1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+#
+#
+#   Tests of the flows
+#
+#
+
+import unittest
+
+import linguista
+from linguista.actions import Ask
+
+
+class TransferFlow(linguista.Flow):
+    amount = linguista.FlowSlot(name="amount", description="Amount to transfer", type=float)
+    recipient = linguista.FlowSlot(name="recipient", description="Recipient of the transfer", type=str)
+
+    @property
+    def name(self):
+        return "transfer"
+
+    @property
+    def description(self):
+        return "Transfer money"
+
+    @linguista.action
+    def start(self):
+        return Ask(self.amount, prompt="How much?")
+
+
+class ScheduledTransferFlow(TransferFlow):
+    amount = linguista.FlowSlot(name="scheduled_amount", description="Amount to transfer", type=float)
+    date = linguista.FlowSlot(name="date", description="Date of the transfer", type=str)
+
+
+class ConfigurableTransferFlow(TransferFlow):
+
+    def __init__(self, currencies):
+        self.currency = linguista.FlowSlot(name="currency", description="Currency",
+                                           type=linguista.types.Categorical(currencies))
+
+
+class FlowSlotsTest(unittest.TestCase):
+
+    def test_definition_order(self):
+        self.assertEqual([slot.name for slot in TransferFlow().get_slots()], ["amount", "recipient"])
+
+    def test_subclass(self):
+        flow = ScheduledTransferFlow()
+
+        # A slot redefined in a subclass keeps the position of the slot of the base class
+        self.assertEqual([slot.name for slot in flow.get_slots()], ["scheduled_amount", "recipient", "date"])
+        self.assertIsNone(flow.get_slot("amount"))
+        self.assertIs(flow.get_slot("date"), ScheduledTransferFlow.date)
+
+    def test_instance_slots(self):
+        flow = ConfigurableTransferFlow(["EUR", "USD"])
+
+        self.assertEqual([slot.name for slot in flow.get_slots()], ["amount", "recipient", "currency"])
+        self.assertIs(flow.get_slot("currency"), flow.currency)
+
+        # The slots of the other instances and of the class aren't changed
+        self.assertEqual(ConfigurableTransferFlow(["GBP"]).get_slot("currency").type.categories, ("GBP",))
+        self.assertEqual([slot.name for slot in TransferFlow().get_slots()], ["amount", "recipient"])
+
+    def test_actions(self):
+        self.assertIs(TransferFlow().get_action("start"), TransferFlow.start)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+#
+#
+#   Tests of the in-memory tracker
+#
+#
+
+import unittest
+from unittest import mock
+
+from linguista.enums import Role
+from linguista.tracker import InMemoryTracker
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class EvictionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+
+        patcher = mock.patch("linguista.tracker.memory.time.monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ttl(self):
+        tracker = InMemoryTracker(ttl=10)
+        tracker.set_slot("a", "name", "Alice")
+        self.clock.now += 5
+        tracker.set_slot("b", "name", "Bob")
+
+        self.clock.now += 6
+        self.assertEqual(len(tracker), 1)
+        self.assertIsNone(tracker.get_slot("a", "name"))
+        self.assertEqual(tracker.get_slot("b", "name"), "Bob")
+
+    def test_expired_sessions_evicted_on_access(self):
+        tracker = InMemoryTracker(ttl=10)
+        for i in range(100):
+            tracker.add_message_to_conversation(f"session-{i}", Role.USER, "Hi")
+
+        self.clock.now += 11
+        tracker.add_message_to_conversation("other", Role.USER, "Hi")
+
+        # The one-off sessions are dropped without waiting for their IDs to be seen again
+        self.assertEqual(list(tracker._sessions), ["other"])
+
+    def test_lru(self):
+        tracker = InMemoryTracker(max_sessions=2)
+        tracker.set_slot("a", "name", "Alice")
+        tracker.set_slot("b", "name", "Bob")
+        tracker.get_slot("a", "name")
+        tracker.set_slot("c", "name", "Carol")
+
+        self.assertEqual(tracker.get_slot("a", "name"), "Alice")
+        self.assertIsNone(tracker.get_slot("b", "name"))
+        self.assertEqual(tracker.get_slot("c", "name"), "Carol")
+
+    def test_reads_dont_create_sessions(self):
+        tracker = InMemoryTracker(max_sessions=1)
+        token = tracker.acquire_turn_lock("a", ttl=30)
+
+        tracker.get_conversation("unknown")
+        tracker.get_slot("unknown", "name")
+        tracker.load_turn_state("unknown")
+
+        # The session holding the lock isn't evicted by the reads
+        self.assertEqual(len(tracker), 1)
+        self.assertTrue(tracker._sessions["a"].is_locked(token))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+#
+#
+#   Tests of the turns prepared by the previous one
+#
+#
+
+import functools
+import unittest
+from unittest import mock
+
+import linguista
+from linguista.actions import Ask
+from linguista.enums import Role
+from linguista.models import LLM
+from linguista.tracker import InMemoryTracker
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class TransferFlow(linguista.Flow):
+    amount = linguista.FlowSlot(name="amount", description="Amount to transfer", type=float)
+
+    @property
+    def name(self):
+        return "transfer"
+
+    @property
+    def description(self):
+        return "Transfer money"
+
+    @linguista.action
+    def start(self):
+        return Ask(self.amount, prompt="How much?")
+
+
+class RecordingLLM(LLM):
+    """
+    LLM that starts the flow and then chitchats, so every turn stops at the ask of the amount.
+    """
+
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt: str):
+        self.prompts.append(prompt)
+        return "StartFlow(transfer)" if len(self.prompts) == 1 else "ChitChat()"
+
+
+class NoPreparedTurnsTracker(InMemoryTracker):
+    supports_prepared_turns = False
+
+
+class PreparedTurnTest(unittest.TestCase):
+
+    def run_turns(self, tracker, keep_prepared_turn: bool = False):
+        model = RecordingLLM()
+        bot = linguista.Bot(tracker=tracker, model=model, flows=[TransferFlow()], history_size=20)
+
+        for turn in range(15):
+            bot.message("session", f"<{turn}>")
+
+            # Once the conversation fills the prompt, a message added between turns doesn't change its length
+            if turn >= 12:
+                prepared_turn = tracker.load_turn_state("session").prepared_turn
+                tracker.add_message_to_conversation("session", Role.ASSISTANT, f"Notice {turn}")
+
+                if keep_prepared_turn:
+                    tracker._sessions["session"].prepared_turn = prepared_turn
+
+        return model.prompts
+
+    def test_same_prompts(self):
+        expected_prompts = self.run_turns(NoPreparedTurnsTracker(history_size=20))
+
+        self.assertEqual(self.run_turns(InMemoryTracker(history_size=20)), expected_prompts)
+
+    def test_message_added_between_turns(self):
+        expected_prompts = self.run_turns(NoPreparedTurnsTracker(history_size=20))
+
+        # The prepared turn is outdated by the message count even if the tracker kept it
+        self.assertEqual(self.run_turns(InMemoryTracker(history_size=20), keep_prepared_turn=True), expected_prompts)
+
+    @unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+    def test_redis_expiration(self):
+        from linguista.tracker import RedisTracker
+
+        with mock.patch("redis.Redis", functools.partial(fakeredis.FakeRedis, server=fakeredis.FakeServer())):
+            tracker = RedisTracker()
+
+        bot = linguista.Bot(tracker=tracker, model=RecordingLLM(), flows=[TransferFlow()])
+        bot.message("session", "I want to transfer money")
+
+        client = tracker._client
+        self.assertIsNotNone(tracker.load_turn_state("session").prepared_turn)
+        self.assertEqual(client.ttl("linguista:prepared_turn:{session}"),
+                         client.ttl("linguista:conversation:{session}"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+#
+#
+#   Tests of the Redis tracker
+#
+#
+
+import asyncio
+import functools
+import json
+import unittest
+from unittest import mock
+
+from linguista.actions import Reply
+from linguista.enums import Role
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class RedisTrackerTest(unittest.TestCase):
+
+    def setUp(self):
+        from linguista.tracker import RedisTracker
+
+        with mock.patch("redis.Redis", functools.partial(fakeredis.FakeRedis, server=fakeredis.FakeServer())):
+            self.tracker = RedisTracker()
+
+        self.client = self.tracker._client
+
+    def record_script_keys(self, script_name: str):
+        keys = []
+        script = getattr(self.tracker, script_name)
+
+        def record(**kwargs):
+            keys.extend(kwargs["keys"])
+            return script(**kwargs)
+
+        setattr(self.tracker, script_name, record)
+
+        return keys
+
+    def test_load_turn_state_declares_flow_keys(self):
+        self.tracker.set_flow_slot("session", "transfer", "amount", "10")
+        self.tracker.save_following_actions_for_flow_slot("session", "pay", "card", [Reply("Paid")])
+        keys = self.record_script_keys("_load_turn_state_script")
+
+        turn_state = self.tracker.load_turn_state("session")
+
+        self.assertEqual(turn_state._flow_slots, {"transfer": {"amount": "10"}, "pay": {}})
+        self.assertEqual(list(turn_state._following_actions["pay"]), ["card"])
+        self.assertLessEqual({key.decode() for key in self.client.keys("linguista:*")}, set(keys))
+
+    def test_delete_flows_state_declares_flow_keys(self):
+        self.tracker.set_flow_slot("session", "transfer", "amount", "10")
+        self.tracker.set_flow_slot("session", "pay", "card", "1234")
+        self.tracker.save_following_actions_for_flow_slot("session", "pay", "card", [Reply("Paid")])
+        keys = self.record_script_keys("_delete_flows_state_script")
+
+        self.tracker.delete_flow_slots("session")
+
+        self.assertEqual(self.tracker.get_flow_slots("session", "transfer"), {})
+        self.assertEqual(self.tracker.get_flow_slots("session", "pay"), {})
+        self.assertEqual(self.client.smembers("linguista:flows:{session}"), {b"pay"})
+        self.assertIn("linguista:flow_slots:{session}:transfer", keys)
+        self.assertIn("linguista:following_actions:{session}:pay", keys)
+
+    def test_load_turn_state_retries_when_flows_index_changes(self):
+        self.tracker.set_flow_slot("session", "transfer", "amount", "10")
+        get_flow_names = self.tracker._get_flow_names
+
+        # The first read of the index misses a flow added right after it
+        def get_outdated_flow_names(session_id):
+            self.tracker._get_flow_names = get_flow_names
+            return []
+
+        self.tracker._get_flow_names = get_outdated_flow_names
+
+        turn_state = self.tracker.load_turn_state("session")
+
+        self.assertEqual(turn_state._flow_slots, {"transfer": {"amount": "10"}})
+        self.assertEqual(turn_state.round_trips, 4)
+
+
+    def store_legacy_keys(self, client):
+        # Keys of a session of the versions without hash tags
+        client.rpush("linguista:conversation:session", json.dumps({"role": Role.USER.value, "message": "Hi"}))
+        client.hset("linguista:slots:session", "name", "Alice")
+        client.hset("linguista:flow_slots:session:transfer", "amount", "10")
+        client.hset("linguista:following_actions:session:pay", "card", json.dumps([Reply("Paid").to_dict()]))
+        client.set("linguista:unknown:session", "kept")
+
+    def test_migrate_keys(self):
+        self.store_legacy_keys(self.client)
+
+        self.assertEqual(self.tracker.migrate_keys(batch_size=2), 4)
+
+        self.assertEqual({key.decode() for key in self.client.keys("*")}, {
+            "linguista:conversation:{session}", "linguista:slots:{session}", "linguista:flow_slots:{session}:transfer",
+            "linguista:following_actions:{session}:pay", "linguista:flows:{session}", "linguista:unknown:session",
+        })
+        self.assertEqual(self.tracker.get_conversation("session"), [{"role": Role.USER, "message": "Hi"}])
+        self.assertEqual(self.tracker.get_slot("session", "name"), "Alice")
+
+        turn_state = self.tracker.load_turn_state("session")
+        self.assertEqual(turn_state._flow_slots["transfer"], {"amount": "10"})
+        self.assertEqual(list(turn_state._following_actions["pay"]), ["card"])
+
+        # The keys already migrated aren't moved again
+        self.assertEqual(self.tracker.migrate_keys(), 0)
+
+    def test_async_migrate_keys(self):
+        from linguista.tracker import AsyncRedisTracker
+
+        server = fakeredis.FakeServer()
+        self.store_legacy_keys(fakeredis.FakeRedis(server=server))
+
+        with mock.patch("redis.asyncio.Redis", functools.partial(fakeredis.FakeAsyncRedis, server=server)):
+            tracker = AsyncRedisTracker()
+
+        self.assertEqual(asyncio.run(tracker.migrate_keys()), 4)
+        self.assertEqual(fakeredis.FakeRedis(server=server).smembers("linguista:flows:{session}"),
+                         {b"transfer", b"pay"})
+
+
+if __name__ == "__main__":
+    unittest.main()
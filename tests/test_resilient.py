@@ -0,0 +1,156 @@
+#
+#
+#   Tests of the resilient LLM wrapper
+#
+#
+
+import asyncio
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from linguista.models import LLM, ResilientLLM, LLMDeadlineExceededError
+
+
+class APIError(Exception):
+    """
+    Error of an API, with its status code and the headers of its response, like the errors of the SDKs.
+    """
+
+    def __init__(self, status_code: int, headers=None):
+        super().__init__(f"Error {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class ScriptedLLM(LLM):
+    """
+    LLM whose calls, in order, raise the given errors or respond after the given delays.
+    """
+
+    supports_call_options = True
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _next(self, options):
+        with self._lock:
+            self.calls.append(options)
+            step = self.script[min(len(self.calls), len(self.script)) - 1]
+
+        if isinstance(step, BaseException):
+            raise step
+
+        return step, f"Response {len(self.calls)}"
+
+    def __call__(self, prompt: str, **options):
+        delay, response = self._next(options)
+        time.sleep(delay)
+        return response
+
+    async def acall(self, prompt: str, **options):
+        delay, response = self._next(options)
+        await asyncio.sleep(delay)
+        return response
+
+
+class ResilientLLMTest(unittest.TestCase):
+
+    def test_retry_retryable_errors(self):
+        for error in [ConnectionError("Reset"), TimeoutError("Timeout"), APIError(429), APIError(503)]:
+            llm = ScriptedLLM(error, 0.0)
+            resilient_llm = ResilientLLM(llm, backoff_base=0.0)
+
+            self.assertEqual(resilient_llm("prompt"), "Response 2")
+            self.assertEqual((resilient_llm.attempts, resilient_llm.retries), (2, 1))
+
+    def test_dont_retry_other_errors(self):
+        for error in [ValueError("Invalid"), APIError(400)]:
+            llm = ScriptedLLM(error, 0.0)
+            resilient_llm = ResilientLLM(llm, backoff_base=0.0)
+
+            with self.assertRaises(type(error)):
+                resilient_llm("prompt")
+
+            self.assertEqual(len(llm.calls), 1)
+
+    def test_max_attempts(self):
+        llm = ScriptedLLM(ConnectionError("Reset"))
+
+        with self.assertRaises(ConnectionError):
+            ResilientLLM(llm, max_attempts=3, backoff_base=0.0)("prompt")
+
+        self.assertEqual(len(llm.calls), 3)
+
+    def test_retry_after(self):
+        llm = ScriptedLLM(APIError(429, headers={"retry-after": "2"}), 0.0)
+        resilient_llm = ResilientLLM(llm, backoff_base=0.01)
+
+        with mock.patch("linguista.models.resilient.time.sleep") as sleep:
+            self.assertEqual(resilient_llm("prompt"), "Response 2")
+
+        # The wait before the retry is the one the API asked for, not the shorter backoff
+        self.assertEqual(sleep.call_args_list[0], mock.call(2.0))
+
+    def test_retry_after_past_deadline(self):
+        llm = ScriptedLLM(APIError(429, headers={"retry-after": "60"}), 0.0)
+
+        # Waiting as long as the API asked for would miss the deadline, so the error is raised right away
+        with self.assertRaises(APIError):
+            ResilientLLM(llm, deadline=1.0)("prompt")
+
+        self.assertEqual(len(llm.calls), 1)
+
+    def test_deadline(self):
+        llm = ScriptedLLM(1.0)
+        resilient_llm = ResilientLLM(llm, deadline=0.05)
+
+        with self.assertRaises(LLMDeadlineExceededError):
+            asyncio.run(resilient_llm.acall("prompt"))
+
+        self.assertEqual(resilient_llm.deadlines_exceeded, 1)
+
+    def test_call_options(self):
+        llm = ScriptedLLM(0.0)
+        resilient_llm = ResilientLLM(llm, deadline=10.0)
+
+        resilient_llm("prompt")
+        resilient_llm("prompt", max_tokens=256, timeout=2.0)
+
+        # The completions aren't capped unless asked, and the time left is the timeout of the calls
+        self.assertNotIn("max_tokens", llm.calls[0])
+        self.assertLessEqual(llm.calls[0]["timeout"], 10.0)
+        self.assertEqual(llm.calls[1]["max_tokens"], 256)
+        self.assertLessEqual(llm.calls[1]["timeout"], 2.0)
+
+    def test_hedge_win(self):
+        llm = ScriptedLLM(1.0, 0.0)
+        resilient_llm = ResilientLLM(llm, hedge_after=0.05)
+
+        start = time.monotonic()
+        self.assertEqual(asyncio.run(resilient_llm.acall("prompt")), "Response 2")
+
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual((resilient_llm.hedges, resilient_llm.hedge_wins), (1, 1))
+
+    def test_sync_hedge_win(self):
+        llm = ScriptedLLM(0.5, 0.0)
+        resilient_llm = ResilientLLM(llm, hedge_after=0.05)
+
+        self.assertEqual(resilient_llm("prompt"), "Response 2")
+        self.assertEqual((resilient_llm.hedges, resilient_llm.hedge_wins), (1, 1))
+
+    def test_no_hedge_when_fast(self):
+        llm = ScriptedLLM(0.0)
+        resilient_llm = ResilientLLM(llm, hedge_after=0.5)
+
+        self.assertEqual(asyncio.run(resilient_llm.acall("prompt")), "Response 1")
+        self.assertEqual((len(llm.calls), resilient_llm.hedges), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
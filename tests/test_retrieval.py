@@ -0,0 +1,88 @@
+#
+#
+#   Tests of the flow retrieval
+#
+#
+
+import unittest
+
+import linguista
+from linguista.commands.command import PromptRenderer
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def make_flow(flow_name: str, flow_description: str) -> linguista.Flow:
+    class CatalogueFlow(linguista.Flow):
+
+        @property
+        def name(self):
+            return flow_name
+
+        @property
+        def description(self):
+            return flow_description
+
+        @linguista.action
+        def start(self):
+            ...
+
+    return CatalogueFlow()
+
+
+FLOWS = [
+    make_flow("transfer_money", "Transfer money to another account"),
+    make_flow("check_balance", "Check the balance of an account"),
+    make_flow("book_flight", "Book a flight to a destination"),
+    make_flow("cancel_flight", "Cancel a flight booking"),
+    make_flow("order_pizza", "Order a pizza for delivery"),
+]
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class FlowRetrieverTest(unittest.TestCase):
+
+    def setUp(self):
+        from linguista.retrieval import FlowRetriever
+
+        self.retriever = FlowRetriever(top_k=2)
+        self.retriever.index(FLOWS)
+
+    def test_retrieve(self):
+        flows = self.retriever.retrieve("I want to book a flight")
+
+        self.assertEqual(len(flows), 2)
+        self.assertIn(FLOWS[2], flows)
+        self.assertNotIn(FLOWS[4], flows)
+
+        # In the order they were indexed
+        self.assertEqual(flows, sorted(flows, key=FLOWS.index))
+
+    def test_small_catalogue(self):
+        self.retriever.index(FLOWS[:2])
+        self.assertEqual(self.retriever.retrieve("pizza"), FLOWS[:2])
+
+    def test_prompt_flows(self):
+        renderer = PromptRenderer(FLOWS, retriever=self.retriever)
+
+        # The current flow is listed even if it's not retrieved
+        flows = renderer.get_prompt_flows(FLOWS[4], "I want to book a flight")
+        self.assertEqual(flows[0], FLOWS[4])
+        self.assertIn(FLOWS[2], flows)
+
+        prompt = renderer.render(FLOWS[4], None, {}, [], "I want to book a flight")
+        self.assertIn("book_flight", prompt)
+        self.assertNotIn("check_balance", prompt)
+
+    def test_prompt_without_retriever(self):
+        renderer = PromptRenderer(FLOWS)
+
+        prompt = renderer.render(None, None, {}, [], "I want to book a flight")
+        self.assertTrue(all(flow.name in prompt for flow in FLOWS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+#
+#
+#   Tests of the router of LLMs
+#
+#
+
+import asyncio
+import unittest
+from unittest import mock
+
+from linguista.models import LLM
+from linguista.models.router import RouterLLM, CLOSED, OPEN, HALF_OPEN
+
+
+class ScriptedLLM(LLM):
+    """
+    LLM returning the given completion, or failing while `failing` is set.
+    """
+
+    def __init__(self, completion: str, failing: bool = False):
+        self.completion = completion
+        self.failing = failing
+        self.calls = 0
+
+    def __call__(self, prompt: str):
+        self.calls += 1
+        if self.failing:
+            raise ConnectionError("Unavailable")
+
+        return self.completion
+
+
+class RouterLLMTest(unittest.TestCase):
+
+    def test_fallback(self):
+        weak = ScriptedLLM("ChitChat()", failing=True)
+        strong = ScriptedLLM("StartFlow(transfer)")
+        router = RouterLLM([weak, strong])
+
+        self.assertEqual(router("prompt"), "StartFlow(transfer)")
+        self.assertEqual(asyncio.run(router.acall("prompt")), "StartFlow(transfer)")
+        self.assertEqual(list(router.stream("prompt")), ["StartFlow(transfer)"])
+        self.assertEqual((weak.calls, strong.calls), (3, 3))
+
+    def test_all_backends_fail(self):
+        router = RouterLLM([ScriptedLLM("ChitChat()", failing=True), ScriptedLLM("ChitChat()", failing=True)])
+
+        with self.assertRaises(ConnectionError):
+            router("prompt")
+
+    def test_circuit_breaker(self):
+        now = [1000.0]
+        weak = ScriptedLLM("ChitChat()", failing=True)
+        strong = ScriptedLLM("StartFlow(transfer)")
+
+        with mock.patch("linguista.models.router.time.monotonic", lambda: now[0]):
+            router = RouterLLM([weak, strong], failure_threshold=2, recovery_time=10)
+
+            for _ in range(2):
+                router("prompt")
+            self.assertEqual(router.stats[0].state, OPEN)
+
+            # The open circuit skips the weak backend
+            router("prompt")
+            self.assertEqual(weak.calls, 2)
+
+            # After the recovery time, a failed trial call opens the circuit again
+            now[0] += 10
+            router("prompt")
+            self.assertEqual((weak.calls, router.stats[0].state), (3, OPEN))
+            router("prompt")
+            self.assertEqual(weak.calls, 3)
+
+            # And a successful one closes it
+            now[0] += 10
+            weak.failing = False
+            self.assertEqual(router._get_route(), [0, 1])
+            self.assertEqual(router.stats[0].state, HALF_OPEN)
+            self.assertEqual(router("prompt"), "ChitChat()")
+            self.assertEqual(router.stats[0].state, CLOSED)
+
+    def test_all_circuits_open(self):
+        backend = ScriptedLLM("ChitChat()", failing=True)
+        router = RouterLLM([backend], failure_threshold=1)
+
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                router("prompt")
+
+        # With all the circuits open, the backends are tried anyway
+        self.assertEqual(backend.calls, 2)
+
+    def test_escalate(self):
+        weak = ScriptedLLM("I don't know")
+        strong = ScriptedLLM("StartFlow(transfer)")
+        router = RouterLLM([weak, strong], policy="escalate")
+
+        self.assertEqual(router("prompt"), "StartFlow(transfer)")
+        self.assertEqual((weak.calls, strong.calls), (1, 1))
+
+        # A completion with commands from the weak backend is accepted
+        weak.completion = "ChitChat()"
+        self.assertEqual(router("prompt"), "ChitChat()")
+        self.assertEqual((weak.calls, strong.calls), (2, 1))
+
+        # The completion of the last backend is returned even without commands
+        strong.completion = "I don't know either"
+        weak.completion = "I don't know"
+        self.assertEqual(router("prompt"), "I don't know either")
+
+    def test_latency(self):
+        slow = ScriptedLLM("ChitChat()")
+        fast = ScriptedLLM("ChitChat()")
+        router = RouterLLM([slow, fast], policy="latency")
+
+        # The backends without calls yet are tried first
+        self.assertEqual(router._get_route(), [0, 1])
+
+        router.stats[0].record_success(2.0)
+        self.assertEqual(router._get_route(), [1, 0])
+
+        router.stats[1].record_success(1.0)
+        self.assertEqual(router._get_route(), [1, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+#
+#
+#   Tests of the rule-based command classifier
+#
+#
+
+import unittest
+
+import linguista
+from linguista.actions import Ask, Reply
+from linguista.commands import RuleBasedClassifier, SetSlotCommand, CancelFlowCommand, RepeatCommand
+from linguista.models import LLM
+from linguista.tracker import InMemoryTracker
+from linguista.types import Categorical
+
+
+class TransferFlow(linguista.Flow):
+    amount = linguista.FlowSlot(name="amount", description="Amount to transfer", type=float)
+    account = linguista.FlowSlot(name="account", description="Account type", type=Categorical(["Checking", "Savings"]))
+
+    @property
+    def name(self):
+        return "transfer"
+
+    @property
+    def description(self):
+        return "Transfer money"
+
+    @linguista.action
+    def start(self):
+        return Ask(self.amount, prompt="How much?") >> Ask(self.account, prompt="From which account?") >> Reply("Done")
+
+
+class CountingLLM(LLM):
+
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt: str):
+        self.prompts.append(prompt)
+        return "StartFlow(transfer)" if len(self.prompts) == 1 else "SetSlot(amount, 20)"
+
+
+class RuleBasedClassifierTest(unittest.TestCase):
+
+    def setUp(self):
+        self.classifier = RuleBasedClassifier()
+        self.flow = TransferFlow()
+
+    def test_slot_values(self):
+        self.assertEqual(self.classifier.classify(" 50. ", self.flow.amount), [SetSlotCommand(name="amount", value="50")])
+        self.assertEqual(self.classifier.classify("savings", self.flow.account),
+                         [SetSlotCommand(name="account", value="Savings")])
+
+    def test_phrases(self):
+        self.assertEqual(self.classifier.classify("Cancel!", self.flow.amount), [CancelFlowCommand()])
+        self.assertEqual(self.classifier.classify("Say that again", self.flow.amount), [RepeatCommand()])
+
+    def test_ambiguous_messages(self):
+        self.assertIsNone(self.classifier.classify("50 from savings", self.flow.amount))
+        self.assertIsNone(self.classifier.classify("fifty", self.flow.amount))
+
+        # Without an ask, the LLM predicts the commands
+        self.assertIsNone(self.classifier.classify("50", None))
+
+        self.assertEqual((self.classifier.hits, self.classifier.misses), (0, 3))
+
+    def test_bot_skips_model(self):
+        model = CountingLLM()
+        tracker = InMemoryTracker()
+        bot = linguista.Bot(tracker=tracker, model=model, flows=[self.flow], rule_classifier=self.classifier)
+
+        bot.message("session", "I want to transfer money")
+        bot.message("session", "50")
+        responses = bot.message("session", "Savings")
+
+        # Only the first turn, without an ask, calls the model
+        self.assertEqual(len(model.prompts), 1)
+        self.assertEqual(responses[0], "Done")
+        self.assertEqual(tracker.get_flow_slots("session", "transfer"), {})
+        self.assertEqual((self.classifier.hits, self.classifier.misses), (2, 1))
+
+        # A message that doesn't match the slot goes to the model
+        bot.message("session", "I want to transfer money")
+        bot.message("session", "twenty please")
+        self.assertEqual(len(model.prompts), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
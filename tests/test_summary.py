@@ -0,0 +1,109 @@
+#
+#
+#   Tests of the conversation summaries
+#
+#
+
+import functools
+import threading
+import unittest
+from unittest import mock
+
+import linguista
+from linguista.actions import Reply
+from linguista.models import LLM
+from linguista.summary import ConversationSummarizer
+from linguista.tracker import InMemoryTracker
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class GreetFlow(linguista.Flow):
+
+    @property
+    def name(self):
+        return "greet"
+
+    @property
+    def description(self):
+        return "Greet the user"
+
+    @linguista.action
+    def start(self):
+        return Reply("Hi!")
+
+
+class ChitChatLLM(LLM):
+
+    def __call__(self, prompt: str):
+        return "ChitChat()"
+
+
+class BlockingSummaryLLM(LLM):
+    """
+    LLM that doesn't write the summary until it's released, so turns can run while it's summarizing.
+    """
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.released = threading.Event()
+        self.prompts = []
+
+    def __call__(self, prompt: str):
+        self.prompts.append(prompt)
+        self.started.set()
+        self.released.wait(timeout=10)
+        return f"Summary {len(self.prompts)}"
+
+
+class CompactionRaceTest(unittest.TestCase):
+    """
+    The turns committed while a summary is being written trim the conversation, so the messages summarized are no
+    longer at the start of it when it's compacted.
+    """
+
+    def run_race(self, tracker):
+        summary_model = BlockingSummaryLLM()
+        bot = linguista.Bot(tracker=tracker, model=ChitChatLLM(), flows=[GreetFlow()], history_size=20,
+                            summarizer=ConversationSummarizer(summary_model, threshold=16, keep_last=8))
+
+        turn = 0
+        while not summary_model.started.wait(timeout=0.1):
+            bot.message("session", f"<{turn}>")
+            turn += 1
+
+        for _ in range(3):
+            bot.message("session", f"<{turn}>")
+            turn += 1
+
+        summary_model.released.set()
+        bot.flush_summaries()
+
+        summarized = summary_model.prompts[0]
+        conversation = "\n".join(message["message"] for message in tracker.get_conversation("session"))
+
+        # Every message of the user is either summarized or still in the conversation, but not both
+        for i in range(turn):
+            user_message = f"<{i}>"
+            self.assertTrue(user_message in summarized or user_message in conversation, f"{user_message} was lost")
+            self.assertFalse(user_message in summarized and user_message in conversation,
+                             f"{user_message} is both summarized and in the conversation")
+
+        self.assertEqual(tracker.get_summary("session"), "Summary 1")
+
+    def test_in_memory_tracker(self):
+        self.run_race(InMemoryTracker(history_size=20))
+
+    @unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+    def test_redis_tracker(self):
+        from linguista.tracker import RedisTracker
+
+        with mock.patch("redis.Redis", functools.partial(fakeredis.FakeRedis, server=fakeredis.FakeServer())):
+            self.run_race(RedisTracker(history_size=20))
+
+
+if __name__ == "__main__":
+    unittest.main()